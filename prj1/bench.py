@@ -0,0 +1,526 @@
+# Benchmarks for the queries in mp1.py
+# Usage: python3 bench.py database_name.db search [keyword ...]
+#        python3 bench.py database_name.db ids [writers] [inserts]
+#        python3 bench.py database_name.db queries [iterations] [results.json]
+#        python3 bench.py database_name.db parallel [iterations] [threads]
+# A database of any size can be built with gendata.py.
+
+import sqlite3, sys, os, shutil, tempfile, random, json
+from math import ceil
+from itertools import islice
+from datetime import datetime
+from time import perf_counter
+from multiprocessing import Pool
+from queue import Queue, Full
+from threading import Event, Thread
+
+import mp1
+
+# The query searchRide() used to run once per keyword, kept here so the new search engine can be compared against it.
+qLegacySearchRides = '''
+
+    SELECT
+        r.rno,
+        r.price,
+        r.rdate,
+        r.seats,
+        r.lugDesc,
+        r.driver,
+        c.cno,
+        c.make,
+        c.model,
+        c.year,
+        c.seats
+    FROM
+        rides AS r
+    INNER JOIN
+        locations AS lSrc ON lSrc.lcode = r.src
+    INNER JOIN
+        locations AS lDst ON lDst.lcode = r.dst
+    LEFT OUTER JOIN
+        cars AS c USING(cno)
+    LEFT OUTER JOIN
+        enroute AS er USING(rno)
+    LEFT OUTER JOIN
+        locations AS lEr ON lEr.lcode = er.lcode
+    WHERE
+        lower(lSrc.lcode) = :keyword
+        OR lower(lDst.lcode) = :keyword
+        OR lower(lEr.lcode) = :keyword
+
+        OR lSrc.city LIKE '%' || :keyword || '%'
+        OR lDst.city LIKE '%' || :keyword || '%'
+        OR lEr.city LIKE '%' || :keyword || '%'
+        OR lSrc.prov LIKE '%' || :keyword || '%'
+        OR lDst.prov LIKE '%' || :keyword || '%'
+        OR lEr.prov LIKE '%' || :keyword || '%'
+        OR lSrc.address LIKE '%' || :keyword || '%'
+        OR lDst.address LIKE '%' || :keyword || '%'
+        OR lEr.address LIKE '%' || :keyword || '%' ;
+
+'''
+
+# Number of times each search is repeated. The reported time is the average.
+repeat = 5
+
+def main(argc, argv):
+
+    if argc < 2 or argv[1] not in ('search', 'ids', 'queries', 'parallel'):
+        print('Usage: bench.py database_name.db search [keyword ...]\n'
+              '       bench.py database_name.db ids [writers] [inserts]\n'
+              '       bench.py database_name.db queries [iterations] [results.json]\n'
+              '       bench.py database_name.db parallel [iterations] [threads]')
+        return -1
+
+    if not os.path.exists(argv[0]):
+        print('The database \'{}\' does not exist. Please check the path argument.'.format(argv[0]))
+        return -1
+
+    # Every call must run its queries, so that repeated searches are timed rather than answered from mp1.searchCache.
+    mp1.config['searchCache'] = 0
+
+    if (argv[1] == 'ids'):
+        return stressIds(argv[0], *[int(arg) for arg in argv[2:4]])
+
+    if (argv[1] == 'queries'):
+        return benchQueries(argv[0], *([int(arg) for arg in argv[2:3]] + argv[3:4]))
+
+    if (argv[1] == 'parallel'):
+        return benchParallel(argv[0], *[int(arg) for arg in argv[2:4]])
+
+    mp1.connect(argv[0])
+
+    # Without keywords we search for the cities of a few locations.
+    keywordList = [keyword.lower() for keyword in argv[2:]]
+
+    if (not keywordList):
+        mp1.c.execute('SELECT lower(city) FROM locations WHERE city IS NOT NULL LIMIT 3;')
+        keywordList = [row[0] for row in mp1.c.fetchall()]
+
+    print('Searching rides for keywords {}.\n'.format(keywordList))
+
+    benchSearchRides(keywordList)
+
+    mp1.db.close()
+
+    return
+
+# Runs the old per-keyword search loop and the new single-pass searchRides() over the same keywords, checks that they agree, and prints how long each took and how much work SQLite did for it.
+def benchSearchRides(keywordList):
+
+    legacyResults, legacyTime, legacySteps = measure(legacySearchRides, keywordList)
+    results, newTime, newSteps = measure(mp1.searchRides, keywordList)
+
+    if (set(legacyResults) != set(results)):
+        print('The results differ! Legacy found {} rides, searchRides() found {}.'.format(len(set(legacyResults)), len(set(results))))
+
+    formatString = '    {:<14}  {:<8}  {:<12}  {:<14}'
+
+    print(formatString.format(*'Search, Rides, Time (ms), VM steps (k)'.split(', ')))
+    print(formatString.format('legacy', len(set(legacyResults)), '{:.2f}'.format(legacyTime * 1000), legacySteps))
+    print(formatString.format('searchRides', len(results), '{:.2f}'.format(newTime * 1000), newSteps))
+
+    if (newTime > 0):
+        print('\nSpeedup: {:.1f}x'.format(legacyTime / newTime))
+
+    return
+
+# The search loop that searchRide() used before searchRides() replaced it.
+def legacySearchRides(keywordList):
+
+    results = set()
+
+    for keyword in keywordList:
+        mp1.c.execute(qLegacySearchRides, {'keyword':keyword})
+        results = results.union(set(mp1.c.fetchall()))
+
+    return list(results)
+
+# Calls searchFunction(keywordList) repeat times. Returns its results, the average time per call, and the average number of SQLite virtual machine steps per call (in thousands), which approximates how many rows were visited.
+def measure(searchFunction, keywordList):
+
+    steps = [0]
+
+    def countSteps():
+        steps[0] += 1
+        return 0
+
+    # searchRides() runs on a read connection. The pool hands back the most recently returned reader first, so the one we take here is the one it will use.
+    with mp1.db.reader() as reader:
+        connections = [mp1.conn, reader]
+
+    for connection in connections:
+        connection.set_progress_handler(countSteps, 1000)
+
+    start = perf_counter()
+
+    # searchRides() returns its rows lazily, or None when nothing matched.
+    for i in range(repeat):
+        results = list(searchFunction(keywordList) or [])
+
+    elapsed = perf_counter() - start
+
+    for connection in connections:
+        connection.set_progress_handler(None, 0)
+
+    return results, elapsed / repeat, steps[0] // repeat
+
+# Times every query path a member waits on in mp1.py, iterations times each with arguments sampled from the database, and prints the 50th, 95th and 99th percentile of the times. If output is given, the results are also saved there as JSON so that runs (on different data, or before and after a change) can be compared.
+def benchQueries(path, iterations = 200, output = None):
+
+    mp1.connect(path)
+
+    random.seed(291)
+
+    # The arguments each path is called with. Keywords are lcodes and pieces of city names, like a member would type.
+    drivers = sample('rides', 'lower(driver)', iterations)
+    rnos = sample('rides', 'rno', iterations)
+    rids = sample('requests', 'rid', iterations)
+    readers = sample('inbox', 'lower(email)', iterations)
+    lcodes = sample('locations', 'lower(lcode)', iterations)
+    cities = [city[:random.randint(3, len(city))] for city in sample('locations', 'lower(city)', iterations)]
+    keywords = [random.choice((lcode, city)) for lcode, city in zip(lcodes, cities)]
+
+    # Misspelled cities, with one letter dropped, for the suggestions shown when a search finds nothing. The trigram index is built first, as it is only built once.
+    typos = [(city[:i] + city[i + 1:],) for city, i in ((city, random.randrange(len(city))) for city in sample('locations', 'lower(city)', iterations))]
+    mp1.trigramIndex()
+
+    paths = [
+        ('searchLocation', mp1.searchLocation, [(keyword,) for keyword in keywords]),
+        ('searchRides', mp1.searchRides, [(random.sample(keywords, random.randint(1, 3)),) for i in range(iterations)]),
+        ('searchRides ordered', mp1.searchRides, [(random.sample(lcodes, 2), True) for i in range(iterations)]),
+        ('displayRides', mp1.driverRides, [(driver,) for driver in drivers]),
+        ('displayBookings', mp1.driverBookings, [(driver,) for driver in drivers]),
+        ('seatsLeft', mp1.seatsLeft, [(rno,) for rno in rnos]),
+        ('requestsLocations', mp1.requestsAt, [(random.choice((lcode, city.split()[0])),) for lcode, city in zip(lcodes, cities)]),
+        ('login inbox', loginInbox, [(reader,) for reader in readers]),
+        ('matchRides', matchRequest, [(rid,) for rid in rids]),
+        ('fuzzyLocations', mp1.fuzzyLocations, typos)
+    ]
+
+    results = {}
+
+    formatString = '    {:<20}  {:>10}  {:>10}  {:>10}  {:>8}'
+    print('Timing {} calls of every query path on \'{}\'.\n'.format(iterations, path))
+    print(formatString.format('Path', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Rows'))
+
+    for name, function, argumentList in paths:
+
+        times = []
+        rows = 0
+
+        for arguments in argumentList:
+            start = perf_counter()
+            rows += firstPage(function(*arguments))
+            times.append((perf_counter() - start) * 1000)
+
+        times.sort()
+
+        results[name] = {
+            'calls': len(times),
+            'p50_ms': percentile(times, 50),
+            'p95_ms': percentile(times, 95),
+            'p99_ms': percentile(times, 99),
+            'mean_ms': sum(times) / len(times) if times else None,
+            'mean_rows': rows / len(times) if times else None
+        }
+
+        print(formatString.format(name, *['{:.3f}'.format(results[name][key] or 0) for key in ('p50_ms', 'p95_ms', 'p99_ms')], '{:.1f}'.format(results[name]['mean_rows'] or 0)))
+
+    if (output != None):
+
+        mp1.c.execute('SELECT sqlite_version();')
+
+        report = {
+            'database': os.path.abspath(path),
+            'time': datetime.now().isoformat(timespec = 'seconds'),
+            'sqlite': mp1.c.fetchone()[0],
+            'iterations': iterations,
+            'sizes': tableSizes(),
+            'results': results
+        }
+
+        with open(output, 'w') as outputFile:
+            json.dump(report, outputFile, indent = 4)
+
+        print('\nSaved the results to \'{}\'.'.format(output))
+
+    mp1.db.close()
+
+    return 0
+
+# Times the same searches of three keywords with the keywords looked up together in one query by searchRides(), and with each looked up on its own thread by parallelSearchRides(), both for the first page of rides and for all of them. Checks that both find the same rides, and prints the percentiles of each and the speedup of the parallel search.
+def benchParallel(path, iterations = 50, threads = 3):
+
+    mp1.connect(path)
+
+    if (not mp1.db.wal):
+        print('The parallel search needs write-ahead logging, which \'{}\' could not be switched to.'.format(path))
+        mp1.db.close()
+        return -1
+
+    random.seed(291)
+
+    lcodes = sample('locations', 'lower(lcode)', iterations * 3)
+    cities = [city[:random.randint(3, len(city))] for city in sample('locations', 'lower(city)', iterations * 3)]
+    keywords = [random.choice((lcode, city)) for lcode, city in zip(lcodes, cities)]
+    searches = [keywords[i:i + 3] for i in range(0, len(keywords), 3)]
+
+    formatString = '    {:<10}  {:<8}  {:>10}  {:>10}  {:>10}  {:>10}'
+    print('Timing {} searches of 3 keywords on \'{}\', with {} threads for the parallel search.\n'.format(len(searches), path, threads))
+    print(formatString.format('Search', 'Read', 'p50 (ms)', 'p95 (ms)', 'Total (ms)', 'Speedup'))
+
+    status = 0
+
+    for read, readRows in (('page', firstPage), ('all', lambda rows: len(list(rows or [])))):
+
+        totals = {}
+        found = {}
+
+        for name, search in (('serial', mp1.searchRides), ('parallel', lambda keywordList: mp1.lazyRows(parallelSearchRides(keywordList, threads)))):
+
+            times = []
+
+            for keywordList in searches:
+                start = perf_counter()
+                readRows(search(keywordList))
+                times.append((perf_counter() - start) * 1000)
+
+            times.sort()
+            totals[name] = sum(times)
+
+            print(formatString.format(name, read, *['{:.3f}'.format(time or 0) for time in (percentile(times, 50), percentile(times, 95))], '{:.1f}'.format(totals[name]), '{:.2f}x'.format(totals['serial'] / totals[name]) if totals[name] > 0 else '-'))
+
+            # The rides are only compared once, since the order they are found in differs.
+            if (read == 'all'):
+                found[name] = [{row[0] for row in search(keywordList) or []} for keywordList in searches]
+
+        if (found and found['serial'] != found['parallel']):
+            print('\nThe results differ between the serial and parallel searches!')
+            status = -1
+
+    mp1.db.close()
+
+    return status
+
+# Finds the same rides as an unordered searchRides(), but looks up every keyword on its own worker thread and read connection, at most threads at a time, and yields the rides as the workers find them. SQLite lets go of the GIL while it runs a statement, so the lookups overlap. A ride matching several keywords is only yielded once. The workers only read a couple of batches of rows ahead of the caller, and stop soon after the caller stops reading. It used to be an opt-in mode of the ride search in mp1.py, but it was dropped there since it came out slower than the single query of searchRides() on the first page of rides, which is all a member's screen reads before they ask for more: that query resolves all of the keywords at once, while each worker here repeats part of that work and builds its rows while holding the GIL. It is kept here so that benchParallel() can keep checking that.
+def parallelSearchRides(keywordList, threads):
+
+    batches = Queue(maxsize = 2 * len(keywordList))
+    stop = Event()
+    errors = []
+    seen = set()
+
+    # Worker i looks up keywords i, i + threads, and so on. They are daemon threads, so that a worker waiting on the queue never keeps the program from exiting.
+    workers = [Thread(target = searchKeywords, args = (keywordList[i::threads], batches, stop, errors), daemon = True) for i in range(min(len(keywordList), threads))]
+
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+
+    try:
+        # Every worker puts None in the queue when it is done, whether it found all of its rides or failed.
+        while (running > 0):
+            batch = batches.get()
+
+            if (batch == None):
+                running -= 1
+                continue
+
+            for row in batch:
+                if (row[0] not in seen):
+                    seen.add(row[0])
+                    yield row
+
+    finally:
+        # The workers give up on putting batches in the queue once stop is set, so we don't wait for them.
+        stop.set()
+
+    # Raises the error of a worker that failed.
+    if (errors):
+        raise errors[0]
+
+# Run by the workers of parallelSearchRides(). Puts the rides matching each keyword into the batches queue, 100 at a time, until they run out or stop is set, followed by None once every keyword is done. An error is added to errors instead of being raised. Each worker opens a read-only connection of its own instead of borrowing one from the pool: it may wait on the queue for as long as the caller takes to read the results, and a pooled reader held all that time could leave mp1.py waiting on reader() for good.
+def searchKeywords(keywordList, batches, stop, errors):
+
+    connection = None
+
+    try:
+        connection = mp1.db.open(readOnly = True)
+
+        for keyword in keywordList:
+            qSearchRides, params = mp1.searchRidesQuery([keyword])
+            cursor = connection.execute(qSearchRides, params)
+
+            while (not stop.is_set()):
+                batch = cursor.fetchmany(100)
+
+                if (not batch):
+                    break
+
+                putBatch(batches, batch, stop)
+
+    except Exception as error:
+        errors.append(error)
+
+    finally:
+        if (connection != None):
+            connection.close()
+
+        putBatch(batches, None, stop)
+
+    return
+
+# Puts batch in the batches queue, waiting while it is full, unless stop is set in the meantime.
+def putBatch(batches, batch, stop):
+
+    while (not stop.is_set()):
+        try:
+            batches.put(batch, timeout = 0.1)
+            return
+        except Full:
+            continue
+
+    return
+
+# Returns count values of column picked at random (with repeats) from the rows of table. Rows are picked by rowid, so the table isn't sorted or scanned.
+def sample(table, column, count):
+
+    mp1.c.execute('SELECT MIN(rowid), MAX(rowid) FROM {};'.format(table))
+    first, last = mp1.c.fetchone()
+
+    if (first == None):
+        return []
+
+    values = []
+
+    while (len(values) < count):
+        mp1.c.execute('SELECT {} FROM {} WHERE rowid >= ? LIMIT 1;'.format(column, table), (random.randint(first, last),))
+        values.append(mp1.c.fetchone()[0])
+
+    return values
+
+# Reads what a path returned the way its screen does, which is one page of five rows for the paths shown through resultsWizard(), and returns how many rows were read.
+def firstPage(result):
+
+    if (result == None):
+        return 0
+
+    if (isinstance(result, int)):
+        return 1
+
+    return len(list(islice(result, 5)))
+
+# The login path: counting the unread messages of a member and reading the first page of them. The messages are not marked as read, so every call does the same work.
+def loginInbox(email):
+
+    mp1.unreadCount(email)
+
+    return mp1.unreadMessages(email)
+
+# The path run after a request is posted: finding the rides that can serve it.
+def matchRequest(rid):
+
+    return mp1.matchRides(rid = rid)
+
+# Returns the value below which percent of the sorted times fall (by the nearest rank), or None if there are none.
+def percentile(times, percent):
+
+    if (not times):
+        return None
+
+    return times[max(ceil(len(times) * percent / 100) - 1, 0)]
+
+# Returns the number of rows of every table of the schema.
+def tableSizes():
+
+    sizes = {}
+
+    for table in ('members', 'locations', 'cars', 'rides', 'enroute', 'bookings', 'requests', 'inbox'):
+        mp1.c.execute('SELECT COUNT(*) FROM {};'.format(table))
+        sizes[table] = mp1.c.fetchone()[0]
+
+    return sizes
+
+# Stress tests key allocation. Starts writers processes that each post inserts requests at the same time on a copy of the database, once with allocateIds() and once with the MAX + 1 query mp1.py used before it. Prints how many inserts failed for each and checks that every allocated rid was used exactly once.
+def stressIds(path, writers = 8, inserts = 200):
+
+    formatString = '    {:<12}  {:<9}  {:<8}  {:<10}'
+
+    print('Posting {} requests from each of {} writers.\n'.format(inserts, writers))
+    print(formatString.format(*'Allocator, Inserted, Failed, Time (s)'.split(', ')))
+
+    status = 0
+
+    for allocator in ('allocateIds', 'legacy'):
+
+        # We work on a copy so the database given is left untouched.
+        directory = tempfile.mkdtemp()
+        copy = os.path.join(directory, 'stress.db')
+        shutil.copyfile(path, copy)
+
+        start = perf_counter()
+
+        with Pool(writers) as pool:
+            counts = pool.starmap(postRequests, [(copy, allocator, inserts)] * writers)
+
+        elapsed = perf_counter() - start
+
+        inserted = sum(count[0] for count in counts)
+        failed = sum(count[1] for count in counts)
+
+        print(formatString.format(allocator, inserted, failed, '{:.2f}'.format(elapsed)))
+
+        # With allocateIds() every insert must succeed, and the new rids must be exactly the block the sequence moved over.
+        if (allocator == 'allocateIds'):
+            conn = sqlite3.connect(copy)
+            first, last, distinct = conn.execute('SELECT MIN(rid), MAX(rid), COUNT(DISTINCT rid) FROM requests WHERE rdate = \'2099-01-01\';').fetchone()
+            conn.close()
+
+            if (failed > 0 or distinct != writers * inserts or last - first + 1 != distinct):
+                status = -1
+
+        shutil.rmtree(directory)
+
+    print('\nallocateIds() {}.'.format('handed out every key exactly once' if status == 0 else 'FAILED'))
+
+    return status
+
+# Run by each writer process of stressIds(). Posts inserts requests, each in its own transaction, and returns how many were inserted and how many failed.
+def postRequests(path, allocator, inserts):
+
+    mp1.connect(path)
+
+    mp1.c.execute('SELECT email FROM members LIMIT 1;')
+    email = mp1.c.fetchone()[0]
+
+    mp1.c.execute('SELECT lcode FROM locations LIMIT 1;')
+    lcode = mp1.c.fetchone()[0]
+
+    inserted = 0
+    failed = 0
+
+    for i in range(inserts):
+        try:
+            if (allocator == 'allocateIds'):
+                mp1.db.write(mp1.insertRequest, email, '2099-01-01', lcode, lcode, 1)
+            else:
+                mp1.c.execute('SELECT IFNULL((MAX(rid) + 1), 1) FROM requests ;')
+                rid = mp1.c.fetchone()[0]
+
+                mp1.c.execute('INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?)', (rid, email, '2099-01-01', lcode, lcode, 1))
+                mp1.conn.commit()
+
+            inserted += 1
+
+        except sqlite3.Error:
+            mp1.conn.rollback()
+            failed += 1
+
+    mp1.db.close()
+
+    return inserted, failed
+
+if __name__ == '__main__':
+    sys.exit(main( len(sys.argv[1:]), sys.argv[1:] ))
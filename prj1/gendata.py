@@ -0,0 +1,310 @@
+# Builds a database with the mp1.py schema filled with random but consistent data, for benchmarking at realistic sizes.
+# Usage: python3 gendata.py [--table=rows ...] [--seed=N] database_name.db
+#        e.g. python3 gendata.py --rides=1000000 --bookings=5000000 --inbox=10000000 big.db
+
+import sqlite3, sys, os, random
+from itertools import islice
+from time import perf_counter
+
+# The schema of the database, the same as the one mp1.py expects.
+qSchema = '''
+
+    CREATE TABLE members (
+        email char(15),
+        name char(20),
+        phone char(12),
+        pwd char(6),
+        PRIMARY KEY (email)
+    );
+
+    CREATE TABLE cars (
+        cno int,
+        make char(12),
+        model char(12),
+        year int,
+        seats int,
+        owner char(15),
+        PRIMARY KEY (cno),
+        FOREIGN KEY (owner) REFERENCES members
+    );
+
+    CREATE TABLE locations (
+        lcode char(5),
+        city char(16),
+        prov char(16),
+        address char(16),
+        PRIMARY KEY (lcode)
+    );
+
+    CREATE TABLE rides (
+        rno int,
+        price int,
+        rdate date,
+        seats int,
+        lugDesc char(10),
+        src char(5),
+        dst char(5),
+        driver char(15),
+        cno int,
+        PRIMARY KEY (rno),
+        FOREIGN KEY (src) REFERENCES locations,
+        FOREIGN KEY (dst) REFERENCES locations,
+        FOREIGN KEY (driver) REFERENCES members,
+        FOREIGN KEY (cno) REFERENCES cars
+    );
+
+    CREATE TABLE bookings (
+        bno int,
+        email char(15),
+        rno int,
+        cost int,
+        seats int,
+        pickup char(5),
+        dropoff char(5),
+        PRIMARY KEY (bno),
+        FOREIGN KEY (email) REFERENCES members,
+        FOREIGN KEY (rno) REFERENCES rides,
+        FOREIGN KEY (pickup) REFERENCES locations,
+        FOREIGN KEY (dropoff) REFERENCES locations
+    );
+
+    CREATE TABLE enroute (
+        rno int,
+        lcode char(5),
+        PRIMARY KEY (rno, lcode),
+        FOREIGN KEY (rno) REFERENCES rides,
+        FOREIGN KEY (lcode) REFERENCES locations
+    );
+
+    CREATE TABLE requests (
+        rid int,
+        email char(15),
+        rdate date,
+        pickup char(5),
+        dropoff char(5),
+        amount int,
+        PRIMARY KEY (rid),
+        FOREIGN KEY (email) REFERENCES members,
+        FOREIGN KEY (pickup) REFERENCES locations,
+        FOREIGN KEY (dropoff) REFERENCES locations
+    );
+
+    CREATE TABLE inbox (
+        email char(15),
+        msgTimestamp date,
+        sender char(15),
+        content text,
+        rno int,
+        seen char(1),
+        PRIMARY KEY (email, msgTimestamp),
+        FOREIGN KEY (email) REFERENCES members,
+        FOREIGN KEY (sender) REFERENCES members,
+        FOREIGN KEY (rno) REFERENCES rides
+    );
+
+'''
+
+# How many rows are generated for each table, changed with --table=rows options. The enroute rows are spread over random rides.
+sizes = {
+    'members': 10000,
+    'locations': 2000,
+    'cars': 5000,
+    'rides': 100000,
+    'enroute': 100000,
+    'bookings': 300000,
+    'requests': 50000,
+    'inbox': 500000
+}
+
+# The seed of the random generator, changed with --seed=N, so the same options always build the same database.
+seed = 291
+
+# How many rows are inserted with one executemany() call.
+chunkSize = 100000
+
+# The cities (with their province) that locations are spread over, and the values the other text columns are picked from.
+cities = [
+    ('Edmonton', 'Alberta', 'ab'), ('Calgary', 'Alberta', 'ab'), ('Red Deer', 'Alberta', 'ab'), ('Jasper', 'Alberta', 'ab'),
+    ('Vancouver', 'British Columbia', 'bc'), ('Victoria', 'British Columbia', 'bc'), ('Kelowna', 'British Columbia', 'bc'),
+    ('Regina', 'Saskatchewan', 'sk'), ('Saskatoon', 'Saskatchewan', 'sk'), ('Winnipeg', 'Manitoba', 'mb'),
+    ('Toronto', 'Ontario', 'on'), ('Ottawa', 'Ontario', 'on'), ('Montreal', 'Quebec', 'qc'), ('Halifax', 'Nova Scotia', 'ns')
+]
+streets = ['Jasper Ave', 'Whyte Ave', 'Main St', 'King St', 'Queen St', 'Robson St', 'Albert St', 'Portage Ave', 'Yonge St', 'Bank St']
+names = ['Amy', 'Bob', 'Cat', 'Dan', 'Eve', 'Fay', 'Gus', 'Hal', 'Ivy', 'Jon', 'Kim', 'Lee', 'Max', 'Ned', 'Oli', 'Pam']
+makes = [('Honda', 'Civic'), ('Toyota', 'Corolla'), ('Ford', 'F150'), ('Dodge', 'Caravan'), ('Subaru', 'Outback'), ('Mazda', '3')]
+luggage = ['none', 'small bag', 'medium bag', 'large bag', 'backpack']
+
+def main(argc, argv):
+
+    argv = parseOptions(argv)
+
+    if (argv == None or len(argv) != 1):
+        print('Usage: gendata.py [--table=rows ...] [--seed=N] database_name.db\n'
+              'Tables: {}'.format(', '.join(sizes)))
+        return -1
+
+    # We never overwrite a database, since it may hold real data.
+    if os.path.exists(argv[0]):
+        print('The database \'{}\' already exists. Please give the path of a new database.'.format(argv[0]))
+        return -1
+
+    random.seed(seed)
+
+    conn = sqlite3.connect(argv[0])
+
+    # The database is thrown away if generating fails, so there is no need for a rollback journal or for syncing to disk.
+    conn.execute('PRAGMA journal_mode = OFF;')
+    conn.execute('PRAGMA synchronous = OFF;')
+
+    conn.executescript(qSchema)
+
+    start = perf_counter()
+
+    generateRows(conn, 'members', 4, members())
+    generateRows(conn, 'locations', 4, locations())
+
+    # The rides need the owner of every car, so their drivers own the cars they drive, and the bookings need the route of every ride.
+    owners = [randomEmail() for cno in range(sizes['cars'])]
+    routes = [(randomLcode(), randomLcode()) for rno in range(sizes['rides'])]
+
+    generateRows(conn, 'cars', 6, cars(owners))
+    generateRows(conn, 'rides', 9, rides(owners, routes))
+    generateRows(conn, 'enroute', 2, enroute(), ignore = True)
+    generateRows(conn, 'bookings', 7, bookings(routes))
+    generateRows(conn, 'requests', 6, requests())
+    generateRows(conn, 'inbox', 6, inbox())
+
+    conn.close()
+
+    print('\nGenerated \'{}\' in {:.1f} seconds.'.format(argv[0], perf_counter() - start))
+
+    return 0
+
+# Reads the --table=rows and --seed=N options out of argv into sizes and seed. Returns the remaining arguments, or None if an option is invalid.
+def parseOptions(argv):
+    global seed
+
+    arguments = []
+
+    for arg in argv:
+
+        if (not arg.startswith('--')):
+            arguments.append(arg)
+            continue
+
+        name, _, value = arg[2:].partition('=')
+
+        try:
+            value = int(value)
+        except ValueError:
+            print('The value of option \'{}\' is not an integer.'.format(arg))
+            return
+
+        if (name == 'seed'):
+            seed = value
+        elif (name in sizes and value >= 0):
+            sizes[name] = value
+        else:
+            print('Unrecognized option \'{}\'.'.format(arg))
+            return
+
+    return arguments
+
+# Inserts the rows of a generator into table chunkSize rows at a time, each chunk in its own transaction, and prints how many were inserted. columns is the number of columns of the table. With ignore, rows that would break the primary key are skipped.
+def generateRows(conn, table, columns, rows, ignore = False):
+
+    start = perf_counter()
+
+    qInsert = 'INSERT {}INTO {} VALUES ({});'.format('OR IGNORE ' if ignore else '', table, ', '.join('?' * columns))
+
+    while True:
+        chunk = list(islice(rows, chunkSize))
+
+        if (not chunk):
+            break
+
+        with conn:
+            conn.executemany(qInsert, chunk)
+
+    count = conn.execute('SELECT COUNT(*) FROM {};'.format(table)).fetchone()[0]
+
+    print('{:<10} {:>10} rows  {:>7.1f} s'.format(table, count, perf_counter() - start))
+
+    return
+
+# Each of the following generators yields the rows of one table.
+def members():
+
+    for i in range(sizes['members']):
+        yield (email(i), '{} {}'.format(random.choice(names), i), '780-{:03}-{:04}'.format(i // 10000 % 1000, i % 10000), 'pw{}'.format(i % 1000))
+
+def locations():
+
+    for i in range(sizes['locations']):
+        city, prov, code = cities[i % len(cities)]
+        yield (lcode(i), city, prov, '{} {}'.format(random.randint(1, 9999), random.choice(streets)))
+
+def cars(owners):
+
+    for cno, owner in enumerate(owners):
+        make, model = random.choice(makes)
+        yield (cno, make, model, random.randint(1995, 2020), random.randint(2, 7), owner)
+
+def rides(owners, routes):
+
+    for rno, (src, dst) in enumerate(routes):
+
+        # Most rides are driven in one of the driver's cars.
+        if (owners and random.random() < 0.8):
+            cno = random.randrange(len(owners))
+            driver = owners[cno]
+        else:
+            cno = None
+            driver = randomEmail()
+
+        yield (rno, random.randint(5, 100), randomDate(), random.randint(1, 6), random.choice(luggage), src, dst, driver, cno)
+
+def enroute():
+
+    for i in range(sizes['enroute'] if sizes['rides'] else 0):
+        yield (random.randrange(sizes['rides']), randomLcode())
+
+def bookings(routes):
+
+    for bno in range(sizes['bookings'] if routes else 0):
+        rno = random.randrange(len(routes))
+        src, dst = routes[rno]
+        yield (bno, randomEmail(), rno, random.randint(5, 100), random.randint(1, 2), src, dst)
+
+def requests():
+
+    for rid in range(sizes['requests']):
+        yield (rid, randomEmail(), randomDate(), randomLcode(), randomLcode(), random.randint(5, 100))
+
+def inbox():
+
+    # Every message gets its own second, which keeps (email, msgTimestamp) unique. About one message in ten is unread.
+    for i in range(sizes['inbox']):
+        timestamp = '{} {:02}:{:02}:{:02}'.format(randomDate(), i // 3600 % 24, i // 60 % 60, i % 60)
+        rno = random.randrange(sizes['rides']) if sizes['rides'] else None
+        yield (randomEmail(), '{}.{}'.format(timestamp, i), randomEmail(), 'Message {}'.format(i), rno, 'n' if random.random() < 0.1 else 'y')
+
+# The email of member i and the lcode of location i, so that rows can refer to them without looking them up.
+def email(i):
+    return 'member{}@mail.com'.format(i)
+
+def lcode(i):
+    return '{}{}'.format(cities[i % len(cities)][2], i)
+
+def randomEmail():
+    return email(random.randrange(sizes['members']))
+
+def randomLcode():
+    return lcode(random.randrange(sizes['locations']))
+
+# A random date in 2020, in YYYY-MM-DD format.
+def randomDate():
+    return '2020-{:02}-{:02}'.format(random.randint(1, 12), random.randint(1, 28))
+
+if __name__ == '__main__':
+    sys.exit(main( len(sys.argv[1:]), sys.argv[1:] ))
@@ -1,21 +1,130 @@
 # Mini Project 1
 # Nectarios Chroniaris & Maaz Siddique
 
-import sqlite3, sys, os
+import sqlite3, sys, os, io, csv, json, datetime, ctypes
 from getpass import getpass
-from re import fullmatch
+from re import fullmatch, findall, sub
 from math import ceil
-
-# We define the connection and cursor as global variables so they can be accessed by all functions.
+from itertools import chain, islice
+from contextlib import contextmanager
+from collections import OrderedDict, Counter
+from bisect import bisect_left, insort
+from heapq import nlargest
+from queue import LifoQueue, Empty
+from urllib.request import pathname2url
+from random import random
+from threading import Lock, local
+from weakref import WeakSet
+from time import sleep, perf_counter
+
+# readline gives input() line editing and Tab completion of locations, where it is available (it isn't on Windows).
+try:
+    import readline
+except ImportError:
+    readline = None
+
+# We define the connection manager, and its writer connection and cursor, as global variables so they can be accessed by all functions.
+db = None
 conn = None
 c = None
 
+# Settings that can be changed with --name=value options on the command line, e.g. --busy-timeout=10000. See parseOptions().
+config = {
+
+    # Whether to switch the database to write-ahead logging, which lets readers and the writer work at the same time.
+    'wal': True,
+
+    # How long (in milliseconds) a statement waits for another session's lock before giving up.
+    'busyTimeout': 5000,
+
+    # How many times a write transaction is retried when the database stays locked, and the base delay (in milliseconds) between attempts. The delay doubles after every attempt.
+    'retries': 5,
+    'backoff': 50,
+
+    # The most read connections kept open at once, and how many rows db.query() reads each time it borrows one. See ConnectionManager.rows().
+    'readers': 4,
+    'pageRows': 100,
+
+    # How many ride and location searches have their results kept, so that running one again costs no query until the tables it reads change (0 turns this off), and the most rows a search may return to be kept. See cachedSearch().
+    'searchCache': 64,
+    'searchCacheRows': 500,
+
+    # How many misspelled location keywords are suggested for a search that found nothing (0 turns suggestions off), and how similar (the share of trigrams they have in common, from 0 to 1) a word must be to the keyword to be suggested. See fuzzyLocations().
+    'fuzzyMatches': 5,
+    'fuzzySimilarity': 0.3,
+
+    # How many lines of a batch command file are applied in one transaction.
+    'batchSize': 1000,
+
+    # How many rows the import command inserts per executemany() call, and whether it runs ANALYZE on the table afterwards so the query planner knows its new size.
+    'chunkSize': 10000,
+    'analyze': False,
+
+    # Whether every statement is timed (see InstrumentedCursor), with a summary printed when the program exits. Statements slower than slowQueryMs milliseconds are also written to the slowQueryLog file.
+    'profile': False,
+    'slowQueryMs': 100,
+    'slowQueryLog': 'slow_queries.log'
+
+}
+
+# The column names written by exportResults() for bookings and requests.
+bookingColumns = ['bno', 'email', 'rno', 'cost', 'seats', 'pickup', 'dropoff']
+requestColumns = ['rid', 'email', 'rdate', 'pickup', 'dropoff', 'amount']
+
+# The tables that can be bulk loaded with the import command.
+importTables = ('members', 'locations', 'cars', 'rides', 'enroute', 'bookings')
+
+# The version of the schema that upgradeSchema() sets up, which it stores in PRAGMA user_version. It must be raised whenever upgradeSchema() changes, so that databases upgraded by an older version of the program are upgraded again when we connect.
+schemaVersion = 4
+
+# The tables whose changes are counted in table_versions, so that caches built from them can tell when they are out of date. See setupTableVersions().
+versionedTables = ['members', 'cars', 'locations', 'rides', 'enroute']
+
+# The tables whose changed rows are logged in change_log, along with their key column, so that referenceCache only reads again the rows that changed. See setupChangeLog().
+loggedTables = {'locations': 'lcode', 'cars': 'cno'}
+
+# How many of the latest changes change_log keeps.
+changeLogRows = 10000
+
+# The profiles (name, phone and cars) of logged in members, keyed by email. See getProfile().
+profileCache = {}
+
+# The results of recent ride and location searches by search, least recently used first, along with the change token and table versions they are up to date with, and how many searches were answered from them (hits) or not (misses). See cachedSearch().
+searchCache = {'results': OrderedDict(), 'token': None, 'versions': {}, 'hits': 0, 'misses': 0}
+
+# The tables each kind of search reads, whose changes make its cached results out of date.
+searchTables = {'locations': ['locations'], 'rides': ['rides', 'enroute', 'locations', 'cars']}
+
+# The locations (their city, province and address, keyed by lowercase lcode) and car owners (keyed by cno) that input is checked against, so that isLocation() and carOwner() don't have to query the database, and the sorted (word, lcode) pairs that location prefixes are completed from, with a pair for the lcode, city and province of every location in lowercase, which are only worked out once they are first needed. seq is the last change in change_log that the cache is up to date with. See referenceData() and locationCompletions().
+referenceCache = {'locations': {}, 'completions': None, 'trigrams': None, 'owners': {}, 'token': None, 'versions': {}, 'seq': None}
+
+# The words offered by readline for the word being completed, worked out when it asks for the first one. See completeLocation().
+completionWords = []
+
+# The tables whose keys are handed out by allocateIds(), along with their key column.
+idColumns = {'rides': 'rno', 'bookings': 'bno', 'requests': 'rid'}
+
+# Whether standard output is a terminal, and whether that terminal understands ANSI codes. They are set by startScreen() when an interactive session starts, and decide whether and how clearScreen() clears the terminal.
+screenIsTTY = False
+screenHasANSI = False
+
+# Whether the FTS5 trigram index over locations is available. It is set by setupLocationIndex() when we connect, and stays False on SQLite builds without FTS5, in which case location searches fall back to LIKE scans.
+ftsEnabled = False
+
 # Main function and control loop
 def main(argc, argv):
 
-    # Checks the amount of arguments is exactly one for specifying the database.
-    if argc != 1:
-        print('Usage: mp1.py database_name.db')
+    # Takes out any --name=value options. What is left is the database path, and possibly a command.
+    argv = parseOptions(argv)
+
+    if (argv == None):
+        return -1
+
+    argc = len(argv)
+
+    # Checks that there is at least one argument for specifying the database. Anything after it is a command to run instead of the interactive program.
+    if argc < 1:
+        print('Usage: mp1.py [--option=value ...] database_name.db [command ...]')
         return -1
 
     # Checks if the database being specified exists. It wouldn't make much sense to open a database meant for authentication with no schema or data.
@@ -26,1442 +135,3956 @@ def main(argc, argv):
     # Connect to the database
     connect(argv[0])
 
-    # This is the core loop for handling multiple user sessions. It calls login once every loop and checks the return value. A valid login is represented by a email string, and an invalid login attempt is a return value of NoneType. If it is None, then we know that the user has called the exit function, so we appropriately terminate.
-    while True:
-        email = login()
+    # Everything after this point runs in the try, so that the connections are closed and the profile printed even if the program stops on an error. The connections are closed first, which records the statements of any cursor that is still open.
+    try:
 
-        # If the user types 'exit' in loginPage(), it propagates up here and we quit the program
-        if (email == None):
-            print('\nQuitting...')
-            break
+        # If a command was given, we run it and quit without starting a user session.
+        if argc > 1:
+            return runCommand(argv[1:])
 
-        mainMenu(email)
+        # Buffers the output of the interactive screens, so each one reaches the terminal in one write.
+        startScreen()
 
-    # Closes the connection
-    conn.close()
+        # Loads the locations that input is checked and completed against before the first prompt, so that no prompt waits on it.
+        referenceData()
 
-    return
+        # This is the core loop for handling multiple user sessions. It calls login once every loop and checks the return value. A valid login is represented by a email string, and an invalid login attempt is a return value of NoneType. If it is None, then we know that the user has called the exit function, so we appropriately terminate.
+        while True:
+            email = login()
 
-##
-#### Login, Registration, and core menu functions start here ####
-##
+            # If the user types 'exit' in loginPage(), it propagates up here and we quit the program
+            if (email == None):
+                print('\nQuitting...')
+                break
 
-# Connects to a specified database specified with path. It creates a connection, a cursor, and turns foreign key constraints on.
-def connect(path):
+            mainMenu(email)
 
-    # We declare globals conn and c since we must modify them directly. This statement should not appear in any other function since we should never re-modify where conn or c points to.
-    global conn, c
+            # The member has logged out, so we forget their profile.
+            profileCache.pop(email, None)
 
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute('PRAGMA foreign_keys = ON;')
-    conn.commit()
+    finally:
+        db.close()
+        printProfile()
 
     return
 
-# This function semantically "logs in" a user, based on the email that is returned from loginPage(). After a valid email has been passed, it prints unread messages for that user, sets them to read, and then prompts the user to enter the main menu. i.e. it returns to main() with the valid "logged in" email.
-def login():
-    # We attempt to sign in a user using loginPage(). Assuming that a valid email has been returned, it is already in lowercase.
-    email = loginPage()
+# Reads the --name=value options out of argv into config, where name is the setting in lowercase words separated by dashes (--busy-timeout for busyTimeout). Returns the remaining arguments, or None if an option is invalid.
+def parseOptions(argv):
 
-    # We must check this since past this point we assume that a user (denoted by email) is registered. If email == None, then that means we have failed to authenticate a user and have received an exit command.
-    if email == None:
-        return
+    args = []
 
-    # At this point we consider the user logged in.
-    os.system('clear||cls')
+    for arg in argv:
 
-    # Prints a welcome message to the user.
-    c.execute('SELECT name FROM members WHERE lower(email) = ?;', (email,))
-    print('Logged in as user \'{}\' ({}).\n'.format(c.fetchone()[0], email))
+        if (not arg.startswith('--')):
+            args.append(arg)
+            continue
 
-    # Query for getting all the info for each message
-    qGetMessages = '''
+        name, _, value = arg[2:].partition('=')
+        words = name.lower().split('-')
+        key = words[0] + ''.join(word.capitalize() for word in words[1:])
 
-        SELECT
-            sender,
-            DATE(msgTimestamp),
-            TIME(msgTimestamp),
-            content
-        FROM
-            inbox
-        WHERE
-            lower(email) = ?
-            AND lower(seen) = 'n' ;
+        if (key not in config):
+            print('Unrecognized option \'{}\'. Valid options are {}.'.format(arg, ', '.join('--' + optionName(key) for key in config)))
+            return
 
-    '''
+        # Options are converted to the type of their default value.
+        if (isinstance(config[key], bool)):
+            config[key] = value.lower() in ('', 'on', 'yes', 'true', '1')
+            continue
+
+        try:
+            config[key] = type(config[key])(value)
+        except ValueError:
+            print('The value of option \'--{}\' is not valid.'.format(name))
+            return
 
-    # Fetches all unread messages and stores them in messageList
-    c.execute(qGetMessages, (email,))
-    messageList = c.fetchall()
+    return args
 
-    # Prints all unread messages
-    for message in messageList:
-        print('Message from \'{}\' on {}, {}:\n\t\"{}\"\n'.format(*message))
+# Turns a config key back into its option name (busyTimeout into busy-timeout).
+def optionName(key):
+    return ''.join('-' + char.lower() if char.isupper() else char for char in key)
 
-    # Print a message if there are no unread messages
-    if (not messageList):
-        print('No new messages.\n')
+##
+#### Database connection management starts here ####
+##
 
-    # Set all unread messages to read
-    c.execute('UPDATE inbox SET seen = \'y\' WHERE email = ?', (email,))
-    conn.commit()
+# Hands out the connections to one database file. There is a single writer connection, which every write goes through via write(), and a pool of read connections, handed out by reader() and query(), so that searches do not have to wait on writes. All connections wait up to config['busyTimeout'] for locks held by other sessions, and write() retries transactions that still find the database locked.
+class ConnectionManager:
 
-    # Prompt user to advance to the main menu
-    input('Press the enter key to advance to the main menu. ')
+    def __init__(self, path):
 
-    return email
+        self.path = path
 
-# This function handles the input of usernames and passwords passed into the program by the user. It calls authenticateUser() with an email and password. If this returns true, we return to the login() with the email string so that it can actually "log [the user] in". If the input passed by the user is 'register' then we call registerUser(). Whether that suceeds or fails we restart the login page. If the input passed by the user is 'exit', then we immediately return None. We have two nested loops so we can clear the terminal after a registration. The inner loop will always loop when an email/password combo fails but the only time the outer loop will restart is when registerUser() is called and returned (which is why the break statement is there).
-def loginPage():
-    while True:
+        # The writer is opened first so it can switch the database to write-ahead logging.
+        self.writer = self.open()
 
-        # Clears the console.
-        os.system('clear||cls')
+        if (config['wal']):
+            self.writer.execute('PRAGMA journal_mode = WAL;')
 
-        print('This is the login page. Please type a valid email or type \'register\' to register as a new user. Type \'exit\' to exit the login screen.\n')
+        # Separate readers only help in WAL mode. With a rollback journal, an open read would block the writer from committing, so reader() hands out the writer instead.
+        self.wal = (self.writer.execute('PRAGMA journal_mode;').fetchall()[0][0].lower() == 'wal')
 
-        # We keep this in a loop to give the user multiple attempts to log in to any account, or to register and login as may times as they'd like.
-        while True:
+        # The number of transactions committed by write(). Along with PRAGMA data_version, which only changes when other connections commit, this tells caches when the database may have changed. See changeToken().
+        self.commits = 0
 
-            # Getting plaintext email from the user. We convert it to lowercase to get past any casing issues.
-            email = (input('Email: ')).lower().strip()
+        # Idle readers, and the number opened so far. The lock guards the count since readers can be taken from several threads.
+        self.idleReaders = LifoQueue()
+        self.openReaders = 0
+        self.lock = Lock()
 
-            # If input is 'exit', we return. If the input is 'register', then we call registerUser() and once that function is done (regardless if any changes were made) we continue the loop to attempt to log the user in again.
-            if (email == 'exit'):
-                return
-            elif (email == 'register'):
-                registerUser()
-                break
+    # Opens a new connection to the database with foreign key constraints on. With readOnly, the database is opened with a mode=ro URI, so the connection can never write or take a write lock. Connections may be used from any thread, but only by one thread at a time.
+    def open(self, readOnly = False):
 
-            # Getting non-echoed password from user using the getpass() function of the getpass library.
-            password = getpass('Password: ')
+        # When profiling, the connection hands out cursors that time their statements.
+        factory = InstrumentedConnection if config['profile'] else sqlite3.Connection
 
-            if (authenticateUser(email, password)):
-                return email
-            else:
-                print('\nAuthentication failed. Please check your credentials.')
+        if (readOnly):
+            path = 'file:{}?mode=ro'.format(pathname2url(os.path.abspath(self.path)))
+        else:
+            path = self.path
 
-            # For formatting purposes
-            print()
+        connection = sqlite3.connect(path, timeout = config['busyTimeout'] / 1000, check_same_thread = False, factory = factory, uri = readOnly)
+        connection.execute('PRAGMA foreign_keys = ON;')
 
-    return
+        return connection
 
-# Checks if the email & password combo exists in the database.
-def authenticateUser(email, password):
+    # Lends out a read connection for the duration of a with block. A new one is opened if none are idle, up to config['readers'], after which we wait for one to be given back, for up to config['busyTimeout'] milliseconds.
+    @contextmanager
+    def reader(self):
 
-    # Defines the query for autenticating users
-    pQuery = '''
+        if (not self.wal):
+            yield self.writer
+            return
 
-        SELECT
-            COUNT(email)
-        FROM
-            members
-        WHERE
-            lower(email) = ?
-            AND pwd = ? ;
+        with self.lock:
+            opening = self.idleReaders.empty() and self.openReaders < config['readers']
 
-    '''
+            if (opening):
+                self.openReaders += 1
 
-    # Executes the query above with the passed email and password
-    c.execute(pQuery, (email, password))
+        if (opening):
+            # A reader that fails to open gives its place back, so failures can't use up the pool.
+            try:
+                reader = self.open(readOnly = True)
+            except:
+                with self.lock:
+                    self.openReaders -= 1
 
-    # If the count from the query is exactly 1, that means that one user exactly was authenticated with a matching email and password. Since the expression would resolve to a boolean value, the return value is either True or False.
-    return (c.fetchone()[0] == 1)
+                raise
 
-# The main idea of this function is that for any required information it runs a check loop. It grabs a value from the user and runs a series of checks on them. If they fail, we restart the check loop. If they all pass, we break the loop at the end. It then goes onto the next loop. At any point we recieve 'exit' we return to the loginPage().
-def registerUser():
+        else:
+            # Every reader is given back when its with block ends, so waiting longer than the busy timeout means one was never given back.
+            try:
+                reader = self.idleReaders.get(timeout = config['busyTimeout'] / 1000)
+            except Empty:
+                raise sqlite3.OperationalError('No read connection was given back within {} ms; all {} are in use.'.format(config['busyTimeout'], self.openReaders))
 
-    # Clears console
-    os.system('clear||cls')
+        try:
+            yield reader
+        finally:
+            # A reader is always given back outside of a transaction, so the next borrower starts from a fresh snapshot.
+            if (reader.in_transaction):
+                reader.rollback()
 
-    print('This is the registration page. Please type a valid email address and then a password. Type \'exit\' at any point to exit the registration page.\n')
+            self.idleReaders.put(reader)
 
-    # Email match loop
-    while True:
-        # Gets email from the user. Strips leading and trailing whitespace characters.
-        email = input('Email (registration): ').lower().strip()
+    # Lends out a read connection inside a read transaction for the duration of a with block. Under WAL, every query run on it sees the same snapshot of the database, even if other sessions commit in between, and the writer is never held up by it. Used when a page is built from more than one query.
+    @contextmanager
+    def snapshot(self):
 
-        if (email == 'exit'):
+        # Inside a write transaction, the writer already sees one snapshot, which includes what the transaction has done so far.
+        if (self.writer.in_transaction):
+            yield self.writer
             return
 
-        # Uses Regex to match a valid email address. Complains if it does not match.
-        if (fullmatch('^\\b[a-z0-9._-]+@[a-z0-9.-]+\\.[a-z]{1,}\\b$', email) == None):
-            print('This is not a valid formatted email address. Please try again.')
-            continue
+        with self.reader() as reader:
 
-        # Makes sure that the email address is not already in the database. We call lower() to
-        c.execute('SELECT COUNT(email) FROM members WHERE lower(email) = ?;', (email,))
-        if (c.fetchone()[0] != 0):
-            print('The email you specified already exists. Please enter another email address.')
-            continue
+            # Without WAL, reader() hands out the writer, whose transactions belong to write().
+            if (reader is self.writer):
+                yield reader
+                return
 
-        break
+            reader.execute('BEGIN;')
 
-    # Password match loop
-    while True:
+            try:
+                yield reader
+            finally:
+                reader.rollback()
 
-        # Gets password
-        password = getpass('Password (registration): ')
+    # Runs query and returns its first row, or all of its rows. Inside a write transaction (on the thread running it), the query runs on the writer so that it sees what the transaction has done so far. Otherwise it runs on a read connection, so checks and lookups never wait for the writer or hold it up.
+    def fetchone(self, query, params = ()):
 
-        if (password == 'exit'):
-            return
+        with self.connection() as connection:
+            cursor = connection.execute(query, params)
 
-        # Gets a retyped password to verify.
-        if (getpass('Retype password: ') != password):
-            print('Passwords are mismatched. Please recreate your password.')
-            continue
+            try:
+                return cursor.fetchone()
+            finally:
+                cursor.close()
 
-        break
+    def fetchall(self, query, params = ()):
 
-    # Name match loop
-    while True:
+        with self.connection() as connection:
+            return connection.execute(query, params).fetchall()
 
-        # Gets name. Strips leading and trailing whitespace characters.
-        name = input('Name (registration): ').strip()
+    # Lends out the connection that fetchone() and fetchall() run on.
+    @contextmanager
+    def connection(self):
 
-        if (name == 'exit'):
+        if (self.writer.in_transaction):
+            yield self.writer
             return
 
-        if (len(name) < 1):
-            print('Name cannot be empty. Please enter a valid name.')
-            continue
+        with self.reader() as reader:
+            yield reader
 
-        break
+    # Returns a generator that yields the rows of query one at a time, reading them a page at a time (see rows()). When profiling, the statement is attributed to the function calling query() rather than the one reading the rows.
+    def query(self, query, params = ()):
 
-    # Phone match loop
-    while True:
+        return self.rows(query, params, callerOf(sys._getframe(1)) if config['profile'] else None)
 
-        # Gets phone number
-        phone = input('Phone number (registration): ').strip()
+    # Reads the rows of query config['pageRows'] at a time, each page with its own LIMIT and OFFSET on a read connection that is given back as soon as the page has been read. Callers can take as long as they like over the rows (paging through them at a prompt, say) without holding on to a connection, or to a snapshot that keeps the write-ahead log from being checkpointed, and can read more from the database in the meantime, however few readers there are. Since every page is read from a new snapshot, query must be ordered by a unique key, so that rows committed in between can't make a page repeat or skip the rows of the one before.
+    def rows(self, query, params, origin):
 
-        if (phone == 'exit'):
-            return
+        query = query.strip().rstrip(';')
+        offset = 0
 
-        if (fullmatch('^[0-9]\d{2}-\d{3}-\d{4}$', phone) == None):
-            print('This phone number is not valid. Please enter a valid phone number of form XXX-XXX-XXXX.')
-            continue
+        while True:
 
-        break
+            with self.reader() as reader:
 
-    # Register the user. At this point all values should have passed their respective checks so we can assume everything is valid.
-    c.execute('INSERT INTO members VALUES (?, ?, ?, ?)', (email, name, phone, password))
-    conn.commit()
+                with attributedTo(origin):
+                    cursor = reader.execute('{} LIMIT {} OFFSET {};'.format(query, config['pageRows'], offset), params)
 
-    # Print success message
-    print('\nSuccessfully registered member with email address \'{}\'.'.format(email))
+                try:
+                    page = cursor.fetchall()
+                finally:
+                    cursor.close()
 
-    # Prompt user to return back
-    input('Press the enter key to return to the login page. ')
+            yield from page
 
-    return
+            if (len(page) < config['pageRows']):
+                return
 
-# This function handles the main menu functions, and calls all core functionality (book rides, etc.), all assuming a user is authenticated. As a result it calls loginPage() first to try to authenticate/register a user.
-def mainMenu(email):
+            offset += len(page)
 
-    while True:
+    # Calls function(*args) inside a write transaction on the writer connection and commits it, returning what function returned. function does its work through the global cursor c and must not commit. If the database is locked by another session, the transaction is rolled back and tried again after a randomized, doubling delay, up to config['retries'] times.
+    def write(self, function, *args):
 
-        os.system('clear||cls')
+        attempt = 0
 
-        # Prints welcome message again
-        c.execute('SELECT name FROM members WHERE lower(email) = ?;', (email,))
-        print('Logged in as user \'{}\' ({}).\n'.format(c.fetchone()[0], email))
+        while True:
+            try:
+                # BEGIN IMMEDIATE takes the write lock up front, so the transaction cannot fail half way through for lack of it.
+                self.writer.execute('BEGIN IMMEDIATE;')
+                result = function(*args)
+                self.writer.commit()
+                self.commits += 1
 
-        print('This is the main menu. Type \'help\' for commands, or \'logout\' to log out.')
+                return result
 
-        while True:
+            except sqlite3.OperationalError as error:
+                if (self.writer.in_transaction):
+                    self.writer.rollback()
 
-            command = input('Main Menu > ').lower().strip()
+                if (not isLockedError(error) or attempt >= config['retries']):
+                    raise
 
-            if (command == 'help'):
-                print('    - Command - \t- Description -\n'
-                      '    help        \tShow this menu\n'
-                      '    logout      \tLogs out of the currently logged-in user\n\n'
-                      '    offer       \tOffer a ride (Q1)\n'
-                      '    rides       \tSearch for a ride (Q2)\n'
-                      '    bookings    \tBook members or cancel bookings (Q3)\n'
-                      '    post        \tPost a request (Q4)\n'
-                      '    requests    \tSearch or delete ride requests (Q5)\n' )
+            except:
+                if (self.writer.in_transaction):
+                    self.writer.rollback()
 
-            elif (command == 'logout'):
-                return
+                raise
 
-            elif (command == 'offer'):
-                offerRide(email)
-                break
+            sleep(config['backoff'] / 1000 * 2 ** attempt * (0.5 + random()))
+            attempt += 1
 
-            elif (command == 'rides'):
-                searchRide(email)
-                break
+    # Closes every connection.
+    def close(self):
 
-            elif (command == 'bookings'):
-                bookingsPage(email)
-                break
+        while (not self.idleReaders.empty()):
+            self.idleReaders.get().close()
 
-            elif (command == 'post'):
-                postRideRequest(email)
-                break
+        self.writer.close()
 
-            elif (command == 'requests'):
-                requestsPage(email)
-                break
+# Returns whether error means that another session holds a lock on the database.
+def isLockedError(error):
 
-            else:
-                print('Unrecognized command. Type \'help\' for help.\n')
+    message = str(error).lower()
 
-    return
+    return ('locked' in message or 'busy' in message)
 
 ##
-#### Functions for offering rides start here (Q1) ####
+#### Query instrumentation starts here ####
 ##
 
-# This crazy long function esentially runs a bunch of checks whatever information we need for a ride. It then adds those changes to the database and commits.
-def offerRide(email):
+# The statistics gathered by InstrumentedCursor when profiling. statementStats is keyed by the normalized text of a statement (see normalizeQuery()) and holds its calls, total and slowest time (in milliseconds), rows returned, and the functions that ran it. commandHistograms is keyed by command, the screen or command the statements ran under (searchRide, addBooking, batch, ...), and counts its statements by how long they took, in the buckets of histogramBuckets. Readers can run on several threads, so both are guarded by profileLock.
+statementStats = {}
+commandHistograms = {}
+profileLock = Lock()
 
-    os.system('clear||cls')
-    print('You are now attempting to offer a ride. A valid date, number of seats offered, a price per seat, a luggage description, source location, and destination location is required. You have the option of adding a set of enroute locations or a car number. Type \'exit\' at any time to return to the main menu.\n')
+# The upper bounds (in milliseconds) of the histogram buckets. The last bucket holds everything slower.
+histogramBuckets = [0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000]
 
-    while True:
+# The functions that only pass statements along, which are skipped when looking for the function that ran a statement, and the functions that dispatch commands, which mark the top of a command when looking for the command it ran under.
+plumbingFunctions = {'execute', 'executemany', 'query', 'write', 'reader', 'snapshot', 'connection', 'fetchone', 'fetchall', 'lazyRows', 'cachedSearch', '<lambda>', 'showFiveResults', 'fixResults', 'resultsWizard', '__next__', '__init__', '__enter__', 'open'}
+dispatchFunctions = {'main', 'mainMenu', 'runCommand', '<module>', 'run'}
 
-        # Date checking
-        while True:
-            date = input('Please type in a date in format YYYY-MM-DD... > ').lower().strip()
+# The function and command that the statements run on this thread are attributed to, as set by attributedTo(), instead of the ones found on the call stack.
+statementOrigin = local()
 
-            if (date == 'exit'):
-                return
+# Attributes the statements run in a with block to origin, a (function, command) pair from callerOf(). Used by db.query(), whose statements only run once the rows are read, by which time the function that asked for them is no longer on the call stack.
+@contextmanager
+def attributedTo(origin):
 
-            c.execute('SELECT DATE(?);', (date,))
+    statementOrigin.origin = origin
 
-            # Since a format like the following in SQLite is valid (DATE(ddddd...) where d is an integer) we check the number of dashes is exactly equal to 2 so we can avoid this.
-            if (not c.fetchone()[0] or date.count('-') != 2):
-                print('The date is not valid. Please try again.\n')
-                continue
+    try:
+        yield
+    finally:
+        statementOrigin.origin = None
 
-            break
+# A connection whose cursors, including the ones made by its execute() shortcuts, are InstrumentedCursors. It keeps track of the cursors whose statement has not finished yet, and records their statements when it is closed. A cursor thrown away before its statement finished is not recorded, so statements whose rows are not all read should have their cursor closed.
+class InstrumentedConnection(sqlite3.Connection):
 
-        # Seats checking
-        while True:
-            seats = input('Please specify the number of seats you want to offer... > ').lower().strip()
+    def __init__(self, *args, **kwargs):
 
-            if (seats == 'exit'):
-                return
+        super().__init__(*args, **kwargs)
 
-            if (len(seats) < 1):
-                print('Seat number cannot be empty. Please try again.\n')
-                continue
+        self.unfinished = WeakSet()
 
-            try:
-                seats = int(seats)
-            except ValueError:
-                print('The number of seats is not an integer. Please try again.\n')
-                continue
+    def close(self):
 
-            break
+        for cursor in list(self.unfinished):
+            cursor.finish()
 
-        # Price checking
-        while True:
-            price = input('Please enter the price per seat as an integer... > ').lower().strip()
+        super().close()
 
-            if (price == 'exit'):
-                return
+    def cursor(self, factory = None):
+        return super().cursor(factory or InstrumentedCursor)
 
-            if (len(price) < 1):
-                print('Price cannot be empty. Please try again.\n')
-                continue
+    def execute(self, query, params = ()):
+        return self.cursor().execute(query, params)
 
-            try:
-                price = int(price)
-            except ValueError:
-                print('The price specified is not an integer. Please try again.\n')
-                continue
+    def executemany(self, query, params):
+        return self.cursor().executemany(query, params)
 
-            break
+# A cursor that times each statement it runs, from execute() until its last row has been fetched, and counts the rows returned. The statement is recorded with recordStatement() when it finishes: when its rows run out, when the cursor runs another statement or is closed, or when its connection is closed.
+class InstrumentedCursor(sqlite3.Cursor):
 
-        # Description checking
-        while True:
-            luggageDesc = input('Please enter luggage description... > ').lower().strip()
+    def __init__(self, *args):
 
-            if (luggageDesc == 'exit'):
-                return
+        super().__init__(*args)
 
-            if (len(luggageDesc) == 0):
-                print('Description cannot be empty. Please try again.\n')
-                continue
+        # The statement being run, as [normalized text, caller, command, milliseconds, rows], or None.
+        self.statement = None
 
-            break
+    def execute(self, query, params = ()):
+        return self.run(super().execute, query, params)
+
+    def executemany(self, query, params):
+        return self.run(super().executemany, query, params)
+
+    def fetchone(self):
+
+        row = self.timed(super().fetchone)
+        self.counted(1 if row != None else 0, row == None)
+
+        return row
+
+    def fetchmany(self, size = None):
+
+        rows = self.timed(super().fetchmany, size or self.arraysize)
+        self.counted(len(rows), len(rows) < (size or self.arraysize))
+
+        return rows
+
+    def fetchall(self):
+
+        rows = self.timed(super().fetchall)
+        self.counted(len(rows), True)
+
+        return rows
+
+    def __next__(self):
+
+        try:
+            row = self.timed(super().__next__)
+        except StopIteration:
+            self.counted(0, True)
+            raise
+
+        self.counted(1, False)
+
+        return row
+
+    def close(self):
+
+        self.finish()
+        super().close()
+
+    # Starts timing a new statement and runs it with execute, which is the execute() or executemany() of sqlite3.Cursor.
+    def run(self, execute, query, params):
+
+        self.finish()
+
+        caller, command = getattr(statementOrigin, 'origin', None) or callerOf(sys._getframe(1))
+        self.statement = [normalizeQuery(query), caller, command, 0, 0]
+        self.connection.unfinished.add(self)
+
+        self.timed(execute, query, params)
+
+        # Statements that return no rows (inserts, updates, ...) are done as soon as they have run.
+        if (self.description == None):
+            self.finish()
+
+        return self
+
+    # Calls function(*args), adding the time it took to the statement being run.
+    def timed(self, function, *args):
+
+        start = perf_counter()
+
+        try:
+            return function(*args)
+        finally:
+            if (self.statement):
+                self.statement[3] += (perf_counter() - start) * 1000
+
+    # Adds rows to the statement being run, and records it if its rows ran out.
+    def counted(self, rows, exhausted):
+
+        if (self.statement):
+            self.statement[4] += rows
+
+        if (exhausted):
+            self.finish()
+
+    # Records the statement being run, if there is one.
+    def finish(self):
+
+        if (self.statement):
+            recordStatement(*self.statement)
+            self.statement = None
+            self.connection.unfinished.discard(self)
+
+# Returns the function that ran a statement and the command it ran under, as names, by walking up the call stack from frame. The function is the first one that isn't plumbing. The command is the last one below a dispatch function (a screen like searchRide, or a command like runBatch), or the function itself if there is none.
+def callerOf(frame):
+
+    caller = None
+    command = None
+
+    while (frame != None):
+
+        name = frame.f_code.co_name
+
+        if (name in dispatchFunctions):
+            break
+
+        if (caller == None and name not in plumbingFunctions):
+            caller = name
+
+        if (name not in plumbingFunctions):
+            command = name
+
+        frame = frame.f_back
+
+    return caller or '?', command or caller or '?'
+
+# Turns a statement into the text it is grouped by: the whitespace is collapsed, literal strings and numbers are replaced by '?', and lists of placeholders (like those built for IN) are shortened to one, so that the same statement run with different values is only counted once.
+def normalizeQuery(query):
+
+    query = ' '.join(query.split())
+    query = sub(r"'(?:[^']|'')*'", '?', query)
+    query = sub(r'\b\d+(\.\d+)?\b', '?', query)
+    query = sub(r'\?(\s*,\s*\?)+', '?, ...', query)
+
+    return query
+
+# Adds a finished statement to statementStats and commandHistograms, and writes it to the slow query log if it took more than config['slowQueryMs'] milliseconds.
+def recordStatement(query, caller, command, milliseconds, rows):
+
+    with profileLock:
+
+        stats = statementStats.setdefault(query, {'calls': 0, 'totalMs': 0, 'maxMs': 0, 'rows': 0, 'callers': set()})
+        stats['calls'] += 1
+        stats['totalMs'] += milliseconds
+        stats['maxMs'] = max(stats['maxMs'], milliseconds)
+        stats['rows'] += rows
+        stats['callers'].add(caller)
+
+        histogram = commandHistograms.setdefault(command, [0] * (len(histogramBuckets) + 1))
+        histogram[sum(1 for bound in histogramBuckets if milliseconds > bound)] += 1
+
+        if (milliseconds > config['slowQueryMs']):
+            with open(config['slowQueryLog'], 'a') as logFile:
+                logFile.write('{}\t{:.1f} ms\t{} rows\t{} ({})\t{}\n'.format(datetime.datetime.now().isoformat(timespec = 'seconds'), milliseconds, rows, caller, command, query))
+
+    return
+
+# Prints the statements that took the most time in total, the histogram of statement times of every command, and how often searches were answered from searchCache. Does nothing unless profiling.
+def printProfile():
+
+    if (not config['profile']):
+        return
+
+    with profileLock:
+
+        print('\nStatements by total time:')
+
+        formatString = '    {:>10}  {:>7}  {:>10}  {:>10}  {:>9}  {:<24}  {}'
+        print(formatString.format('Total (ms)', 'Calls', 'Mean (ms)', 'Max (ms)', 'Rows', 'Called by', 'Statement'))
+
+        for query, stats in sorted(statementStats.items(), key = lambda item: -item[1]['totalMs'])[:20]:
+            callers = ', '.join(sorted(stats['callers']))
+            print(formatString.format('{:.1f}'.format(stats['totalMs']), stats['calls'], '{:.3f}'.format(stats['totalMs'] / stats['calls']), '{:.3f}'.format(stats['maxMs']), stats['rows'], callers[:24], query[:100]))
+
+        print('\nStatements per command by time taken (ms):')
+
+        bucketNames = ['<={}'.format(bound) for bound in histogramBuckets] + ['>{}'.format(histogramBuckets[-1])]
+        formatString = '    {:<20}' + '  {:>7}' * len(bucketNames)
+        print(formatString.format('Command', *bucketNames))
+
+        for command, histogram in sorted(commandHistograms.items()):
+            print(formatString.format(command[:20], *histogram))
+
+    searches = searchCache['hits'] + searchCache['misses']
+
+    if (searches > 0):
+        print('\nSearch cache: {} hits and {} misses ({:.0%} hits), {} searches cached.'.format(searchCache['hits'], searchCache['misses'], searchCache['hits'] / searches, len(searchCache['results'])))
+
+    return
+
+##
+#### Query registry starts here ####
+##
+
+# The statements run on the paths members wait on, by name, so they can all be found (and their query plans checked, see checkPlans()) in one place. The statements with {} fields are completed by the function that runs them, from the pieces named in its comment. Every statement here should be answered with index searches: add an example to planChecks() when adding one. Statements read through db.query() are read a page at a time, so they must be ordered by a unique key.
+queries = {
+
+    # authenticateUser(): the members with an email and password.
+    'authenticate': '''
+
+        SELECT
+            COUNT(email)
+        FROM
+            members
+        WHERE
+            lower(email) = ?
+            AND pwd = ? ;
+
+    ''',
+
+    # unreadCount() and unreadMessages(): the unread messages of a member, and the oldest five of them. Both are read from the inbox_unseen partial index.
+    'unreadCount': '''
+
+        SELECT
+            COUNT(*)
+        FROM
+            inbox
+        WHERE
+            lower(email) = ?
+            AND lower(seen) = 'n' ;
+
+    ''',
+
+    'unreadMessages': '''
+
+        SELECT
+            rowid,
+            sender,
+            DATE(msgTimestamp),
+            TIME(msgTimestamp),
+            content
+        FROM
+            inbox
+        WHERE
+            lower(email) = ?
+            AND lower(seen) = 'n'
+        ORDER BY
+            msgTimestamp
+        LIMIT 5 ;
+
+    ''',
+
+    # getProfile(): the name and phone, and the cars, of a member.
+    'profile': 'SELECT name, phone FROM members WHERE lower(email) = ?;',
+    'profileCars': 'SELECT cno, make, model, year, seats FROM cars WHERE lower(owner) = ? ORDER BY cno;',
+
+    # searchLocation(): the locations whose lcode is in the query from locationCodesQuery().
+    'searchLocations': '''
+
+        SELECT
+            lcode,
+            city,
+            prov,
+            address
+        FROM
+            locations
+        WHERE
+            lcode IN ({})
+        ORDER BY
+            lcode ;
+
+    ''',
+
+    # searchRides(): the rides whose rno is in the rides query, after the CTEs that resolve the keywords to lcodes.
+    'searchRides': '''
+
+        WITH {}
+        SELECT
+            r.rno,
+            r.price,
+            r.rdate,
+            r.seats,
+            r.lugDesc,
+            r.driver,
+            c.cno,
+            c.make,
+            c.model,
+            c.year,
+            c.seats
+        FROM
+            rides AS r
+        LEFT OUTER JOIN
+            cars AS c USING(cno)
+        WHERE
+            r.rno IN ({})
+        ORDER BY
+            r.rno ;
+
+    ''',
+
+    # driverRides(): the rides of a driver with their booked and available seats.
+    'getRides': '''
+
+        SELECT
+            r.rno AS rno,
+            a.booked AS booked,
+            a.seats - a.booked AS available,
+            r.rdate
+        FROM
+            rides AS r
+        INNER JOIN
+            ride_availability AS a ON a.rno = r.rno
+        WHERE
+            lower(r.driver) = ?
+        ORDER BY
+            r.rno
+
+    ''',
+
+    # driverBookings(): the bookings on the rides of a driver.
+    'getAllBookings': '''
+
+        SELECT
+            b.*
+        FROM
+            bookings AS b
+        INNER JOIN
+            rides AS r ON r.rno = b.rno
+        WHERE
+            lower(r.driver) = ?
+        ORDER BY
+            b.bno
+
+    ''',
+
+    # seatsLeft(): the seats left on a ride.
+    'getSeats': '''
+
+        SELECT
+            seats - booked AS available
+        FROM
+            ride_availability
+        WHERE
+            rno = ?
+
+    ''',
+
+    # cancelBooking() and batchCancel(): whether a booking exists, and whether it is on a ride of the driver cancelling it.
+    'bookingExists': 'SELECT COUNT(bno) FROM bookings WHERE bno = ? ;',
+
+    'verify': '''
+
+        SELECT
+            COUNT(b.bno)
+        FROM
+            bookings AS b
+        INNER JOIN
+            rides AS r ON r.rno = b.rno
+        WHERE
+            b.bno = ?
+            AND lower(r.driver) = ? ;
+
+    ''',
+
+    # requestsAt(): the requests picking up at a location whose lcode or city is the keyword. The locations are found first, through locations_lower_lcode and locations_lower_city, and then their requests through requests_pickup_rdate.
+    'searchRequests': '''
+
+        SELECT
+            r.*
+        FROM
+            requests AS r
+        WHERE
+            r.pickup IN (
+                SELECT
+                    lcode
+                FROM
+                    locations
+                WHERE
+                    lower(lcode) = :keyword
+                    OR lower(city) = :keyword
+            )
+        ORDER BY
+            r.rid ;
+
+    ''',
+
+    # memberRequests() and deleteRequest(): the requests of a member, and deleting one of them.
+    'memberRequests': 'SELECT * FROM requests WHERE lower(email) = ? ORDER BY rid;',
+    'deleteRequest': 'DELETE FROM requests WHERE rid = ? AND lower(email) = ?;',
+
+    # broadcastMessage(): the members booked on a ride, or the members with a request for today or later picking up at a location whose lcode or city is the keyword (found as in searchRequests), other than the sender. Members with several bookings or requests are only returned once. broadcastInsert sends a message to each of them, leaving out the ones who already got a message this second, since the inbox is keyed by (email, msgTimestamp).
+    'broadcastRide': '''
+
+        SELECT DISTINCT
+            b.email
+        FROM
+            bookings AS b
+        WHERE
+            b.rno = :rno
+            AND lower(b.email) != :sender
+
+    ''',
+
+    'broadcastRequests': '''
+
+        SELECT DISTINCT
+            r.email
+        FROM
+            requests AS r
+        WHERE
+            r.pickup IN (
+                SELECT
+                    lcode
+                FROM
+                    locations
+                WHERE
+                    lower(lcode) = :keyword
+                    OR lower(city) = :keyword
+            )
+            AND r.rdate >= DATE('now')
+            AND lower(r.email) != :sender
+
+    ''',
+
+    'broadcastInsert': '''
+
+        INSERT INTO inbox
+        SELECT
+            m.email,
+            DATETIME('now'),
+            :sender,
+            :content,
+            :rno,
+            'n'
+        FROM
+            ({}) AS m
+        WHERE
+            NOT EXISTS (SELECT * FROM inbox AS i WHERE i.email = m.email AND i.msgTimestamp = DATETIME('now')) ;
+
+    ''',
+
+    # matchRidesQuery(): the matches between requests and rides, with the conditions that pick the request or ride to match. See matchRidesQuery() for how they are found.
+    'matchRides': '''
+
+        SELECT
+            q.rid,
+            q.email,
+            q.rdate,
+            q.pickup,
+            q.dropoff,
+            q.amount,
+            r.rno,
+            r.driver,
+            r.price,
+            a.seats - a.booked
+        FROM
+            requests AS q
+        INNER JOIN
+            route_stops AS p ON p.lcode = q.pickup
+        INNER JOIN
+            rides AS r ON r.rno = p.rno AND r.rdate = q.rdate
+        INNER JOIN
+            ride_availability AS a ON a.rno = r.rno
+        WHERE
+            r.price <= q.amount
+            AND a.seats - a.booked > 0
+            AND lower(r.driver) != lower(q.email)
+            AND EXISTS (SELECT 1 FROM route_stops AS d WHERE d.rno = r.rno AND d.pos > p.pos AND d.lcode = q.dropoff)
+            {}
+        GROUP BY
+            q.rid,
+            r.rno
+        ORDER BY
+            q.rid,
+            r.price,
+            r.rno ;
+
+    '''
+
+}
+
+##
+#### Login, Registration, and core menu functions start here ####
+##
+
+# Connects to a specified database specified with path. It creates the connection manager, and points conn and c to its writer connection and a cursor on it.
+def connect(path):
+
+    # We declare globals db, conn and c since we must modify them directly. This statement should not appear in any other function since we should never re-modify where db, conn or c points to.
+    global db, conn, c
+
+    db = ConnectionManager(path)
+    conn = db.writer
+    c = conn.cursor()
+
+    # Makes sure the indexes and triggers we rely on exist in this database. Setting them up takes the write lock, so it is only done when the database was last upgraded by an older version of the program, or when it has location index triggers that this build of SQLite can't run. Otherwise we only read the schema. The upgrade command sets everything up regardless.
+    state = checkLocationIndex()
+
+    c.execute('PRAGMA user_version;')
+
+    if (c.fetchone()[0] < schemaVersion or state == 'broken'):
+        db.write(upgradeSchema)
+
+    return
+
+# Creates the extra indexes, triggers and shadow tables that the queries in this program rely on, and records schemaVersion in PRAGMA user_version. Every statement in here is idempotent, so it is safe to run on a database that is already up to date. Meant to be run through db.write(), so that it all happens in one transaction.
+def upgradeSchema():
+
+    # Exact lcode lookups are written as lower(lcode) = ?, which a plain primary key index cannot serve.
+    c.execute('CREATE INDEX IF NOT EXISTS locations_lower_lcode ON locations(lower(lcode));')
+
+    # Lets requestsAt() find the locations of a city without scanning every location.
+    c.execute('CREATE INDEX IF NOT EXISTS locations_lower_city ON locations(lower(city));')
+
+    # Likewise, members are looked up with lower(email) = ? (and drivers with lower(driver) = ?), so we index those expressions.
+    c.execute('CREATE INDEX IF NOT EXISTS members_lower_email ON members(lower(email));')
+    c.execute('CREATE INDEX IF NOT EXISTS rides_lower_driver ON rides(lower(driver));')
+    c.execute('CREATE INDEX IF NOT EXISTS inbox_lower_email ON inbox(lower(email));')
+
+    # Only covers unread messages, so counting and paging through a member's unread messages never touches the ones already read.
+    c.execute('CREATE INDEX IF NOT EXISTS inbox_unseen ON inbox(lower(email), msgTimestamp) WHERE lower(seen) = \'n\';')
+    c.execute('CREATE INDEX IF NOT EXISTS requests_lower_email ON requests(lower(email));')
+    c.execute('CREATE INDEX IF NOT EXISTS bookings_lower_email ON bookings(lower(email));')
+
+    # Lets searchRides() find the rides touching a location without scanning every ride and enroute row.
+    c.execute('CREATE INDEX IF NOT EXISTS rides_src ON rides(src);')
+    c.execute('CREATE INDEX IF NOT EXISTS rides_dst ON rides(dst);')
+    c.execute('CREATE INDEX IF NOT EXISTS enroute_lcode ON enroute(lcode);')
+
+    # Lets matchRides() find the requests picking up at a location on a date with an index lookup. It finds the rides through route_stops.
+    c.execute('CREATE INDEX IF NOT EXISTS requests_pickup_rdate ON requests(pickup, rdate);')
+
+    # Lets getProfile() find the cars of a member without scanning every car.
+    c.execute('CREATE INDEX IF NOT EXISTS cars_lower_owner ON cars(lower(owner));')
+
+    setupLocationIndex()
+    setupAvailability()
+    setupRouteStops()
+    setupIdSequences()
+    setupTableVersions()
+    setupChangeLog()
+
+    c.execute('PRAGMA user_version = {};'.format(schemaVersion))
+
+    return
+
+# Creates table_versions, which holds a counter for every table in versionedTables that triggers bump whenever a row of it is inserted, updated or deleted, by this session or any other.
+def setupTableVersions():
+
+    c.execute('CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INT NOT NULL);')
+
+    for table in versionedTables:
+
+        c.execute('INSERT OR IGNORE INTO table_versions VALUES (?, 0);', (table,))
+
+        for event in ('insert', 'update', 'delete'):
+
+            qTrigger = '''
+                CREATE TRIGGER IF NOT EXISTS table_versions_{0}_{1} AFTER {1} ON {0} BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{0}';
+                END;
+            '''.format(table, event)
+
+            c.execute(qTrigger)
+
+    return
+
+# Creates change_log, which holds the keys of the rows of every table in loggedTables that were inserted, updated or deleted, in the order they changed. Triggers add the old and new key of every changed row. Only the last changeLogRows changes are kept, so a cache that fell further behind than that reads its table again in full. A key of NULL means that the whole table changed (see importRows()).
+def setupChangeLog():
+
+    c.execute('CREATE TABLE IF NOT EXISTS change_log (seq INTEGER PRIMARY KEY, name TEXT NOT NULL, key);')
+
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS change_log_trim AFTER INSERT ON change_log BEGIN
+            DELETE FROM change_log WHERE seq <= new.seq - {};
+        END;
+    '''.format(changeLogRows))
+
+    for table, column in loggedTables.items():
+
+        qTriggers = [
+
+            '''
+            CREATE TRIGGER IF NOT EXISTS change_log_{0}_insert AFTER INSERT ON {0} BEGIN
+                INSERT INTO change_log (name, key) VALUES ('{0}', new.{1});
+            END;
+            ''',
+
+            '''
+            CREATE TRIGGER IF NOT EXISTS change_log_{0}_delete AFTER DELETE ON {0} BEGIN
+                INSERT INTO change_log (name, key) VALUES ('{0}', old.{1});
+            END;
+            ''',
+
+            '''
+            CREATE TRIGGER IF NOT EXISTS change_log_{0}_update AFTER UPDATE ON {0} BEGIN
+                INSERT INTO change_log (name, key) VALUES ('{0}', old.{1});
+                INSERT INTO change_log (name, key) SELECT '{0}', new.{1} WHERE new.{1} IS NOT old.{1};
+            END;
+            '''
+
+        ]
+
+        for qTrigger in qTriggers:
+            c.execute(qTrigger.format(table, column))
+
+    return
+
+# Returns a value that changes whenever the database may have changed: PRAGMA data_version changes when another connection commits, and db.commits when we do. Caches compare it with the value they were built at before doing anything more expensive.
+def changeToken():
+
+    c.execute('PRAGMA data_version;')
+
+    return (c.fetchone()[0], db.commits)
+
+# Returns the versions of the given tables (from versionedTables) as a dictionary.
+def tableVersions(tables):
+
+    return dict(db.fetchall('SELECT name, version FROM table_versions WHERE name IN ({});'.format(', '.join('?' * len(tables))), tables))
+
+# Creates id_sequences, which holds the next unused key of every table in idColumns. It is seeded from the largest key already in each table. Triggers move a sequence forward whenever a row is inserted with a key at or past it, so rows inserted with explicit keys (by bulk loaders, for example) are never handed out again.
+def setupIdSequences():
+
+    c.execute('CREATE TABLE IF NOT EXISTS id_sequences (name TEXT PRIMARY KEY, next INT NOT NULL);')
+
+    for table, column in idColumns.items():
+
+        c.execute('INSERT OR IGNORE INTO id_sequences SELECT ?, IFNULL(MAX({}) + 1, 1) FROM {};'.format(column, table), (table,))
+
+        qTrigger = '''
+            CREATE TRIGGER IF NOT EXISTS id_sequences_{0} AFTER INSERT ON {0}
+            WHEN new.{1} >= (SELECT next FROM id_sequences WHERE name = '{0}') BEGIN
+                UPDATE id_sequences SET next = new.{1} + 1 WHERE name = '{0}';
+            END;
+        '''.format(table, column)
+
+        c.execute(qTrigger)
+
+    return
+
+# Hands out count consecutive unused keys for table (one of idColumns) and returns the first one. This must run inside the transaction that inserts the rows: the UPDATE takes the write lock on the database, so no other session can be handed the same keys, and the keys are only given up if the transaction is rolled back.
+def allocateIds(table, count = 1):
+
+    c.execute('UPDATE id_sequences SET next = next + ? WHERE name = ?;', (count, table))
+    c.execute('SELECT next - ? FROM id_sequences WHERE name = ?;', (count, table))
+
+    return c.fetchone()[0]
+
+# Creates ride_availability, which holds the seats offered and seats booked for every ride so that the seats left on a ride can be read without summing its bookings. Triggers on rides and bookings keep it current. It is filled from the existing rides and bookings when first created.
+def setupAvailability():
+
+    c.execute('SELECT COUNT(name) FROM sqlite_master WHERE type = \'table\' AND name = \'ride_availability\';')
+
+    if (c.fetchone()[0] == 0):
+        c.execute('CREATE TABLE ride_availability (rno INTEGER PRIMARY KEY, seats INT, booked INT NOT NULL DEFAULT 0);')
+        fillAvailability()
+
+    # The triggers recount the bookings of a ride when it is added, since bookings can be loaded before the ride they belong to.
+    c.execute('CREATE INDEX IF NOT EXISTS bookings_rno ON bookings(rno);')
+
+    qTriggers = [
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_ride_insert AFTER INSERT ON rides BEGIN
+            INSERT OR REPLACE INTO ride_availability
+                VALUES (new.rno, new.seats, (SELECT IFNULL(SUM(seats), 0) FROM bookings WHERE rno = new.rno));
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_ride_delete AFTER DELETE ON rides BEGIN
+            DELETE FROM ride_availability WHERE rno = old.rno;
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_ride_update AFTER UPDATE OF rno, seats ON rides BEGIN
+            DELETE FROM ride_availability WHERE rno = old.rno;
+            INSERT OR REPLACE INTO ride_availability
+                VALUES (new.rno, new.seats, (SELECT IFNULL(SUM(seats), 0) FROM bookings WHERE rno = new.rno));
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_booking_insert AFTER INSERT ON bookings BEGIN
+            UPDATE ride_availability SET booked = booked + IFNULL(new.seats, 0) WHERE rno = new.rno;
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_booking_delete AFTER DELETE ON bookings BEGIN
+            UPDATE ride_availability SET booked = booked - IFNULL(old.seats, 0) WHERE rno = old.rno;
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS ride_availability_booking_update AFTER UPDATE OF rno, seats ON bookings BEGIN
+            UPDATE ride_availability SET booked = booked - IFNULL(old.seats, 0) WHERE rno = old.rno;
+            UPDATE ride_availability SET booked = booked + IFNULL(new.seats, 0) WHERE rno = new.rno;
+        END;
+        '''
+
+    ]
+
+    for qTrigger in qTriggers:
+        c.execute(qTrigger)
+
+    return
+
+# Fills ride_availability from scratch by summing the bookings of every ride.
+def fillAvailability():
+
+    c.execute('DELETE FROM ride_availability;')
+
+    qFill = '''
+
+        INSERT INTO ride_availability
+        SELECT
+            r.rno,
+            r.seats,
+            IFNULL(SUM(b.seats), 0)
+        FROM
+            rides AS r
+        LEFT OUTER JOIN
+            bookings AS b ON b.rno = r.rno
+        GROUP BY
+            r.rno,
+            r.seats
+
+    '''
+
+    c.execute(qFill)
+
+    return
+
+# Creates route_stops, which holds the stops of every ride in order: the source at position 0, then the enroute locations in the order they were added, then the destination. The route_stops_lcode index maps a location to the rides stopping there and where, so questions like "does this ride pass through A and then B" are answered from the index instead of joining rides and enroute once per location. Triggers renumber the stops of a ride whenever the ride or its enroute locations change.
+def setupRouteStops():
+
+    c.execute('SELECT COUNT(name) FROM sqlite_master WHERE type = \'table\' AND name = \'route_stops\';')
+
+    if (c.fetchone()[0] == 0):
+        c.execute('CREATE TABLE route_stops (rno INT, pos INT, lcode TEXT, PRIMARY KEY (rno, pos));')
+        fillRouteStops()
+
+    c.execute('CREATE INDEX IF NOT EXISTS route_stops_lcode ON route_stops(lcode, rno, pos);')
+
+    # Numbers the stops of ride {0} again from rides and enroute. Enroute locations are numbered by rowid, which is the order they were inserted in. Enroute rows loaded before their ride are numbered once the ride arrives.
+    qRenumber = '''
+            DELETE FROM route_stops WHERE rno = {0};
+            INSERT INTO route_stops SELECT rno, 0, src FROM rides WHERE rno = {0};
+            INSERT INTO route_stops
+                SELECT rno, ROW_NUMBER() OVER (ORDER BY rowid), lcode FROM enroute WHERE rno = {0} AND EXISTS (SELECT 1 FROM rides WHERE rno = {0});
+            INSERT INTO route_stops SELECT rno, (SELECT COUNT(lcode) FROM enroute WHERE rno = {0}) + 1, dst FROM rides WHERE rno = {0};
+    '''
+
+    qTriggers = [
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_ride_insert AFTER INSERT ON rides BEGIN {}
+        END;
+        '''.format(qRenumber.format('new.rno')),
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_ride_delete AFTER DELETE ON rides BEGIN
+            DELETE FROM route_stops WHERE rno = old.rno;
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_ride_update AFTER UPDATE OF rno, src, dst ON rides BEGIN
+            DELETE FROM route_stops WHERE rno = old.rno; {}
+        END;
+        '''.format(qRenumber.format('new.rno')),
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_enroute_insert AFTER INSERT ON enroute BEGIN {}
+        END;
+        '''.format(qRenumber.format('new.rno')),
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_enroute_delete AFTER DELETE ON enroute BEGIN {}
+        END;
+        '''.format(qRenumber.format('old.rno')),
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS route_stops_enroute_update AFTER UPDATE OF rno, lcode ON enroute BEGIN {} {}
+        END;
+        '''.format(qRenumber.format('old.rno'), qRenumber.format('new.rno'))
+
+    ]
+
+    for qTrigger in qTriggers:
+        c.execute(qTrigger)
+
+    return
+
+# Fills route_stops from scratch with the stops of every ride.
+def fillRouteStops():
+
+    c.execute('DELETE FROM route_stops;')
+
+    qFill = '''
+
+        INSERT INTO route_stops
+        SELECT
+            rno,
+            0,
+            src
+        FROM
+            rides
+        UNION ALL
+        SELECT
+            e.rno,
+            ROW_NUMBER() OVER (PARTITION BY e.rno ORDER BY e.rowid),
+            e.lcode
+        FROM
+            enroute AS e
+        INNER JOIN
+            rides AS r ON r.rno = e.rno
+        UNION ALL
+        SELECT
+            r.rno,
+            (SELECT COUNT(lcode) FROM enroute WHERE rno = r.rno) + 1,
+            r.dst
+        FROM
+            rides AS r
+
+    '''
+
+    c.execute(qFill)
+
+    return
+
+# Creates locations_fts, an FTS5 index over the city, province and address of every location using the trigram tokenizer, which lets us answer '%keyword%' substring searches from the index instead of scanning the whole locations table. It is an external content index: it only holds the index, keyed by the rowid of each location, and reads the columns themselves from locations. Triggers keep it in sync with locations, finding the entries of a location by rowid. VACUUM may renumber the rowids of locations, after which the upgrade command must be run to rebuild the index. If FTS5 or the trigram tokenizer is not compiled into SQLite, ftsEnabled is left False, and any triggers of an index made by another build are dropped, since every write to locations would fail on them. The table itself can only be dropped by a build with FTS5, so it is left for the next such build to refill.
+def setupLocationIndex():
+
+    # We modify the flag that tells searchLocation() which query to use.
+    global ftsEnabled
+
+    state = checkLocationIndex()
+
+    if (state == 'ready'):
+        return
+
+    for event in ('insert', 'delete', 'update'):
+        c.execute('DROP TRIGGER IF EXISTS locations_fts_{};'.format(event))
+
+    try:
+        # Indexes made by older versions of the program held a copy of every location, and found the entries to delete by scanning it, so we replace them.
+        if (state == 'outdated'):
+            c.execute('DROP TABLE locations_fts;')
+
+        c.execute('CREATE VIRTUAL TABLE IF NOT EXISTS locations_fts USING fts5(lcode UNINDEXED, city, prov, address, content = \'locations\', content_rowid = \'rowid\', tokenize = \'trigram\');')
+
+        # If the index did exist its triggers were missing, so it may be out of date. Either way we fill it from scratch.
+        fillLocationIndex()
+
+    except sqlite3.OperationalError:
+        return
+
+    qTriggers = [
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS locations_fts_insert AFTER INSERT ON locations BEGIN
+            INSERT INTO locations_fts (rowid, lcode, city, prov, address) VALUES (new.rowid, new.lcode, new.city, new.prov, new.address);
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS locations_fts_delete AFTER DELETE ON locations BEGIN
+            INSERT INTO locations_fts (locations_fts, rowid, lcode, city, prov, address) VALUES (\'delete\', old.rowid, old.lcode, old.city, old.prov, old.address);
+        END;
+        ''',
+
+        '''
+        CREATE TRIGGER IF NOT EXISTS locations_fts_update AFTER UPDATE ON locations BEGIN
+            INSERT INTO locations_fts (locations_fts, rowid, lcode, city, prov, address) VALUES (\'delete\', old.rowid, old.lcode, old.city, old.prov, old.address);
+            INSERT INTO locations_fts (rowid, lcode, city, prov, address) VALUES (new.rowid, new.lcode, new.city, new.prov, new.address);
+        END;
+        '''
+
+    ]
+
+    for qTrigger in qTriggers:
+        c.execute(qTrigger)
+
+    ftsEnabled = True
+
+    return
+
+# Finds out, without writing anything, whether locations_fts can be used, and sets ftsEnabled accordingly. Returns 'ready' if the index and its triggers exist and this build of SQLite can read it, 'broken' if there are triggers on locations that this build can't run (because it has no FTS5 or the index is gone), 'outdated' if the index was made by an older version of the program, and 'missing' otherwise.
+def checkLocationIndex():
+
+    global ftsEnabled
+
+    ftsEnabled = False
+
+    c.execute('SELECT COUNT(name) FROM sqlite_master WHERE type = \'trigger\' AND name IN (\'locations_fts_insert\', \'locations_fts_delete\', \'locations_fts_update\');')
+    triggers = c.fetchone()[0]
+
+    try:
+        c.execute('SELECT lcode FROM locations_fts LIMIT 0;')
+    except sqlite3.OperationalError:
+        return 'broken' if triggers > 0 else 'missing'
+
+    c.execute('SELECT sql FROM sqlite_master WHERE type = \'table\' AND name = \'locations_fts\';')
+
+    if ('content = \'locations\'' not in c.fetchone()[0]):
+        return 'outdated'
+
+    if (triggers < 3):
+        return 'missing'
+
+    ftsEnabled = True
+
+    return 'ready'
+
+# Fills locations_fts from scratch with every location.
+def fillLocationIndex():
+
+    c.execute('INSERT INTO locations_fts (locations_fts) VALUES (\'rebuild\');')
+
+    return
+
+# This function semantically "logs in" a user, based on the email that is returned from loginPage(). After a valid email has been passed, it prints unread messages for that user, sets them to read, and then prompts the user to enter the main menu. i.e. it returns to main() with the valid "logged in" email.
+def login():
+    # We attempt to sign in a user using loginPage(). Assuming that a valid email has been returned, it is already in lowercase.
+    email = loginPage()
+
+    # We must check this since past this point we assume that a user (denoted by email) is registered. If email == None, then that means we have failed to authenticate a user and have received an exit command.
+    if email == None:
+        return
+
+    # At this point we consider the user logged in.
+    clearScreen()
+
+    # Prints a welcome message to the user. This loads their profile, which the main menu reuses.
+    print('Logged in as user \'{}\' ({}).\n'.format(getProfile(email)['name'], email))
+
+    # Shows the unread messages, a page at a time
+    showInbox(email)
+
+    # Prompt user to advance to the main menu
+    input('Press the enter key to advance to the main menu. ')
+
+    return email
+
+# Shows the unread messages of a member five at a time, oldest first. Only the messages that are shown are marked as read, with one UPDATE per page. The unread count and the pages are read from the inbox_unseen partial index, so they only touch unread messages.
+def showInbox(email):
+
+    unread = unreadCount(email)
+
+    # Print a message if there are no unread messages
+    if (unread == 0):
+        print('No new messages.\n')
+        return
+
+    print('You have {} unread message{}.\n'.format(unread, '' if unread == 1 else 's'))
+
+    while True:
+
+        # The messages shown are marked as read, so this always gets the next page.
+        messageList = unreadMessages(email)
+
+        if (not messageList):
+            print('No more messages.\n')
+            return
+
+        # Prints the page of unread messages
+        for message in messageList:
+            print('Message from \'{}\' on {}, {}:\n\t\"{}\"\n'.format(*message[1:]))
+
+        # Set the messages shown to read
+        db.write(markSeen, [message[0] for message in messageList])
+
+        unread -= len(messageList)
+
+        if (unread <= 0):
+            return
+
+        command = input('{} unread messages left. Type \'more\' to read more, or anything else to stop reading... > '.format(unread)).lower().strip()
+
+        if (command != 'more'):
+            print()
+            return
+
+# Returns the number of unread messages of a member.
+def unreadCount(email):
+
+    return db.fetchone(queries['unreadCount'], (email,))[0]
+
+# Returns the oldest five unread messages of a member as (rowid, sender, date, time, content) rows.
+def unreadMessages(email):
+
+    return db.fetchall(queries['unreadMessages'], (email,))
+
+# Marks the inbox messages with the given rowids as read. Meant to be run through db.write().
+def markSeen(rowids):
+
+    c.execute('UPDATE inbox SET seen = \'y\' WHERE rowid IN ({});'.format(', '.join('?' * len(rowids))), rowids)
+
+    return
+
+# Returns the profile of a member: a dictionary with their name, phone, and cars (as (cno, make, model, year, seats) tuples). Profiles are loaded once and kept in profileCache. A cached profile is only reloaded if members or cars have changed since it was loaded, which is checked with changeToken() and, if that moved, table_versions.
+def getProfile(email):
+
+    profile = profileCache.get(email)
+    token = changeToken()
+
+    if (profile and profile['token'] == token):
+        return profile
+
+    versions = tableVersions(['members', 'cars'])
+
+    if (profile and profile['versions'] == versions):
+        profile['token'] = token
+        return profile
+
+    # The member, their cars and the versions they are stamped with are all read from the same snapshot, so a change committed in between can't leave the cache holding one without the other.
+    with db.snapshot() as reader:
+        name, phone = reader.execute(queries['profile'], (email,)).fetchone()
+        cars = reader.execute(queries['profileCars'], (email,)).fetchall()
+        versions = dict(reader.execute('SELECT name, version FROM table_versions WHERE name IN (\'members\', \'cars\');').fetchall())
+
+    profile = {'name': name, 'phone': phone, 'cars': cars, 'token': token, 'versions': versions}
+    profileCache[email] = profile
+
+    return profile
+
+# This function handles the input of usernames and passwords passed into the program by the user. It calls authenticateUser() with an email and password. If this returns true, we return to the login() with the email string so that it can actually "log [the user] in". If the input passed by the user is 'register' then we call registerUser(). Whether that suceeds or fails we restart the login page. If the input passed by the user is 'exit', then we immediately return None. We have two nested loops so we can clear the terminal after a registration. The inner loop will always loop when an email/password combo fails but the only time the outer loop will restart is when registerUser() is called and returned (which is why the break statement is there).
+def loginPage():
+    while True:
+
+        # Clears the console.
+        clearScreen()
+
+        print('This is the login page. Please type a valid email or type \'register\' to register as a new user. Type \'exit\' to exit the login screen.\n')
+
+        # We keep this in a loop to give the user multiple attempts to log in to any account, or to register and login as may times as they'd like.
+        while True:
+
+            # Getting plaintext email from the user. We convert it to lowercase to get past any casing issues.
+            email = (input('Email: ')).lower().strip()
+
+            # If input is 'exit', we return. If the input is 'register', then we call registerUser() and once that function is done (regardless if any changes were made) we continue the loop to attempt to log the user in again.
+            if (email == 'exit'):
+                return
+            elif (email == 'register'):
+                registerUser()
+                break
+
+            # Getting non-echoed password from user with readPassword(), which uses the getpass() function of the getpass library.
+            password = readPassword('Password: ')
+
+            if (authenticateUser(email, password)):
+                return email
+            else:
+                print('\nAuthentication failed. Please check your credentials.')
+
+            # For formatting purposes
+            print()
+
+    return
+
+# Checks if the email & password combo exists in the database.
+def authenticateUser(email, password):
+
+    # Executes the query for authenticating users with the passed email and password
+    count = db.fetchone(queries['authenticate'], (email, password))[0]
+
+    # If the count from the query is exactly 1, that means that one user exactly was authenticated with a matching email and password. Since the expression would resolve to a boolean value, the return value is either True or False.
+    return (count == 1)
+
+# The main idea of this function is that for any required information it runs a check loop. It grabs a value from the user and runs a series of checks on them. If they fail, we restart the check loop. If they all pass, we break the loop at the end. It then goes onto the next loop. At any point we recieve 'exit' we return to the loginPage().
+def registerUser():
+
+    # Clears console
+    clearScreen()
+
+    print('This is the registration page. Please type a valid email address and then a password. Type \'exit\' at any point to exit the registration page.\n')
+
+    # Email match loop
+    while True:
+        # Gets email from the user. Strips leading and trailing whitespace characters.
+        email = input('Email (registration): ').lower().strip()
+
+        if (email == 'exit'):
+            return
+
+        # Uses Regex to match a valid email address. Complains if it does not match.
+        if (fullmatch('^\\b[a-z0-9._-]+@[a-z0-9.-]+\\.[a-z]{1,}\\b$', email) == None):
+            print('This is not a valid formatted email address. Please try again.')
+            continue
+
+        # Makes sure that the email address is not already in the database. We call lower() to
+        if (db.fetchone('SELECT COUNT(email) FROM members WHERE lower(email) = ?;', (email,))[0] != 0):
+            print('The email you specified already exists. Please enter another email address.')
+            continue
+
+        break
+
+    # Password match loop
+    while True:
+
+        # Gets password
+        password = readPassword('Password (registration): ')
+
+        if (password == 'exit'):
+            return
+
+        # Gets a retyped password to verify.
+        if (readPassword('Retype password: ') != password):
+            print('Passwords are mismatched. Please recreate your password.')
+            continue
+
+        break
+
+    # Name match loop
+    while True:
+
+        # Gets name. Strips leading and trailing whitespace characters.
+        name = input('Name (registration): ').strip()
+
+        if (name == 'exit'):
+            return
+
+        if (len(name) < 1):
+            print('Name cannot be empty. Please enter a valid name.')
+            continue
+
+        break
+
+    # Phone match loop
+    while True:
+
+        # Gets phone number
+        phone = input('Phone number (registration): ').strip()
+
+        if (phone == 'exit'):
+            return
+
+        if (fullmatch('^[0-9]\d{2}-\d{3}-\d{4}$', phone) == None):
+            print('This phone number is not valid. Please enter a valid phone number of form XXX-XXX-XXXX.')
+            continue
+
+        break
+
+    # Register the user. At this point all values should have passed their respective checks so we can assume everything is valid.
+    db.write(c.execute, 'INSERT INTO members VALUES (?, ?, ?, ?)', (email, name, phone, password))
+
+    # Print success message
+    print('\nSuccessfully registered member with email address \'{}\'.'.format(email))
+
+    # Prompt user to return back
+    input('Press the enter key to return to the login page. ')
+
+    return
+
+# This function handles the main menu functions, and calls all core functionality (book rides, etc.), all assuming a user is authenticated. As a result it calls loginPage() first to try to authenticate/register a user.
+def mainMenu(email):
+
+    while True:
+
+        clearScreen()
+
+        # Prints welcome message again, using the cached profile
+        print('Logged in as user \'{}\' ({}).\n'.format(getProfile(email)['name'], email))
+
+        print('This is the main menu. Type \'help\' for commands, or \'logout\' to log out.')
+
+        while True:
+
+            command = input('Main Menu > ').lower().strip()
+
+            if (command == 'help'):
+                print('    - Command - \t- Description -\n'
+                      '    help        \tShow this menu\n'
+                      '    logout      \tLogs out of the currently logged-in user\n'
+                      '    inbox       \tRead your unread messages\n\n'
+                      '    offer       \tOffer a ride (Q1)\n'
+                      '    rides       \tSearch for a ride (Q2)\n'
+                      '    bookings    \tBook members or cancel bookings (Q3)\n'
+                      '    post        \tPost a request (Q4)\n'
+                      '    requests    \tSearch or delete ride requests (Q5)\n' )
+
+            elif (command == 'logout'):
+                return
+
+            elif (command == 'inbox'):
+                print()
+                showInbox(email)
+
+            elif (command == 'offer'):
+                offerRide(email)
+                break
+
+            elif (command == 'rides'):
+                searchRide(email)
+                break
+
+            elif (command == 'bookings'):
+                bookingsPage(email)
+                break
+
+            elif (command == 'post'):
+                postRideRequest(email)
+                break
+
+            elif (command == 'requests'):
+                requestsPage(email)
+                break
+
+            else:
+                print('Unrecognized command. Type \'help\' for help.\n')
+
+    return
+
+##
+#### Functions for offering rides start here (Q1) ####
+##
+
+# This crazy long function esentially runs a bunch of checks whatever information we need for a ride. It then adds those changes to the database and commits.
+def offerRide(email):
+
+    clearScreen()
+    print('You are now attempting to offer a ride. A valid date, number of seats offered, a price per seat, a luggage description, source location, and destination location is required. You have the option of adding a set of enroute locations or a car number. Type \'exit\' at any time to return to the main menu.\n')
+
+    while True:
+
+        # Date checking
+        while True:
+            date = input('Please type in a date in format YYYY-MM-DD... > ').lower().strip()
+
+            if (date == 'exit'):
+                return
+
+            if (not isValidDate(date)):
+                print('The date is not valid. Please try again.\n')
+                continue
+
+            break
+
+        # Seats checking
+        while True:
+            seats = input('Please specify the number of seats you want to offer... > ').lower().strip()
+
+            if (seats == 'exit'):
+                return
+
+            if (len(seats) < 1):
+                print('Seat number cannot be empty. Please try again.\n')
+                continue
+
+            try:
+                seats = int(seats)
+            except ValueError:
+                print('The number of seats is not an integer. Please try again.\n')
+                continue
+
+            break
+
+        # Price checking
+        while True:
+            price = input('Please enter the price per seat as an integer... > ').lower().strip()
+
+            if (price == 'exit'):
+                return
+
+            if (len(price) < 1):
+                print('Price cannot be empty. Please try again.\n')
+                continue
+
+            try:
+                price = int(price)
+            except ValueError:
+                print('The price specified is not an integer. Please try again.\n')
+                continue
+
+            break
+
+        # Description checking
+        while True:
+            luggageDesc = input('Please enter luggage description... > ').lower().strip()
+
+            if (luggageDesc == 'exit'):
+                return
+
+            if (len(luggageDesc) == 0):
+                print('Description cannot be empty. Please try again.\n')
+                continue
+
+            break
+
+        # Location checking (source)
+        while True:
+            srcLocationKeyword = readLocation('Please specify a source location code or a substring...> ')
+
+            if (srcLocationKeyword == 'exit'):
+                return
+
+            # Finding locations that match the keyword (substring included)
+            results = searchLocation(srcLocationKeyword)
+
+            if (not results):
+                print('No locations found for \'{}\'.'.format(srcLocationKeyword))
+                suggestLocations([srcLocationKeyword])
+                print('Please try again.\n')
+                continue
+
+            print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+
+            formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
+            print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+
+            # We define these as lists so they can be mutable down the chain
+            srcLocation = []
+
+            # We are running resultsWizard() and checking for the special case, which in our case happens to be failing to select a location.
+            if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = srcLocation) == False):
+                print('You have not selected a source location. Please search and try again.\n')
+                continue
+
+            break
+
+        # Location checking (destination)
+        while True:
+            dstLocationKeyword = readLocation('Please specify a destination location code or a substring...> ')
+
+            if (dstLocationKeyword == 'exit'):
+                return
+
+            # Finding locations that match the keyword (substring included)
+            results = searchLocation(dstLocationKeyword)
+
+            if (not results):
+                print('No locations found for \'{}\'.'.format(dstLocationKeyword))
+                suggestLocations([dstLocationKeyword])
+                print('Please try again.\n')
+                continue
+
+            print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+
+            formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
+            print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+
+            # We define these as lists so they can be mutable down the chain
+            dstLocation = []
+
+            # We are running resultsWizard() and checking for the special case, which in our case happens to be failting to select a location.
+            if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = dstLocation) == False):
+                print('You have not selected a destination location. Please search and try again.\n')
+                continue
+
+            break
+
+        # Location checking (enroute)
+        while True:
+            command = input('Would you like to specify enroute locations? (y/n) > ').lower().strip()
+
+            # We define these as lists so they can be mutable down the chain
+            ERLocations = []
+
+            if (command == 'y'):
+
+                while True:
+
+                    ERLocationKeyword = readLocation('Please specify a enroute location code or a substring...> ')
+
+                    if (ERLocationKeyword == 'exit'):
+                        return
+
+                    # Finding locations that match the keyword (substring included)
+                    results = searchLocation(ERLocationKeyword)
+
+                    if (not results):
+                        print('No locations found for \'{}\'.'.format(ERLocationKeyword))
+                        suggestLocations([ERLocationKeyword])
+                        print('Please try again.\n')
+                        continue
+
+                    print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+
+                    formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
+                    print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+
+                    # We are running resultsWizard() and checking for the special case, which in our case happens to be failting to select a location.
+                    if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = ERLocations) == False):
+                        print('You have not selected an enroute location. Please search and try again.\n')
+                        continue
+
+                    cont = input('Would you like to continue adding locations? (y for yes, anything else for no) > ').lower().strip()
+
+                    if (cont == 'y'):
+                        continue
+
+                    break
+
+
+            elif (command == 'n'):
+                print('Enroute locations will not be added.\n')
+            else:
+                print('Unrecognized command. Please try again.\n')
+                continue
+
+            break
+
+        # Car number checking, against the cars in the member's cached profile (keyed by cno as typed in).
+        cars = {str(car[0]): car for car in getProfile(email)['cars']}
+
+        while True:
+            command = input('Would you like to specify a car number? (y/n) > ').lower().strip()
+
+            if (command == 'y'):
+
+                if (cars):
+                    print('Your cars: {}'.format(', '.join('{} ({} {} {}, {} seats)'.format(*car) for car in cars.values())))
+
+                while True:
+
+                    cno = input('Please specify a car number...> ').lower().strip()
+
+                    if (cno == 'exit'):
+                        return
+
+                    # The member's own cars are in their profile, so only a car number that isn't one of them needs its owner looked up.
+                    if (cno in cars):
+                        break
+
+                    # Finding the owner of the car
+                    owner = carOwner(cno)
+
+                    if (not owner):
+                        print('Car number \'{}\' does not exist. Please try again.\n'.format(cno))
+                        continue
+
+                    if (owner != email):
+                        print('The car number specified exists, but does not belong to you. You must specify a car that you own.\n')
+                        continue
+
+                    break
+
+            elif (command == 'n'):
+                print('A car number will not be added.\n')
+                cno = None
+            else:
+                print('Unrecognized command. Please try again.\n')
+                continue
+
+            break
+
+        # Finally add the ride specified, along with all enroute locations
+        rno = db.write(insertRide, price, date, seats, luggageDesc, srcLocation[0], dstLocation[0], email, cno, ERLocations)
+
+        print('Ride added sucessfully.\n')
+
+        # Shows the requests the new ride can serve, so the driver can message them.
+        showMatches(matchRides(rno = rno), 'requests that this ride can serve')
+
+        break
+
+    return
+
+# Adds a ride and its enroute locations, and returns its rno. Meant to be run through db.write().
+def insertRide(price, date, seats, luggageDesc, src, dst, driver, cno, ERLocations):
+
+    # Get the next rno.
+    rno = allocateIds('rides')
+
+    c.execute('INSERT INTO rides VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (rno, price, date, seats, luggageDesc, src, dst, driver, cno))
+
+    for location in ERLocations:
+        c.execute('INSERT INTO enroute VALUES (?, ?)', (rno, location))
+
+    return rno
+
+# Searches for a exactly matching lcode or a substring of a city, province, or address.
+def searchLocation(keyword):
+
+    keyword = keyword.lower().strip()
+    qSearch, params = searchLocationQuery(keyword)
+
+    # The rows are fetched lazily on a read connection, so that only the rows actually displayed are read, unless they are few enough to be cached.
+    return cachedSearch(('locations', keyword), lambda: db.query(qSearch, params))
+
+# Returns the query run by searchLocation() for keyword, along with its parameters.
+def searchLocationQuery(keyword):
+
+    qMatch, params = locationCodesQuery(keyword)
+
+    return queries['searchLocations'].format(qMatch), params
+
+# Builds a query that selects the lcode of every location matching keyword, either exactly by lcode or as a substring of the city, province, or address. Returns the query along with its parameters so it can be embedded in larger queries.
+def locationCodesQuery(keyword):
+
+    # The trigram index needs at least 3 characters to search on, so shorter keywords (and databases without FTS5) use the LIKE scan.
+    if (ftsEnabled and len(keyword) >= 3):
+
+        qMatch = '''
+            SELECT lcode FROM locations WHERE lower(lcode) = ?
+            UNION
+            SELECT lcode FROM locations_fts WHERE locations_fts MATCH ?
+        '''
+
+        return qMatch, [keyword, ftsPhrase(keyword)]
+
+    qMatch = '''
+        SELECT
+            lcode
+        FROM
+            locations
+        WHERE
+            lower(lcode) = ?
+            OR city LIKE '%' || ? || '%'
+            OR prov LIKE '%' || ? || '%'
+            OR address LIKE '%' || ? || '%'
+    '''
+
+    return qMatch, [keyword] * 4
+
+# Quotes a keyword as an FTS5 phrase so that it is matched as a plain substring. Double quotes inside the keyword are escaped by doubling them.
+def ftsPhrase(keyword):
+    return '"{}"'.format(keyword.replace('"', '""'))
+
+# Helper Function that handles the commands for displaying results. Meant to be passed into resultsWizard(). This helper function uses the "special case", hence the non underscore parameter.
+def searchLocationHelper(email, location):
+
+    while True:
+
+        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+
+        if (command == 'select'):
+            validLoc = selectLocation(location)
+
+            if (validLoc):
+                print('Valid location code selected. Type exit to return back to the offer page.\n')
+
+            continue
+        elif (command == 'more'):
+            return True
+        elif (command == 'exit'):
+            if (not location):
+                return False
+
+            return
+        else:
+            print('Unrecognized command. Valid commands are \'select\', \'more\', and \'exit\'.')
+
+# Small loop to prompt the user to select a location. takes in a location *list* as its parameter since we have to modify it and reference it outside the function.
+def selectLocation(location):
+
+    while True:
+
+        locKeyword = readLocation('Type the lcode of the destination you wish to pick... > ')
+
+        if (locKeyword == 'exit'):
+            return
+
+        if (not isLocation(locKeyword)):
+            print('The lcode you have specified does not exist. Please try again.\n')
+            continue
+
+        location.append(locKeyword)
+
+        return True
+
+##
+#### Functions for searching rides start here (Q2) ####
+##
+
+# Main control loop for searching lcodes in source ,destination, and enroute locations
+def searchRide(email):
+
+    clearScreen()
+    print('You are now searching for rides matching locations. Separate the keywords with \'>\' (e.g. \'edmonton > calgary\') to find rides that pass through them in that order. Type \'exit\' to return to the main menu.\n')
+
+    while True:
+
+        keywords = input('Enter 1 to 3 keywords separated by spaces or commas: ')
+
+        # If the keywords are separated by '>', the rides must pass through them in the order they were typed.
+        ordered = ('>' in keywords)
+
+        # Get a keyword list from the user. We replace all commas (and '>') by spaces, and split the resulting string into a list of keywords.
+        keywordList = keywords.replace(',', ' ').replace('>', ' ').split()
+
+        # Check that the range of keywordList is in [1, 3].
+        if len(keywordList) > 0 and len(keywordList) <= 3:
+
+            # Check if the user wants to exit. No IndexError will occur since we are in the if loop that checks the range
+            if (keywordList[0] == 'exit'):
+                return
+
+            keywordList = [keyword.lower() for keyword in keywordList]
+
+            # Searches for rides matching any of the keywords (or all of them in order) in a single query.
+            results = searchRides(keywordList, ordered)
+
+            # If there is no first row, then we know that no results have been found
+            if (not results):
+                print('No results were found.')
+                suggestLocations(keywordList)
+                continue
+
+            # Starts displaying results
+            print('\nDisplaying Results. At any point, you can type \'send\' to send a message to a specific ride, \'export\' to save every result to a file, or press  \'more\' to display more results. Type \'exit\' to return to the search.')
+
+            formatString = '    {:<5}  {:<5}  {:<12}  {:<7}  {:<15}  {:<15}  {:<7}  {:<15}  {:<15}  {:<6}  {:<3}'
+
+            print(formatString.format(*'rno, price, date, seats, Luggage Desc, driver, carno, make, model, year, seats'.split(', ')))
+
+            # The column names and the search to rerun if the user exports the results.
+            exportSource = ('rno, price, rdate, seats, lugDesc, driver, cno, make, model, year, carSeats'.split(', '), searchRides, keywordList, ordered)
+
+            # Calls the results wizard to display 5 at a time, etc.
+            resultsWizard(email, results, formatString, searchRideHelper, hfParam = exportSource)
+
+        else:
+            print('The number of keywords does not fall between 1 and 3. Please try again.')
+
+        print()
+
+    return
+
+# Finds every ride with a source, destination, or enroute location matching at least one of the keywords. All keywords are first resolved to the set of lcodes they match, and the distinct rides stopping at those lcodes are then fetched in one query through route_stops_lcode, so each ride is only looked at once no matter how many keywords or enroute locations match it. If ordered is True, a ride must instead stop at a location matching every keyword, in the order the keywords are given (for example picking up at the first and dropping off at the second).
+def searchRides(keywordList, ordered = False):
+
+    keywordList = [keyword.lower().strip() for keyword in keywordList]
+
+    # The order of the keywords only matters to ordered searches, so other searches are cached under the sorted keywords.
+    key = ('rides', tuple(keywordList) if ordered else tuple(sorted(set(keywordList))), ordered)
+
+    qSearchRides, params = searchRidesQuery(keywordList, ordered)
+
+    # The rows are fetched lazily on a read connection, so that only the rows actually displayed are read, unless they are few enough to be cached.
+    return cachedSearch(key, lambda: db.query(qSearchRides, params))
+
+# Returns the rows of a search like lazyRows() does, from searchCache if the same search has been run since the tables it reads last changed. Otherwise search() is called to run it, and its rows are cached if there are at most config['searchCacheRows'] of them. key identifies the search, and its first element is the kind of search in searchTables. Once more than config['searchCache'] searches are cached, the least recently used is dropped.
+def cachedSearch(key, search):
+
+    if (config['searchCache'] <= 0):
+        return lazyRows(search())
+
+    results = searchCache['results']
+    token = changeToken()
+
+    # Something was committed since we last looked, so we drop the results of every search reading a table that changed.
+    if (searchCache['token'] != token):
+        versions = tableVersions(sorted(set(chain(*searchTables.values()))))
+        changed = {table for table in versions if searchCache['versions'].get(table) != versions[table]}
+
+        for cachedKey in [cachedKey for cachedKey in results if changed.intersection(searchTables[cachedKey[0]])]:
+            del results[cachedKey]
+
+        searchCache['token'] = token
+        searchCache['versions'] = versions
+
+    if (key in results):
+        searchCache['hits'] += 1
+        results.move_to_end(key)
+
+        return lazyRows(results[key])
+
+    searchCache['misses'] += 1
+
+    # We read one row more than can be cached to find out whether the rest fit. If they don't, the rest are still read lazily.
+    rows = iter(search())
+    firstRows = list(islice(rows, config['searchCacheRows'] + 1))
+
+    if (len(firstRows) > config['searchCacheRows']):
+        return chain(firstRows, rows)
+
+    results[key] = firstRows
+
+    if (len(results) > config['searchCache']):
+        results.popitem(last = False)
+
+    return lazyRows(firstRows)
+
+# Returns the query run by searchRides() for keywordList, along with its parameters.
+def searchRidesQuery(keywordList, ordered = False):
+
+    qMatches = []
+    params = []
+
+    for keyword in keywordList:
+        qMatch, matchParams = locationCodesQuery(keyword)
+        qMatches.append(qMatch)
+        params += matchParams
+
+    if (ordered):
+
+        # Every keyword gets its own set of lcodes, matchedN, and the stop sN matching keyword N must come after the stop matching keyword N - 1 on the same ride.
+        qMatched = ',\n'.join('matched{}(lcode) AS ({})'.format(i, qMatch) for i, qMatch in enumerate(qMatches))
+
+        qRides = 'SELECT s0.rno FROM route_stops AS s0 '
+        qRides += ' '.join('INNER JOIN route_stops AS s{0} ON s{0}.rno = s0.rno AND s{0}.pos > s{1}.pos'.format(i, i - 1) for i in range(1, len(qMatches)))
+        qRides += ' WHERE ' + ' AND '.join('s{0}.lcode IN matched{0}'.format(i) for i in range(len(qMatches)))
+
+    else:
+        qMatched = 'matched(lcode) AS ({})'.format(' UNION '.join(qMatches))
+        qRides = 'SELECT rno FROM route_stops WHERE lcode IN matched'
+
+    return queries['searchRides'].format(qMatched, qRides), params
+
+# Small function for handling input for the search "engine" above. Returns True if the user requests more results, and None if the user wants to exit. For sending a message, we call sendMessageHelper(). For exporting, exportSource holds the column names, and the function and arguments that rerun the search (see exportResults()).
+def searchRideHelper(email, exportSource):
+
+    while True:
+
+        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+
+        if (command == 'send'):
+            sendMessageHelper(email)
+            continue
+        elif (command == 'export'):
+            exportResults(*exportSource)
+            continue
+        elif (command == 'more'):
+            return True
+        elif (command == 'exit'):
+            return
+        else:
+            print('Unrecognized command. Valid commands are \'more\', \'send\', \'export\', and \'exit\'.')
+
+    return
+
+# This function handles all input and message sending given a member's email. It prompts the user for a rno and checks if it exists. If it does, it allows them to send a message.
+def sendMessageHelper(email):
+
+    print()
+
+    while True:
+
+        rno = input('Please type the ride number (rno) of the ride you want to send a message to or type \'exit\' to return to search... > ').lower().strip()
+
+        if (rno == 'exit'):
+            return
+
+        try:
+            rno = int(rno)
+        except ValueError:
+            print('Input is not an integer. Please try again.\n')
+            continue
+
+        # Check existence of ride and print appropriate message if it does not.
+        # In form of 'driver' <-- (driver,)[0]
+        driver = db.fetchone('SELECT driver FROM rides WHERE rno = ? ;', (rno,))[0]
+
+        # This checks if the rno of that ride exists and grabs the driver.
+        if (not driver):
+            print('The ride you specified does not exist. Please try again.\n')
+            continue
+
+        message = input('Type the message you want to send to \'{}\'... > '.format(driver))
+
+        if (message == 'exit'):
+            return
+
+        db.write(c.execute, 'INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, ?, ?, \'n\')', (driver, email, message, rno))
+
+        print('Message sent.\n')
+
+        return
+
+##
+#### Functions for handling bookings of rides start here (Q3) ####
+##
+
+# This function is the main control loop for the bookings page. It allows a user to display bookings, add, or cancel them.
+def bookingsPage(email):
+
+    clearScreen()
+    print('This is bookings page. Type \'display\' to display your bookings, \'export\' to save them to a file, \'book\' to book a ride, \'cancel\' to cancel a booking, or \'broadcast\' to message everyone booked on one of your rides. Type \'exit\' at any point to exit the posting page.\n')
+
+    while True:
+
+        command = input('Enter a command... > ').lower().strip()
+
+        if (command == 'exit'):
+            return
+        elif (command == 'display'):
+            displayBookings(email)
+            continue
+        elif (command == 'export'):
+            exportResults(bookingColumns, driverBookings, email)
+            continue
+        elif (command == 'book'):
+            displayRides(email)
+            continue
+        elif (command == 'cancel'):
+            cancelBooking(email)
+            continue
+        elif (command == 'broadcast'):
+            broadcastBookings(email)
+            continue
+        else:
+            print('Unrecognized command. Valid commands are \'display\', \'export\', \'book\', \'cancel\', \'broadcast\', and \'exit\'.\n')
+            continue
+
+    return
+
+# This fucntion gets all the available seats from every ride of the user
+def displayRides(email):
+
+    # Gets all the available seats from every ride of the user. The rows are fetched lazily on a read connection as they are displayed.
+    results = driverRides(email)
+
+    print('\nDisplaying Results. At any point, you can type \'book\' to start booking a member to a ride, or press \'more\' to display more results. Type \'exit\' to return to the bookings page.')
+
+    formatString = '    {:<11}  {:<9}  {:<11}  {:<12}'
+
+    print(formatString.format(*'Ride No., Booked, Avaliable, Date'.split(', ')))
+
+    # Calls the results wizard to display 5 at a time, etc.
+    resultsWizard(email, results, formatString, addBookingHelper)
+
+
+    return
+
+# Returns the rides offered by driver with their booked and available seats, as (rno, booked, available, rdate) rows read lazily on a read connection. The seats are read from ride_availability, which the triggers from setupAvailability() keep up to date.
+def driverRides(driver):
+
+    return db.query(queries['getRides'], (driver,))
+
+# Helper function that is the main control loop for displaying/adding bookings. Meant to be passed into resultsWizard().
+def addBookingHelper(email, _):
+
+    while True:
+
+        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+
+        if (command == 'book'):
+            addBooking(email)
+            continue
+        elif (command == 'more'):
+            return True
+        elif (command == 'exit'):
+            return
+        else:
+            print('Unrecognized command. Valid commands are \'more\', \'book\', and \'exit\'.')
+
+    return
+
+# Displays a member's bookings, if any.
+def displayBookings(email):
+
+    # Get all of the member's bookings. They are read one at a time as they are printed.
+    results = lazyRows(driverBookings(email))
+
+    # Check if the user has bookings
+    if (not results):
+        print('You have no bookings.\n')
+        return
+
+    print('Bookings for \'{}\':'.format(email))
+
+    formatString = '    {:<13}  {:<15}  {:<13}  {:<9}  {:<9}  {:<10}  {:<10}'
+
+    # Print table headers
+    print(formatString.format(*'Booking No., Email, Ride No., Cost, Seats, Pickup, Dropoff'.split(', ')))
+
+    # Because .format() doesn't like NoneTypes in a format specifier ({:<10} for example), we have to protect againt printing NULLs
+    for r in results:
+        print(formatString.format(r[0], r[1], r[2], r[3] or 'NULL', r[4] or 'NULL', r[5] or 'NULL', r[6] or 'NULL'))
+
+    return
+
+# Returns the bookings on the rides of driver, read lazily on a read connection.
+def driverBookings(driver):
+
+    return db.query(queries['getAllBookings'], (driver,))
+
+# This function allows a user to add a booking based on certain values that are checked.
+def addBooking(email):
+
+    # Ride Number Checking
+    while True:
+        rno = input('Enter an ride number (rno) (creating booking)... > ').lower().strip()
+
+        if (rno == 'exit'):
+            return
+
+        # Verifies if rno exists
+        if (db.fetchone('SELECT COUNT(rno) FROM rides WHERE rno = ? ;', (rno,))[0] != 1):
+            print('The ride number \'{}\' does not exist. Please try again.\n'.format(rno))
+            continue
+
+        if (db.fetchone('SELECT COUNT(rno) FROM rides WHERE rno = ? AND driver = ? ;', (rno, email))[0] != 1):
+            print('Ride with rno \'{}\' does not belong to you. Please try again.\n'.format(rno))
+            continue
+
+        break
+
+    # Email checking
+    while True:
+        email = input('Enter the email of the person you want to book (creating booking)... > ').lower().strip()
+
+        if (email == 'exit'):
+            return
+
+        # Verifies if email exists
+        if (db.fetchone('SELECT COUNT(email) FROM members WHERE email = ? ;', (email,))[0] != 1):
+            print('The email address \'{}\' is not registered to a member. Please try again.\n'.format(email))
+            continue
+
+        break
+
+    # Cost checking
+    while True:
+        cost = input('Enter the cost willing to pay per seat (creating booking)... > ').strip()
+
+        if (cost == 'exit'):
+            return
+
+        if (len(cost) < 1):
+            print('Cost cannot be empty. Please enter a valid amount.\n')
+            continue
+
+        try:
+            cost = int(cost)
+        except ValueError:
+            print('Input is not an integer. Please try again.\n')
+            continue
+
+        break
+
+    # Number of seats checking
+    while True:
+        seats = input('Enter the number of seats to be booked (creating booking)... > ').strip()
+        if (seats == 'exit'):
+            return
+
+        if (len(seats) < 1):
+            print('Seats cannot be empty. Please enter a valid amount.\n')
+            continue
+
+        try:
+            seats = int(seats)
+        except ValueError:
+            print('Input is not an integer. Please try again.\n')
+            continue
+
+        break
+
+    # Pickup location checking
+    while True:
+        pickup = readLocation('Enter a pickup location lcode (creating booking): ')
+
+        if (pickup == 'exit'):
+            return
+
+        # We check if the lcode exists
+        if (not isLocation(pickup)):
+            print('The specified lcode does not exist. Please try again.\n')
+            continue
+
+        break
+
+    # Dropoff location checking
+    while True:
+        dropoff = readLocation('Enter a dropoff location lcode (creating booking): ')
+
+        if (dropoff == 'exit'):
+            return
+
+        # We check if the lcode exists
+        if (not isLocation(dropoff)):
+            print('The specified lcode does not exist. Please try again.\n')
+            continue
+
+        break
+
+    # Checking for an overbooking
+    if (seatsLeft(rno) - seats < 0):
+
+        # Prompt the user to accept an overbooking
+        while True:
+            print('The seats that you are trying to book exceeds the available seats, which will cause an overbooking.')
+            command = input('Would you like to proceed? (y/n) > ').lower().strip()
+
+            if (command == 'y'):
+                break
+            elif (command == 'n'):
+                return
+            else:
+                print('Unknown command. Please try again.\n')
+                continue
+
+    # Insert the new values
+    db.write(insertBooking, email, rno, cost, seats, pickup, dropoff)
+
+    # Print success message
+    print('Member booked successfully.\n')
+
+    return
+
+# Returns the number of seats left on ride rno, which is read from the ride_availability table kept up to date by the triggers from setupAvailability().
+def seatsLeft(rno):
+
+    return db.fetchone(queries['getSeats'], (rno,))[0]
+
+# Adds a booking and returns its bno. Meant to be run through db.write().
+def insertBooking(email, rno, cost, seats, pickup, dropoff):
+
+    # Get the next bno.
+    bno = allocateIds('bookings')
+
+    c.execute('INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?)', (bno, email, rno, cost, seats, pickup, dropoff))
+
+    return bno
+
+# Lets a driver message every member booked on one of their rides at once, for example when the ride is rescheduled. Prompts for the rno, which must be a ride of the driver, and the message.
+def broadcastBookings(email):
+
+    while True:
+
+        rno = input('Enter the ride number (rno) of the ride whose members you want to message... > ').lower().strip()
+
+        if (rno == 'exit'):
+            return
+
+        try:
+            rno = int(rno)
+        except ValueError:
+            print('Input is not an integer. Please try again.\n')
+            continue
+
+        if (db.fetchone('SELECT COUNT(rno) FROM rides WHERE rno = ? AND lower(driver) = ? ;', (rno, email))[0] != 1):
+            print('The ride number \'{}\' does not exist or does not belong to you. Please try again.\n'.format(rno))
+            continue
+
+        break
+
+    message = input('Type the message you want to send to every member booked on ride {}... > '.format(rno))
+
+    if (message == 'exit'):
+        return
+
+    count, skipped = db.write(broadcastMessage, email, message, rno)
+
+    print('Message sent to {} member{} booked on ride {}.\n'.format(count, '' if count == 1 else 's', rno))
+    printSkipped(skipped)
+
+    return
+
+# This function allows a user to cancel a booking, provided that it is their own (they are the driver). Upon deletion, it sends a message to the user that was registered on the booking
+def cancelBooking(email):
+
+    while True:
+
+        bno = input('Type the bno of the request which you wish to delete... > ').lower().strip()
+
+        if (bno == 'exit'):
+            return
+
+        # Checking if bno exists
+        if (db.fetchone(queries['bookingExists'], (bno,))[0] < 1):
+            print('Booking with bno \'{}\' does not exist. Please try again.\n'.format(bno))
+            continue
+
+        if (db.fetchone(queries['verify'], (bno, email))[0] < 1):
+            print('Ride with bno \'{}\' does not belong to you. Please try again.\n'.format(bno))
+            continue
+
+        # Deletes the booking and messages the member that had it
+        db.write(deleteBooking, bno, email)
+
+        print('Ride with rid \'{}\' was deleted.  A message was sent to the user. Returning to requests page...\n'.format(bno))
+
+        return
+
+    return
+
+# Deletes a booking and sends the member who made it a message from sender saying so. Meant to be run through db.write().
+def deleteBooking(bno, sender):
+
+    # Since bno is unique we can only have one result. In form (email, rno)
+    c.execute('SELECT email, rno FROM bookings WHERE bno = ? ;', (bno,))
+    memberInfo = c.fetchone()
+
+    # Sends the appropriate message to the user that has the booking.
+    c.execute('INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, \'Your booking associated with rno {} has been deleted.\', ?, \'n\')'.format(memberInfo[1]), (memberInfo[0], sender, memberInfo[1]))
+
+    # Finally deletes the booking
+    c.execute('DELETE FROM bookings WHERE bno = ? ;', (bno,))
+
+    return
+
+##
+#### Functions for posting ride requests start here (Q4) ####
+##
+
+# Gets date, pickup location, dropoff location, and amount from the user. Strips leading and trailing whitespace charcters while also making input lower case. Checks to make sure input is valid.
+def postRideRequest(email):
+
+    # Clears console and prints an intro message.
+    clearScreen()
+    print('This is ride request posting page. Type \'exit\' at any point to exit the posting page.\n')
+
+    while True:
+
+        # Date checking
+        while True:
+            date = input('Enter a date (creating request)... > ').lower().strip()
+
+            if (date == 'exit'):
+                return
+
+            if (not isValidDate(date)):
+                print('The date is not valid. Please try again.\n')
+                continue
+
+            break
+
+        # Dropoff location checking
+        while True:
+            dropoff = readLocation('Enter a dropoff location lcode (creating request): ')
+
+            if (dropoff == 'exit'):
+                return
+
+            # We check if the lcode exists
+            if (not isLocation(dropoff)):
+                print('The specified lcode does not exist. Please try again.\n')
+                continue
+
+            break
+
+        # Pickup location checking
+        while True:
+            pickup = readLocation('Enter a pickup location lcode (creating request): ')
+
+            if (pickup == 'exit'):
+                return
+
+            # We check if the lcode exists
+            if (not isLocation(pickup)):
+                print('The specified lcode does not exist. Please try again.\n')
+                continue
+
+            break
+
+
+        while True:
+            amount = input('Amount willing to pay per seat: ').strip()
+
+            if (amount=='exit'):
+                return
+
+            if (len(amount) < 1):
+                print('Amount cannot be empty. Please enter a valid amount.\n')
+                continue
+
+            try:
+                amount = int(amount)
+            except ValueError:
+                print('Input is not an integer. Please try again.\n')
+                continue
+
+            break
+
+        # Insert the new values
+        rid = db.write(insertRequest, email, date, pickup, dropoff, amount)
+
+        # Print success message
+        print('Request posted successfully.\n')
+
+        # Shows the rides that can serve the new request, so the member can book or message them.
+        showMatches(matchRides(rid = rid), 'rides that can serve this request')
+
+    return
+
+# Adds a ride request and returns its rid. Meant to be run through db.write().
+def insertRequest(email, date, pickup, dropoff, amount):
+
+    # Get the next rid.
+    rid = allocateIds('requests')
+
+    c.execute('INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?)', (rid, email, date, pickup, dropoff, amount))
+
+    return rid
+
+##
+#### Functions for searching and deleting rides start here (Q5) ####
+##
+
+# This function is the main control loop for ride requests. It allows the user to display, delete, orfind requests that mathc a location string.
+def requestsPage(email):
+
+    while True:
+
+        clearScreen()
+
+        print('You are now viewing your requests. Type \'display\' to display your requests, \'export\' to save them to a file, \'delete\' to delete a request, \'location\' to view requests that depart from a specific location, or \'broadcast\' to message every member with a request departing from a location. Type \'exit\' at any time to return to the main menu.\n')
 
-        # Location checking (source)
         while True:
-            srcLocationKeyword = input('Please specify a source location code or a substring...> ').lower().strip()
 
-            if (srcLocationKeyword == 'exit'):
-                return
+            command = input('Enter a command... > ').lower().strip()
+
+            if (command == 'exit'):
+                return
+            elif (command == 'display'):
+                displayRequests(email)
+                continue
+            elif (command == 'export'):
+                exportResults(requestColumns, memberRequests, email)
+                continue
+            elif (command == 'delete'):
+                deleteRequest(email)
+                continue
+            elif (command == 'location'):
+                requestsLocations(email)
+                break
+            elif (command == 'broadcast'):
+                broadcastRequests(email)
+                continue
+            else:
+                print('Unrecognized command. Valid commands are \'display\', \'export\', \'delete\', \'location\', \'broadcast\', and \'exit\'.')
+                continue
+
+    return
+
+# This function gets all requests from the user matching an lcode or city exactly. Calls resultsWizard().
+def requestsLocations(email):
+
+    print()
+
+    while True:
+
+        locKeyword = readLocation('Please specify a location code or a city name... > ')
+
+        if (locKeyword == 'exit'):
+            return
+
+        # Finding locations (lcode, city) that match the keyword. The rows are fetched lazily on a read connection as they are displayed.
+        results = lazyRows(requestsAt(locKeyword))
+
+        # If there is nothing in the result set, complain.
+        if (not results):
+            print('No locations found for \'{}\'.'.format(locKeyword))
+            suggestLocations([locKeyword])
+            print('Please try again.\n')
+            continue
+
+        # Otherwise, display results
+        print('\nDisplaying results. At any point, you can type \'message\' to message a member of a specific request, or \'export\' to save every result to a file.')
+
+        formatString = '    {:<13}  {:<15}  {:<11}  {:<10}  {:<10}  {:<10}'
+        print(formatString.format(*'Request ID, Email, Date, Pickup, Dropoff, Amount'.split(', ')))
+
+        resultsWizard(email, results, formatString, requestsHelper, hfParam = locKeyword)
+
+    return
+
+# Returns the requests with a pickup location whose lcode or city is exactly keyword, read lazily on a read connection.
+def requestsAt(keyword):
+
+    return db.query(queries['searchRequests'], {'keyword':keyword})
+
+# helper function for above meant to be passed into resultsWizard(). locKeyword is the location searched for, which we need to export the results.
+def requestsHelper(email, locKeyword):
+
+    while True:
+
+        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+
+        if (command == 'message'):
+            requestsMessage(email)
+            continue
+        elif (command == 'export'):
+            exportResults(requestColumns, requestsAt, locKeyword)
+            continue
+        elif (command == 'more'):
+            return True
+        elif (command == 'exit'):
+            return
+        else:
+            print('Unrecognized command. Valid commands are \'more\', \'message\', \'export\', and \'exit\'.')
+
+    return
+
+# Small function that displays the requests of the user.
+def displayRequests(email):
+
+    # Get all of the member's requests. They are read one at a time as they are printed.
+    results = lazyRows(memberRequests(email))
+
+    # Check if the user has requests
+    if (not results):
+        print('You have no requests.\n')
+        return
+
+    print('Requests for \'{}\':'.format(email))
+
+    formatString = '    {:<9}  {:<15}  {:<13}  {:<9}  {:<9}  {:<7}'
+
+    # Print table headers
+    print(formatString.format(*'Ride ID, Email, Date, Pickup, Dropoff, Amount'.split(', ')))
+
+    for r in results:
+        print(formatString.format(*fixResults([r])[0]))
 
-            # Finding locations that match the keyword (substring included)
-            results = searchLocation(srcLocationKeyword)
+# Returns the requests posted by email, read lazily on a read connection.
+def memberRequests(email):
+    return db.query(queries['memberRequests'], (email,))
 
-            if (not results):
-                print('No locations found for \'{}\'. Please try again.\n'.format(srcLocationKeyword))
-                continue
+# Prompts the user to delete a request based on rid and their email. It won't let them delete a request that does not belong to them
+def deleteRequest(email):
 
-            print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+    while True:
 
-            formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
-            print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+        rid = input('Type the rid of the request which you want to delete... > ').lower().strip()
 
-            # We define these as lists so they can be mutable down the chain
-            srcLocation = []
+        if (rid == 'exit'):
+            return
 
-            # We are running resultsWizard() and checking for the special case, which in our case happens to be failing to select a location.
-            if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = srcLocation) == False):
-                print('You have not selected a source location. Please search and try again.\n')
-                continue
+        if (db.fetchone('SELECT COUNT(rid) FROM requests WHERE rid = ? ;', (rid,))[0] < 1):
+            print('Ride with rid \'{}\' does not exist. Please try again.\n'.format(rid))
+            continue
 
-            break
+        if (db.fetchone('SELECT COUNT(rid) FROM requests WHERE rid = ? AND email = ?;', (rid, email))[0] < 1):
+            print('Ride with rid \'{}\' does not belong to you. Please try again.\n'.format(rid))
+            continue
 
-        # Location checking (destination)
-        while True:
-            dstLocationKeyword = input('Please specify a destination location code or a substring...> ').lower().strip()
+        db.write(c.execute, queries['deleteRequest'], (rid, email))
 
-            if (dstLocationKeyword == 'exit'):
-                return
+        print('Ride with rid \'{}\' was deleted. Returning to requests page...\n'.format(rid))
+        return
 
-            # Finding locations that match the keyword (substring included)
-            results = searchLocation(dstLocationKeyword)
+# Lets a member message every member with a request picking up at a location at once. Prompts for the location (an lcode or a city, as in requestsLocations()) and the message.
+def broadcastRequests(email):
 
-            if (not results):
-                print('No locations found for \'{}\'. Please try again.\n'.format(dstLocationKeyword))
-                continue
+    location = readLocation('Please specify the location code or city of the requests whose members you want to message... > ')
 
-            print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+    if (location == 'exit'):
+        return
 
-            formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
-            print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+    message = input('Type the message you want to send to every member with a request from \'{}\'... > '.format(location))
 
-            # We define these as lists so they can be mutable down the chain
-            dstLocation = []
+    if (message == 'exit'):
+        return
 
-            # We are running resultsWizard() and checking for the special case, which in our case happens to be failting to select a location.
-            if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = dstLocation) == False):
-                print('You have not selected a destination location. Please search and try again.\n')
-                continue
+    count, skipped = db.write(broadcastMessage, email, message, None, location)
 
-            break
+    print('Message sent to {} member{} with a request from \'{}\'.\n'.format(count, '' if count == 1 else 's', location))
+    printSkipped(skipped)
 
-        # Location checking (enroute)
-        while True:
-            command = input('Would you like to specify enroute locations? (y/n) > ').lower().strip()
+    return
 
-            # We define these as lists so they can be mutable down the chain
-            ERLocations = []
+# Sends content from sender to every member booked on ride rno or, if location is given instead, to every member with a request for today or later picking up at a location whose lcode or city is location. Each is messaged once, and never the sender. All of the messages are inserted by a single INSERT ... SELECT instead of one INSERT per member. Messages get the same DATETIME('now') timestamp as every other inbox message, so a member who already got a message this second (from another broadcast, say) can't get another one: they are skipped rather than failing the whole broadcast. Returns how many members were messaged and how many were skipped. Meant to be run through db.write(), so they are all sent in one transaction.
+def broadcastMessage(sender, content, rno = None, location = None):
 
-            if (command == 'y'):
+    params = {'sender': sender.lower(), 'content': content, 'rno': rno, 'keyword': location.lower() if location != None else None}
+    qRecipients = queries['broadcastRide'] if location == None else queries['broadcastRequests']
 
-                while True:
+    c.execute(queries['broadcastInsert'].format(qRecipients), params)
+    sent = c.rowcount
 
-                    ERLocationKeyword = input('Please specify a enroute location code or a substring...> ').lower().strip()
+    c.execute('SELECT COUNT(*) FROM ({});'.format(qRecipients), params)
 
-                    if (ERLocationKeyword == 'exit'):
-                        return
+    return sent, c.fetchone()[0] - sent
 
-                    # Finding locations that match the keyword (substring included)
-                    results = searchLocation(ERLocationKeyword)
+# Tells the sender of a broadcast about the members it skipped because they already got a message this second (see broadcastMessage()).
+def printSkipped(skipped):
 
-                    if (not results):
-                        print('No locations found for \'{}\'. Please try again.\n'.format(ERLocationKeyword))
-                        continue
+    if (skipped > 0):
+        print('{} member{} already got a message this second and {} skipped. Send the message again in a moment to reach them.'.format(skipped, '' if skipped == 1 else 's', 'was' if skipped == 1 else 'were'))
 
-                    print('\nDisplaying Results. At any point, you can type \'select\' to select a location code for the ride.')
+    return
 
-                    formatString = '    {:<15}  {:<11}  {:<15}  {:<15}'
-                    print(formatString.format(*'Location Code, City, Province, Address'.split(', ')))
+# Small function for handling input for the search "engine" above. Returns True if the user requests more results, and None if the user wants to exit. For sending a message, we call sendMessageHelper()
+def requestsMessage(email):
 
-                    # We are running resultsWizard() and checking for the special case, which in our case happens to be failting to select a location.
-                    if (resultsWizard(email, results, formatString, searchLocationHelper, hfParam = ERLocations) == False):
-                        print('You have not selected an enroute location. Please search and try again.\n')
-                        continue
+    print()
 
-                    cont = input('Would you like to continue adding locations? (y for yes, anything else for no) > ').lower().strip()
+    while True:
 
-                    if (cont == 'y'):
-                        continue
+        rid = input('Please type the ride number (rid) of the ride you want to send a message to or type \'exit\' to return to search... > ').lower().strip()
 
-                    break
+        if (rid == 'exit'):
+            return
 
+        if (len(rid) < 1):
+            print('Request ID cannot be empty. Please try again.\n')
+            continue
 
-            elif (command == 'n'):
-                print('Enroute locations will not be added.\n')
-            else:
-                print('Unrecognized command. Please try again.\n')
-                continue
+        try:
+            rid = int(rid)
+        except ValueError:
+            print('Input is not an integer. Please try again.\n')
+            continue
 
-            break
+        # Check existence of a request and print appropriate message if it does not.
+        # In form of ('requester',) or None
+        requester = db.fetchone('SELECT email FROM requests WHERE rid = ?', (rid,))
+
+        # This checks if the rid of that ride exists and grabs the requester.
+        if (not requester):
+            print('The request id you specified does not exist. Please try again.\n')
+            continue
+
+        message = input('Type the message you want to send to \'{}\'... > '.format(requester[0]))
+
+        if (message == 'exit'):
+            return
+
+        db.write(c.execute, 'INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, ?, NULL, \'n\')', (requester[0], email, message))
+
+        print('Message sent.\n')
+
+        return
+
+##
+#### Functions for matching rides with ride requests start here ####
+##
+
+# Returns the matches between ride requests and rides, read lazily on a read connection, as (rid, requester, date, pickup, dropoff, amount, rno, driver, price, seats left) rows ordered by rid and then by price. A ride matches a request if it is on the same date, stops at the pickup and then later at the dropoff (see route_stops), costs at most the amount offered per seat, still has a seat left, and isn't driven by the requester. Every request is matched at once, unless rid or rno is given, in which case only that request or ride is.
+def matchRides(rid = None, rno = None):
+
+    return db.query(*matchRidesQuery(rid, rno))
+
+# Returns the query run by matchRides() for rid and rno, along with its parameters.
+def matchRidesQuery(rid = None, rno = None):
+
+    conditions = ''
+    params = {'rid': rid, 'rno': rno}
+
+    if (rid != None):
+        conditions += 'AND q.rid = :rid '
+
+    if (rno != None):
+        conditions += 'AND r.rno = :rno '
+
+    # Pairing requests and rides by date alone would compare every request with every ride of its date. Instead, each request is paired with the rides that stop at its pickup (through route_stops_lcode) on its date, which are only a handful, and those rides must stop at its dropoff further along their route. When rno is given, the pairs are found from the other side: the stops of the ride, then the requests picking up there on its date (through requests_pickup_rdate).
+    return queries['matchRides'].format(conditions), params
+
+# Prints the matches from matchRides() under a heading that says what they are, or nothing if there are none, and returns how many there were. Used after a ride is offered or a request is posted, and by the match command.
+def showMatches(matches, description):
+
+    matches = lazyRows(matches)
+    count = 0
+
+    if (not matches):
+        return count
+
+    print('Found {}:'.format(description))
+
+    formatString = '    {:<7}  {:<15}  {:<12}  {:<7}  {:<8}  {:<7}  {:<5}  {:<15}  {:<6}  {:<10}'
+
+    print(formatString.format(*'rid, requester, date, pickup, dropoff, amount, rno, driver, price, seats left'.split(', ')))
+
+    for match in matches:
+        print(formatString.format(*fixResults([match])[0]))
+        count += 1
+
+    print()
+
+    return count
+
+##
+#### Non-interactive commands start here ####
+##
+
+# Runs a command given on the command line after the database path. Returns 0 on success and -1 otherwise, which main() passes on.
+def runCommand(args):
+
+    command = args[0].lower()
+
+    if (command == 'seats' and len(args) == 2 and args[1].lower() == 'verify'):
+        return verifyAvailability()
+
+    elif (command == 'seats' and len(args) == 2 and args[1].lower() == 'rebuild'):
+        return rebuildAvailability()
+
+    elif (command == 'ids' and len(args) == 4 and args[1].lower() == 'reserve'):
+        return reserveIds(args[2].lower(), args[3])
+
+    elif (command == 'upgrade' and len(args) == 1):
+        return runUpgrade()
+
+    elif (command == 'plans' and len(args) == 1):
+        return checkPlans()
+
+    elif (command == 'batch' and len(args) == 2):
+        return runBatch(args[1])
+
+    elif (command == 'import' and len(args) == 3):
+        return runImport(args[1].lower(), args[2])
+
+    elif (command == 'match' and len(args) == 1):
+        return runMatch()
+
+    elif (command == 'broadcast' and len(args) == 5 and args[1].lower() in ('ride', 'location')):
+        return runBroadcast(*args[1:])
+
+    print('Unrecognized command \'{}\'. Valid commands are:\n'
+          '    seats verify    \tCheck ride_availability against the bookings of every ride\n'
+          '    seats rebuild   \tRecompute ride_availability from the bookings of every ride\n'
+          '    ids reserve T N \tReserve N keys of table T (rides, bookings, or requests) for a bulk load\n'
+          '    upgrade         \tCreate any missing indexes and triggers, then check the query plans\n'
+          '    plans           \tCheck that the statements members wait on search indexes instead of scanning tables\n'
+          '    batch FILE      \tRun the offer, book, post and cancel commands in a JSONL or CSV file\n'
+          '    import T FILE   \tBulk load the rows of a JSONL or CSV file into table T\n'
+          '    match           \tList the rides that can serve every ride request\n'
+          '    broadcast ride RNO SENDER MESSAGE\n'
+          '    broadcast location L SENDER MESSAGE\n'
+          '                    \tSend MESSAGE from SENDER to every member booked on ride RNO, or with a request from location (lcode or city) L'.format(' '.join(args)))
+
+    return -1
+
+# Compares every row of ride_availability with the seats and bookings it should reflect, and prints the rides that disagree. Returns 0 if everything matches.
+def verifyAvailability():
+
+    # The first half finds rides whose row is missing or wrong, the second finds rows left behind by rides that no longer exist.
+    qCompare = '''
+
+        SELECT
+            expected.rno,
+            expected.seats,
+            expected.booked,
+            a.seats,
+            a.booked
+        FROM
+            (
+                SELECT
+                    r.rno AS rno,
+                    r.seats AS seats,
+                    IFNULL(SUM(b.seats), 0) AS booked
+                FROM
+                    rides AS r
+                LEFT OUTER JOIN
+                    bookings AS b ON b.rno = r.rno
+                GROUP BY
+                    r.rno,
+                    r.seats
+            ) AS expected
+        LEFT OUTER JOIN
+            ride_availability AS a ON a.rno = expected.rno
+        WHERE
+            a.rno IS NULL
+            OR a.seats IS NOT expected.seats
+            OR a.booked != expected.booked
+
+        UNION ALL
+
+        SELECT
+            a.rno,
+            NULL,
+            NULL,
+            a.seats,
+            a.booked
+        FROM
+            ride_availability AS a
+        WHERE
+            NOT EXISTS (SELECT rno FROM rides WHERE rno = a.rno)
+
+        ORDER BY
+            1 ;
+
+    '''
+
+    mismatches = 0
+    formatString = '    {:<11}  {:<15}  {:<15}  {:<15}  {:<15}'
+
+    for row in db.query(qCompare):
+
+        if (mismatches == 0):
+            print(formatString.format(*'Ride No., Seats (ride), Booked (ride), Seats (table), Booked (table)'.split(', ')))
+
+        print(formatString.format(*fixResults([row])[0]))
+        mismatches += 1
+
+    if (mismatches > 0):
+        print('\n{} rides in ride_availability are out of date. Run \'seats rebuild\' to fix them.'.format(mismatches))
+        return -1
+
+    print('ride_availability matches the bookings of every ride.')
+
+    return 0
+
+# Throws away ride_availability and refills it from the rides and bookings tables.
+def rebuildAvailability():
+
+    db.write(fillAvailability)
+
+    c.execute('SELECT COUNT(rno) FROM ride_availability;')
+    print('Rebuilt ride_availability for {} rides.'.format(c.fetchone()[0]))
+
+    return 0
+
+# Prints every match between ride requests and rides (see matchRides()), followed by how many there are and how long finding them took.
+def runMatch():
+
+    start = perf_counter()
+
+    matches = showMatches(matchRides(), 'rides that can serve ride requests')
+
+    print('Found {} matches in {:.2f} seconds.'.format(matches, perf_counter() - start))
+
+    return 0
+
+# Sends message from sender to every member booked on a ride (kind 'ride', target an rno) or with a request from a location (kind 'location', target an lcode or city) in one transaction, and prints how many members were messaged. Returns 0 if it was sent.
+def runBroadcast(kind, target, sender, message):
+
+    if (db.fetchone('SELECT COUNT(email) FROM members WHERE lower(email) = ? ;', (sender.lower(),))[0] != 1):
+        print('The email address \'{}\' is not registered to a member.'.format(sender))
+        return -1
+
+    if (kind.lower() == 'ride'):
+
+        try:
+            rno = int(target)
+        except ValueError:
+            print('The ride number \'{}\' is not an integer.'.format(target))
+            return -1
+
+        if (db.fetchone('SELECT COUNT(rno) FROM rides WHERE rno = ? ;', (rno,))[0] != 1):
+            print('The ride number \'{}\' does not exist.'.format(rno))
+            return -1
+
+        count, skipped = db.write(broadcastMessage, sender, message, rno)
+        print('Sent the message to {} member{} booked on ride {}.'.format(count, '' if count == 1 else 's', rno))
+        printSkipped(skipped)
+
+    else:
+        count, skipped = db.write(broadcastMessage, sender, message, None, target)
+        print('Sent the message to {} member{} with a request from \'{}\'.'.format(count, '' if count == 1 else 's', target))
+        printSkipped(skipped)
+
+    return 0
+
+# Reserves a block of count keys for table so that a bulk loader can insert rows with those keys without colliding with other sessions.
+def reserveIds(table, count):
+
+    if (table not in idColumns):
+        print('Keys can only be reserved for {}.'.format(', '.join(idColumns)))
+        return -1
+
+    try:
+        count = int(count)
+    except ValueError:
+        print('The number of keys is not an integer.')
+        return -1
+
+    if (count < 1):
+        print('The number of keys must be at least one.')
+        return -1
+
+    first = db.write(allocateIds, table, count)
+
+    print('Reserved {} {} from {} to {}.'.format(idColumns[table], table, first, first + count - 1))
+
+    return 0
+
+# Brings the schema up to date (connect() has already done so, but running it here reports failures), rebuilds the location index, and checks the query plans of the statements in queries (see checkPlans()). Returns 0 if none of them scan a table they shouldn't.
+def runUpgrade():
+
+    db.write(upgradeSchema)
+
+    # The location index is keyed by the rowids of locations, which VACUUM may have renumbered, so we rebuild it in case.
+    if (ftsEnabled):
+        db.write(fillLocationIndex)
+
+    c.execute('SELECT COUNT(name) FROM sqlite_master WHERE type IN (\'index\', \'trigger\') AND sql IS NOT NULL;')
+    print('The schema is up to date ({} indexes and triggers).\n'.format(c.fetchone()[0]))
+
+    return checkPlans()
+
+# Prints the query plan of every statement from planChecks() and flags the steps that scan a whole table (other than the ones the statement is allowed to scan). Returns 0 if there are none, so that a change to a statement or to the indexes that turns an index search into a table scan is caught.
+def checkPlans():
+
+    # The tables that grow with the number of members, rides and bookings. The rest (table_versions and id_sequences) only hold a row per table.
+    largeTables = {'members', 'cars', 'locations', 'rides', 'enroute', 'bookings', 'requests', 'inbox', 'route_stops', 'ride_availability'}
+
+    failed = []
+
+    for name, query, params, allowed in planChecks():
+
+        print('{}:'.format(name))
+
+        # Scans name tables by their alias in the statement, so we map the aliases back to their tables.
+        aliases = {alias.lower(): table.lower() for table, alias in findall(r'(\w+)\s+AS\s+(\w+)', query)}
+
+        for step in c.execute('EXPLAIN QUERY PLAN ' + query, params).fetchall():
+
+            words = step[3].split()
+            table = aliases.get(words[1].lower(), words[1].lower())
+
+            # Scans of a virtual table are searches of its own index (the FTS5 index for locations_fts).
+            scanning = (words[0] == 'SCAN' and table in largeTables and table not in allowed and 'VIRTUAL TABLE' not in step[3])
+
+            print('    {}{}'.format(step[3], '    <-- scans ' + table if scanning else ''))
+
+            if (scanning):
+                failed.append(name)
+
+    if (failed):
+        print('\nThese statements scan a table instead of searching an index: {}.'.format(', '.join(sorted(set(failed)))))
+        return -1
+
+    print('\nEvery statement searches an index.')
+
+    return 0
+
+# Returns the statements checked by checkPlans() as (name, query, params, allowed) tuples, where params are example arguments and allowed holds the tables the statement has to scan. The statements built from keywords are built the same way as when they are run.
+def planChecks():
+
+    # Without the FTS5 index, substring searches have to scan the locations.
+    substringScans = () if ftsEnabled else ('locations',)
+
+    return [
+        ('authenticateUser', queries['authenticate'], ('', ''), ()),
+        ('login (unread count)', queries['unreadCount'], ('',), ()),
+        ('login (unread page)', queries['unreadMessages'], ('',), ()),
+        ('getProfile', queries['profile'], ('',), ()),
+        ('getProfile (cars)', queries['profileCars'], ('',), ()),
+        ('searchLocation', *searchLocationQuery('edmonton'), substringScans),
+        ('searchLocation (short keyword)', *searchLocationQuery('ed'), ('locations',)),
+        ('searchRide', *searchRidesQuery(['edmonton', 'ab1']), substringScans),
+        ('searchRide (in order)', *searchRidesQuery(['edmonton', 'calgary'], True), substringScans),
+        ('displayRides', queries['getRides'], ('',), ()),
+        ('displayBookings', queries['getAllBookings'], ('',), ()),
+        ('addBooking (seats left)', queries['getSeats'], (0,), ()),
+        ('cancelBooking (booking exists)', queries['bookingExists'], (0,), ()),
+        ('cancelBooking (verify driver)', queries['verify'], (0, ''), ()),
+        ('requestsLocations', queries['searchRequests'], {'keyword': ''}, ()),
+        ('displayRequests', queries['memberRequests'], ('',), ()),
+        ('deleteRequest', queries['deleteRequest'], (0, ''), ()),
+        ('broadcastMessage (ride)', queries['broadcastInsert'].format(queries['broadcastRide']), {'sender': '', 'content': '', 'rno': 0}, ()),
+        ('broadcastMessage (location)', queries['broadcastInsert'].format(queries['broadcastRequests']), {'sender': '', 'content': '', 'rno': None, 'keyword': ''}, ()),
+        ('matchRides (new request)', *matchRidesQuery(rid = 0), ()),
+        ('matchRides (new ride)', *matchRidesQuery(rno = 0), ())
+    ]
+
+# Runs the commands in a JSONL or CSV file without any prompts, applying the same checks as the interactive pages. Each line is one command, with an 'op' of offer, book, post or cancel, and the fields that page would ask for (see the batch functions below). Lines are applied config['batchSize'] at a time in one transaction, and a line that fails is rolled back on its own and reported without stopping the rest.
+def runBatch(path):
+
+    if not os.path.exists(path):
+        print('The file \'{}\' does not exist. Please check the path argument.'.format(path))
+        return -1
+
+    applied = 0
+    failed = 0
+    start = perf_counter()
+
+    with open(path, newline = '') as commandFile:
+
+        commands = readCommands(commandFile, path.lower().endswith('.csv'))
 
-        # Car number checking
         while True:
-            command = input('Would you like to specify a car number? (y/n) > ').lower().strip()
 
-            if (command == 'y'):
+            chunk = list(islice(commands, config['batchSize']))
 
-                while True:
+            if (not chunk):
+                break
 
-                    cno = input('Please specify a car number...> ').lower().strip()
+            errors = db.write(applyCommands, chunk)
 
-                    if (cno == 'exit'):
-                        return
+            for lineNumber, error in errors:
+                print('Line {}: {}'.format(lineNumber, error))
 
-                    # Finding locations that match the keyword (substring included)
-                    c.execute('SELECT owner FROM cars WHERE cno = ?;', (cno,))
-                    owner = c.fetchone()
+            applied += len(chunk) - len(errors)
+            failed += len(errors)
 
-                    if (not owner):
-                        print('Car number \'{}\' does not exist. Please try again.\n'.format(cno))
-                        continue
+    elapsed = perf_counter() - start
 
-                    if (owner[0] != email):
-                        print('The car number specified exists, but does not belong to you. You must specify a car that you own.\n')
-                        continue
+    print('\nApplied {} commands and rejected {} in {:.2f} seconds ({:.0f} commands per second).'.format(applied, failed, elapsed, (applied + failed) / elapsed if elapsed > 0 else 0))
 
-                    break
+    return (0 if failed == 0 else -1)
 
-            elif (command == 'n'):
-                print('A car number will not be added.\n')
-                cno = None
-            else:
-                print('Unrecognized command. Please try again.\n')
-                continue
+# Reads the commands out of a JSONL or CSV command file, one line at a time. Yields the line number of each command, its fields as a dictionary, and an error message if the line could not be read (in which case the fields are None).
+def readCommands(commandFile, isCSV):
 
-            break
+    if (isCSV):
+        # The header is line 1, so the first command is on line 2.
+        for lineNumber, fields in enumerate(csv.DictReader(commandFile), 2):
+            yield lineNumber, fields, None
 
-        # Compute next rno. If the table has no rides, it starts from one.
-        c.execute('SELECT IFNULL(MAX(rno) + 1, 1) FROM rides')
-        rno = c.fetchone()[0]
+        return
+
+    for lineNumber, line in enumerate(commandFile, 1):
+
+        if (not line.strip()):
+            continue
+
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            yield lineNumber, None, 'The line is not valid JSON.'
+            continue
 
-        # Finally add the ride specified
-        c.execute('INSERT INTO rides VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (rno, price, date, seats, luggageDesc, srcLocation[0], dstLocation[0], email, cno))
+        if (not isinstance(fields, dict)):
+            yield lineNumber, None, 'The line is not a JSON object.'
+            continue
 
-        # Add all enroute locations
-        for location in ERLocations:
-            c.execute('INSERT INTO enroute VALUES (?, ?)', (rno, location))
+        yield lineNumber, fields, None
 
-        # Commit changes
-        conn.commit()
+# Applies a chunk of commands from readCommands() and returns the line number and error message of each one that failed. Each command runs in its own savepoint so that a failing one is undone without undoing the rest. Meant to be run through db.write().
+def applyCommands(chunk):
 
-        print('Ride added sucessfully.\n')
+    errors = []
 
-        break
+    for lineNumber, fields, error in chunk:
 
-    return
+        if (error):
+            errors.append((lineNumber, error))
+            continue
 
-# Searches for a exactly matching lcode or a substring of a city, province, or address.
-def searchLocation(keyword):
+        c.execute('SAVEPOINT batchCommand;')
 
-    qSearch = '''
+        try:
+            applyCommand(fields)
 
-        SELECT
-            lcode,
-            city,
-            prov,
-            address
-        FROM
-            locations
-        WHERE
-            lower(lcode) = :keyword
-            OR city LIKE '%' || :keyword || '%'
-            OR prov LIKE '%' || :keyword || '%'
-            OR address LIKE '%' || :keyword || '%' ;
+        except (ValueError, sqlite3.IntegrityError) as error:
+            c.execute('ROLLBACK TO batchCommand;')
+            errors.append((lineNumber, str(error)))
 
-    '''
+        c.execute('RELEASE batchCommand;')
 
-    c.execute(qSearch, {'keyword':keyword})
+    return errors
 
-    return c.fetchall()
+# Applies a single command from a command file.
+def applyCommand(fields):
 
-# Helper Function that handles the commands for displaying results. Meant to be passed into resultsWizard(). This helper function uses the "special case", hence the non underscore parameter.
-def searchLocationHelper(email, location):
+    op = batchField(fields, 'op')
 
-    while True:
+    if (op == 'offer'):
+        batchOffer(fields)
+    elif (op == 'book'):
+        batchBook(fields)
+    elif (op == 'post'):
+        batchPost(fields)
+    elif (op == 'cancel'):
+        batchCancel(fields)
+    else:
+        raise ValueError('Unrecognized op \'{}\'. Valid ops are \'offer\', \'book\', \'post\', and \'cancel\'.'.format(op))
 
-        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+    return
 
-        if (command == 'select'):
-            validLoc = selectLocation(location)
+# Offers a ride, like offerRide(). Fields: driver, date, seats, price, luggage, src, dst, and optionally enroute (a list, or lcodes separated by spaces or semicolons) and cno.
+def batchOffer(fields):
 
-            if (validLoc):
-                print('Valid location code selected. Type exit to return back to the offer page.\n')
+    driver = batchMember(fields, 'driver')
 
-            continue
-        elif (command == 'more'):
-            return True
-        elif (command == 'exit'):
-            if (not location):
-                return False
+    date = batchField(fields, 'date')
 
-            return
-        else:
-            print('Unrecognized command. Valid commands are \'select\', \'more\', and \'exit\'.')
+    if (not isValidDate(date)):
+        raise ValueError('The date is not valid.')
 
-# Small loop to prompt the user to select a location. takes in a location *list* as its parameter since we have to modify it and reference it outside the function.
-def selectLocation(location):
+    seats = batchInteger(fields, 'seats')
+    price = batchInteger(fields, 'price')
+    luggageDesc = batchField(fields, 'luggage')
+    src = batchLocation(fields, 'src')
+    dst = batchLocation(fields, 'dst')
 
-    while True:
+    ERLocations = fields.get('enroute') or []
 
-        locKeyword = input('Type the lcode of the destination you wish to pick... > ').lower().strip()
+    if (isinstance(ERLocations, str)):
+        ERLocations = ERLocations.replace(';', ' ').split()
 
-        c.execute('SELECT COUNT(lcode) FROM locations WHERE lower(lcode) = ?', (locKeyword,))
+    if (not isinstance(ERLocations, list) or not all(isinstance(location, str) for location in ERLocations)):
+        raise ValueError('The field \'enroute\' must be a list of lcodes, or lcodes separated by spaces or semicolons.')
 
-        if (locKeyword == 'exit'):
-            return
+    ERLocations = [location.lower().strip() for location in ERLocations]
 
-        if (c.fetchone()[0] != 1):
-            print('The lcode you have specified does not exist. Please try again.\n')
-            continue
+    for location in ERLocations:
+        if (not isLocation(location)):
+            raise ValueError('The enroute lcode \'{}\' does not exist.'.format(location))
 
-        location.append(locKeyword)
+    cno = batchField(fields, 'cno', required = False)
 
-        return True
+    if (cno != None):
+        owner = carOwner(cno)
 
-##
-#### Functions for searching rides start here (Q2) ####
-##
+        if (not owner):
+            raise ValueError('Car number \'{}\' does not exist.'.format(cno))
 
-# Main control loop for searching lcodes in source ,destination, and enroute locations
-def searchRide(email):
+        if (owner != driver):
+            raise ValueError('The car number specified exists, but does not belong to the driver.')
 
-    qSearchRides = '''
+    insertRide(price, date, seats, luggageDesc, src, dst, driver, cno, ERLocations)
 
-        SELECT
-            r.rno,
-            r.price,
-            r.rdate,
-            r.seats,
-            r.lugDesc,
-            r.driver,
-            c.cno,
-            c.make,
-            c.model,
-            c.year,
-            c.seats
-        FROM
-            rides AS r
-        INNER JOIN
-            locations AS lSrc ON lSrc.lcode = r.src
-        INNER JOIN
-            locations AS lDst ON lDst.lcode = r.dst
-        LEFT OUTER JOIN
-            cars AS c USING(cno)
-        LEFT OUTER JOIN
-            enroute AS er USING(rno)
-        LEFT OUTER JOIN
-            locations AS lEr ON lEr.lcode = er.lcode
-        WHERE
-            lower(lSrc.lcode) = :keyword
-            OR lower(lDst.lcode) = :keyword
-            OR lower(lEr.lcode) = :keyword
-
-            OR lSrc.city LIKE '%' || :keyword || '%'
-            OR lDst.city LIKE '%' || :keyword || '%'
-            OR lEr.city LIKE '%' || :keyword || '%'
-            OR lSrc.prov LIKE '%' || :keyword || '%'
-            OR lDst.prov LIKE '%' || :keyword || '%'
-            OR lEr.prov LIKE '%' || :keyword || '%'
-            OR lSrc.address LIKE '%' || :keyword || '%'
-            OR lDst.address LIKE '%' || :keyword || '%'
-            OR lEr.address LIKE '%' || :keyword || '%' ;
+    return
 
-    '''
+# Books a member on a ride, like addBooking(). Fields: driver, rno, email, cost, seats, pickup, dropoff, and optionally overbook, which must be true to book more seats than are left.
+def batchBook(fields):
 
-    os.system('clear||cls')
-    print('You are now searching for rides matching locations. Type \'exit\' to return to the main menu.\n')
+    driver = batchMember(fields, 'driver')
+    rno = batchInteger(fields, 'rno')
 
-    while True:
+    c.execute('SELECT COUNT(rno) FROM rides WHERE rno = ? ;', (rno,))
 
-        # Get a keyword list from the user. We replace all commas by spaces, and split the resulting string into a list of keywords.
-        keywordList = input('Enter 1 to 3 keywords separated by spaces or commas: ').replace(',', ' ').split()
+    if (c.fetchone()[0] != 1):
+        raise ValueError('The ride number \'{}\' does not exist.'.format(rno))
 
-        # Check that the range of keywordList is in [1, 3].
-        if len(keywordList) > 0 and len(keywordList) <= 3:
+    c.execute('SELECT COUNT(rno) FROM rides WHERE rno = ? AND lower(driver) = ? ;', (rno, driver))
 
-            # Check if the user wants to exit. No IndexError will occur since we are in the if loop that checks the range
-            if (keywordList[0] == 'exit'):
-                return
+    if (c.fetchone()[0] != 1):
+        raise ValueError('Ride with rno \'{}\' does not belong to the driver.'.format(rno))
 
-            # Define a master result set. We use a set since we want to eliminate duplicates. We'll convert it to a list later to be able to use subscripting.
-            results = set()
+    email = batchMember(fields, 'email')
+    cost = batchInteger(fields, 'cost')
+    seats = batchInteger(fields, 'seats')
+    pickup = batchLocation(fields, 'pickup')
+    dropoff = batchLocation(fields, 'dropoff')
 
-            # Searches the database once for every keyword. Converts the result list to a set and unions it with results
-            for keyword in keywordList:
+    overbook = batchField(fields, 'overbook', required = False) in ('true', 'yes', 'y', '1')
 
-                c.execute(qSearchRides, {'keyword':keyword})
-                results = results.union(set(c.fetchall()))
+    if (seatsLeft(rno) - seats < 0 and not overbook):
+        raise ValueError('The seats booked exceed the available seats. Set overbook to true to book them anyway.')
 
-            # If the length of the result set is 0, then we know that no results have been found
-            if len(results) == 0:
-                print('No results were found.')
-                continue
+    insertBooking(email, rno, cost, seats, pickup, dropoff)
 
-            # Converts the set to a list so we can use array subscripting.
-            results = list(results)
+    return
 
-            # Starts displaying results
-            print('\nDisplaying Results. At any point, you can type \'send\' to send a message to a specific ride, or press  \'more\' to display more results. Type \'exit\' to return to the search.')
+# Posts a ride request, like postRideRequest(). Fields: email, date, pickup, dropoff, amount.
+def batchPost(fields):
 
-            formatString = '    {:<5}  {:<5}  {:<12}  {:<7}  {:<15}  {:<15}  {:<7}  {:<15}  {:<15}  {:<6}  {:<3}'
+    email = batchMember(fields, 'email')
 
-            print(formatString.format(*'rno, price, date, seats, Luggage Desc, driver, carno, make, model, year, seats'.split(', ')))
+    date = batchField(fields, 'date')
 
-            # Calls the results wizard to display 5 at a time, etc.
-            resultsWizard(email, results, formatString, searchRideHelper)
+    if (not isValidDate(date)):
+        raise ValueError('The date is not valid.')
 
-        else:
-            print('The number of keywords does not fall between 1 and 3. Please try again.')
+    pickup = batchLocation(fields, 'pickup')
+    dropoff = batchLocation(fields, 'dropoff')
+    amount = batchInteger(fields, 'amount')
 
-        print()
+    insertRequest(email, date, pickup, dropoff, amount)
 
     return
 
-# Small function for handling input for the search "engine" above. Returns True if the user requests more results, and None if the user wants to exit. For sending a message, we call sendMessageHelper(). We have to define an extra parameter because of the way I designed the function.
-def searchRideHelper(email, _):
+# Cancels a booking and messages the member who made it, like cancelBooking(). Fields: driver, bno.
+def batchCancel(fields):
 
-    while True:
-
-        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+    driver = batchMember(fields, 'driver')
+    bno = batchInteger(fields, 'bno')
 
-        if (command == 'send'):
-            sendMessageHelper(email)
-            continue
-        elif (command == 'more'):
-            return True
-        elif (command == 'exit'):
-            return
-        else:
-            print('Unrecognized command. Valid commands are \'more\', \'send\', and \'exit\'.')
+    c.execute(queries['bookingExists'], (bno,))
 
-    return
+    if (c.fetchone()[0] < 1):
+        raise ValueError('Booking with bno \'{}\' does not exist.'.format(bno))
 
-# This function handles all input and message sending given a member's email. It prompts the user for a rno and checks if it exists. If it does, it allows them to send a message.
-def sendMessageHelper(email):
+    c.execute(queries['verify'], (bno, driver))
 
-    print()
+    if (c.fetchone()[0] < 1):
+        raise ValueError('Booking with bno \'{}\' does not belong to the driver.'.format(bno))
 
-    while True:
+    deleteBooking(bno, driver)
 
-        rno = input('Please type the ride number (rno) of the ride you want to send a message to or type \'exit\' to return to search... > ').lower().strip()
+    return
 
-        if (rno == 'exit'):
-            return
+# Returns field name of a batch command in lowercase with surrounding whitespace removed, or None if it is missing and not required. A missing required field, or one given as a JSON list or object, raises a ValueError.
+def batchField(fields, name, required = True):
 
-        try:
-            rno = int(rno)
-        except ValueError:
-            print('Input is not an integer. Please try again.\n')
-            continue
+    value = fields.get(name)
 
-        # Check existence of ride and print appropriate message if it does not.
-        c.execute('SELECT driver FROM rides WHERE rno = ? ;', (rno,))
+    if (isinstance(value, (list, dict))):
+        raise ValueError('The field \'{}\' must be a single value.'.format(name))
 
-        # In form of 'driver' <-- (driver,)[0]
-        driver = c.fetchone()[0]
+    value = ('' if value == None else str(value).lower().strip())
 
-        # This checks if the rno of that ride exists and grabs the driver.
-        if (not driver):
-            print('The ride you specified does not exist. Please try again.\n')
-            continue
+    if (not value):
+        if (required):
+            raise ValueError('The field \'{}\' is missing.'.format(name))
 
-        message = input('Type the message you want to send to \'{}\'... > '.format(driver))
+        return
 
-        if (message == 'exit'):
-            return
+    return value
 
-        c.execute('INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, ?, ?, \'n\')', (driver, email, message, rno))
-        conn.commit()
+# Returns field name of a batch command as an integer, raising a ValueError if it is not one, or if it is too large for SQLite to store.
+def batchInteger(fields, name):
 
-        print('Message sent.\n')
+    value = batchField(fields, name)
 
-        return
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError('The field \'{}\' is not an integer.'.format(name))
 
-##
-#### Functions for handling bookings of rides start here (Q3) ####
-##
+    if (not -2 ** 63 <= value < 2 ** 63):
+        raise ValueError('The field \'{}\' is too large.'.format(name))
 
-# This function is the main control loop for the bookings page. It allows a user to display bookings, add, or cancel them.
-def bookingsPage(email):
+    return value
 
-    os.system('clear||cls')
-    print('This is bookings page. Type \'display\' to display your bookings, \'book\' to book a ride, or \'cancel\' to cancel a booking. Type \'exit\' at any point to exit the posting page.\n')
+# Returns field name of a batch command if it is the lcode of a location, raising a ValueError otherwise.
+def batchLocation(fields, name):
 
-    while True:
+    lcode = batchField(fields, name)
 
-        command = input('Enter a command... > ').lower().strip()
+    if (not isLocation(lcode)):
+        raise ValueError('The {} lcode \'{}\' does not exist.'.format(name, lcode))
 
-        if (command == 'exit'):
-            return
-        elif (command == 'display'):
-            displayBookings(email)
-            continue
-        elif (command == 'book'):
-            displayRides(email)
-            continue
-        elif (command == 'cancel'):
-            cancelBooking(email)
-            continue
-        else:
-            print('Unrecognized command. Valid commands are \'display\', \'book\', \'cancel\', and \'exit\'.\n')
-            continue
+    return lcode
 
-    return
+# Returns field name of a batch command if it is the email of a member, raising a ValueError otherwise.
+def batchMember(fields, name):
 
-# This fucntion gets all the available seats from every ride of the user
-def displayRides(email):
+    email = batchField(fields, name)
 
-    qGetRides = '''
+    c.execute('SELECT COUNT(email) FROM members WHERE lower(email) = ? ;', (email,))
 
-        SELECT DISTINCT
-            r.rno AS rno,
-            IFNULL(SUM(b.seats), 0) AS booked,
-            r.seats - IFNULL(SUM(b.seats), 0) AS available,
-            r.rdate
-        FROM
-            rides AS r
-        LEFT OUTER JOIN
-            bookings AS b ON b.rno = r.rno
-        WHERE
-            r.driver = ?
-        GROUP BY
-            r.rno,
-            r.seats,
-            r.rdate
+    if (c.fetchone()[0] != 1):
+        raise ValueError('The email address \'{}\' is not registered to a member.'.format(email))
 
-    '''
+    return email
 
-    # Gets all the available seats from every ride of the user.
-    c.execute(qGetRides, (email,))
+# Bulk loads the rows of a JSONL or CSV file into table, which must be one of importTables. Each line is one row, given as a JSON object or CSV record keyed by column name (missing columns and empty CSV values are NULL). Everything happens in one transaction (see importRows()), so other sessions see either none of the rows or all of them along with the indexes and derived data that go with them. The price is that the write lock is held for the whole load: other sessions can still read, but their writes wait (and give up after config['busyTimeout']) until the import is done, so large imports are best run when nothing else is writing. Foreign keys are only checked once every row is in, and the import is rolled back if any row references a missing row, so tables must be loaded after the tables they reference, in the order of importTables.
+def runImport(table, path):
 
-    results = c.fetchall()
+    if (table not in importTables):
+        print('Only {} can be imported.'.format(', '.join(importTables)))
+        return -1
 
-    print('\nDisplaying Results. At any point, you can type \'book\' to start booking a member to a ride, or press \'more\' to display more results. Type \'exit\' to return to the bookings page.')
+    if not os.path.exists(path):
+        print('The file \'{}\' does not exist. Please check the path argument.'.format(path))
+        return -1
 
-    formatString = '    {:<11}  {:<9}  {:<11}  {:<12}'
+    start = perf_counter()
 
-    print(formatString.format(*'Ride No., Booked, Avaliable, Date'.split(', ')))
+    # Foreign keys can only be switched off outside of a transaction.
+    c.execute('PRAGMA foreign_keys = OFF;')
 
-    # Calls the results wizard to display 5 at a time, etc.
-    resultsWizard(email, results, formatString, addBookingHelper)
+    try:
+        imported, status = db.write(importRows, table, path)
+    except sqlite3.DatabaseError as error:
+        print('Nothing was imported into {}: {}'.format(table, error))
+        return -1
+    finally:
+        c.execute('PRAGMA foreign_keys = ON;')
 
+    elapsed = perf_counter() - start
 
-    return
+    print('Imported {} rows into {} in {:.2f} seconds ({:.0f} rows per second), rebuilding its indexes and derived data.'.format(imported, table, elapsed, imported / elapsed if elapsed > 0 else 0))
 
-# Helper function that is the main control loop for displaying/adding bookings. Meant to be passed into resultsWizard().
-def addBookingHelper(email, _):
+    if (config['analyze']):
+        start = perf_counter()
+        db.write(c.execute, 'ANALYZE {};'.format(table))
+        print('Analyzed {} in {:.2f} seconds.'.format(table, perf_counter() - start))
 
-    while True:
+    return status
 
-        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+# Does the work of runImport() inside the transaction of db.write(), returning how many rows were imported and the status. The indexes and triggers on table are dropped first, so rows are inserted without updating any index but the primary key, and without triggers renumbering route_stops or bumping counters once per row. The file is streamed and inserted config['chunkSize'] rows at a time with executemany(), so files of any size load in constant memory. Afterwards the indexes and triggers are created again from their saved SQL, and what the triggers would have done is redone once for the whole table. Stops at the first chunk that fails, keeping the chunks before it. Raises an IntegrityError, rolling everything back, if any row loaded references a missing row.
+def importRows(table, path):
 
-        if (command == 'book'):
-            addBooking(email)
-            continue
-        elif (command == 'more'):
-            return True
-        elif (command == 'exit'):
-            return
-        else:
-            print('Unrecognized command. Valid commands are \'more\', \'book\', and \'exit\'.')
+    c.execute('PRAGMA table_info({});'.format(table))
+    columns = [column[1] for column in c.fetchall()]
 
-    return
+    qInsert = 'INSERT INTO {} ({}) VALUES ({});'.format(table, ', '.join(columns), ', '.join('?' * len(columns)))
 
-# Displays a member's bookings, if any.
-def displayBookings(email):
+    # Indexes made by SQLite itself for primary keys and unique constraints have no SQL, and can't be dropped.
+    c.execute('SELECT type, name, sql FROM sqlite_master WHERE type IN (\'index\', \'trigger\') AND tbl_name = ? AND sql IS NOT NULL;', (table,))
+    schema = c.fetchall()
 
-    qGetAllBookings = '''
+    for kind, name, sql in schema:
+        c.execute('DROP {} {};'.format(kind.upper(), name))
 
-        SELECT
-            b.*
-        FROM
-            bookings AS b
-        INNER JOIN
-            rides AS r ON r.rno = b.rno
-        WHERE
-            lower(r.driver) = ?
+    # Rows get rowids past the largest one already in the table, which lets us tell the imported rows apart when checking foreign keys.
+    c.execute('SELECT IFNULL(MAX(rowid), 0) FROM {};'.format(table))
+    lastRowid = c.fetchone()[0]
 
-    '''
+    imported = 0
+    status = 0
 
-    # Get all of the member's requests
-    c.execute(qGetAllBookings, (email,))
+    with open(path, newline = '') as rowFile:
 
-    results = c.fetchall()
+        lines = readCommands(rowFile, path.lower().endswith('.csv'))
 
-    # Check if the user has requests
-    if (len(results) == 0):
-        print('You have no bookings.\n')
-        return
+        while True:
 
-    print('Bookings for \'{}\':'.format(email))
+            chunk = list(islice(lines, config['chunkSize']))
 
-    formatString = '    {:<13}  {:<15}  {:<13}  {:<9}  {:<9}  {:<10}  {:<10}'
+            if (not chunk):
+                break
 
-    # Print table headers
-    print(formatString.format(*'Booking No., Email, Ride No., Cost, Seats, Pickup, Dropoff'.split(', ')))
+            rows = []
 
-    # Because .format() doesn't like NoneTypes in a format specifier ({:<10} for example), we have to protect againt printing NULLs
-    for r in results:
-        print(formatString.format(r[0], r[1], r[2], r[3] or 'NULL', r[4] or 'NULL', r[5] or 'NULL', r[6] or 'NULL'))
+            for lineNumber, fields, error in chunk:
 
-    return
+                if (error):
+                    print('Line {}: {} Skipping it.'.format(lineNumber, error))
+                    status = -1
+                    continue
 
-# This function allows a user to add a booking based on certain values that are checked.
-def addBooking(email):
+                rows.append(tuple(fields.get(column) if fields.get(column) != '' else None for column in columns))
 
-    qGetSeats = '''
+            # The savepoint lets us undo a chunk that fails part way through without undoing the ones before it.
+            c.execute('SAVEPOINT import_chunk;')
 
-        SELECT DISTINCT
-            r.seats - IFNULL(SUM(b.seats), 0) AS available
-        FROM
-            rides AS r
-        LEFT OUTER JOIN
-            bookings AS b ON b.rno = r.rno
-        WHERE
-            r.rno = ?
-        GROUP BY
-            r.rno,
-            r.seats
+            try:
+                c.executemany(qInsert, rows)
+            except sqlite3.DatabaseError as error:
+                c.execute('ROLLBACK TO import_chunk;')
+                c.execute('RELEASE import_chunk;')
+                print('The chunk of lines {} to {} could not be imported: {}. Stopping.'.format(chunk[0][0], chunk[-1][0], error))
+                status = -1
+                break
 
-    '''
+            c.execute('RELEASE import_chunk;')
 
-    # Ride Number Checking
-    while True:
-        rno = input('Enter an ride number (rno) (creating booking)... > ').lower().strip()
+            imported += len(rows)
 
-        if (rno == 'exit'):
-            return
+    # Now that everything is loaded we check the foreign keys of the imported rows. A row can break more than one of them, so we count the rows separately.
+    violations = 0
+    rows = set()
 
-        # Verifies if rno exists
-        c.execute('SELECT COUNT(rno) FROM rides WHERE rno = ? ;', (rno,))
+    for violation in c.execute('PRAGMA foreign_key_check({});'.format(table)).fetchall():
 
-        if (c.fetchone()[0] != 1):
-            print('The ride number \'{}\' does not exist. Please try again.\n'.format(rno))
+        if (violation[1] <= lastRowid):
             continue
 
-        c.execute('SELECT COUNT(rno) FROM rides WHERE rno = ? AND driver = ? ;', (rno, email))
+        if (violations < 10):
+            print('Row {} of {} references a missing row of {}.'.format(violation[1], violation[0], violation[2]))
 
-        if (c.fetchone()[0] != 1):
-            print('Ride with rno \'{}\' does not belong to you. Please try again.\n'.format(rno))
-            continue
+        violations += 1
+        rows.add(violation[1])
 
-        break
+    if (violations > 0):
+        raise sqlite3.IntegrityError('{} rows of {} reference missing rows ({} foreign key violations).'.format(len(rows), table, violations))
 
-    # Email checking
-    while True:
-        email = input('Enter the email of the person you want to book (creating booking)... > ').lower().strip()
+    for kind, name, sql in schema:
+        c.execute(sql)
 
-        if (email == 'exit'):
-            return
+    # Redoes the work of the triggers we dropped once for the whole table, instead of once for every row.
+    triggers = ' '.join(name for kind, name, sql in schema if kind == 'trigger')
 
-        # Verifies if email exists
-        c.execute('SELECT COUNT(email) FROM members WHERE email = ? ;', (email,))
+    if ('ride_availability_' in triggers):
+        fillAvailability()
 
-        if (c.fetchone()[0] != 1):
-            print('The email address \'{}\' is not registered to a member. Please try again.\n'.format(email))
-            continue
+    if ('route_stops_' in triggers):
+        fillRouteStops()
 
-        break
+    if ('locations_fts_' in triggers):
+        fillLocationIndex()
 
-    # Cost checking
-    while True:
-        cost = input('Enter the cost willing to pay per seat (creating booking)... > ').strip()
+    if ('table_versions_' in triggers):
+        c.execute('UPDATE table_versions SET version = version + 1 WHERE name = ?;', (table,))
 
-        if (cost == 'exit'):
-            return
+    # Logging every key imported would take as long as reading the table again, so caches are told to do that instead.
+    if ('change_log_' in triggers):
+        c.execute('INSERT INTO change_log (name, key) VALUES (?, NULL);', (table,))
 
-        if (len(cost) < 1):
-            print('Cost cannot be empty. Please enter a valid amount.\n')
-            continue
+    # Moves the sequence of the table past the largest key imported.
+    if ('id_sequences_' in triggers):
+        c.execute('UPDATE id_sequences SET next = MAX(next, (SELECT IFNULL(MAX({}) + 1, 1) FROM {})) WHERE name = ?;'.format(idColumns[table], table), (table,))
 
-        try:
-            cost = int(cost)
-        except ValueError:
-            print('Input is not an integer. Please try again.\n')
-            continue
+    return (imported, status)
+
+##
+#### Generic Functions start here ####
+##
 
-        break
+# Asks the user for a file and writes every row returned by rowsFunction(*args) to it, as CSV if the file name ends in .csv and as JSONL otherwise. columns are the names of the columns of the rows. The rows are written as they are read, so any number of rows can be exported.
+def exportResults(columns, rowsFunction, *args):
 
-    # Number of seats checking
     while True:
-        seats = input('Enter the number of seats to be booked (creating booking)... > ').strip()
-        if (seats == 'exit'):
+
+        path = input('Type the name of the file to export to (.csv for CSV, anything else for JSONL)... > ').strip()
+
+        if (path.lower() == 'exit'):
             return
 
-        if (len(seats) < 1):
-            print('Seats cannot be empty. Please enter a valid amount.\n')
+        if (len(path) < 1):
+            print('The file name cannot be empty. Please try again.\n')
             continue
 
+        start = perf_counter()
+
         try:
-            seats = int(seats)
-        except ValueError:
-            print('Input is not an integer. Please try again.\n')
+            exported = exportRows(rowsFunction(*args) or [], columns, path)
+        except OSError as error:
+            print('Could not write to \'{}\': {}. Please try again.\n'.format(path, error.strerror))
             continue
 
-        break
+        print('Exported {} rows to \'{}\' in {:.2f} seconds.\n'.format(exported, path, perf_counter() - start))
 
-    # Pickup location checking
-    while True:
-        pickup = input('Enter a pickup location lcode (creating booking): ').lower().strip()
+        return
 
-        if (pickup == 'exit'):
-            return
+# Writes rows to the file at path, as CSV with a header of column names if path ends in .csv, and as one JSON object per line otherwise. Returns the number of rows written.
+def exportRows(rows, columns, path):
 
-        # We check if the lcode exists
-        c.execute('SELECT COUNT(lcode) FROM locations WHERE lower(lcode) = ?', (pickup,))
+    exported = 0
 
-        if (c.fetchone()[0] != 1):
-            print('The specified lcode does not exist. Please try again.\n')
-            continue
+    with open(path, 'w', newline = '') as exportFile:
 
-        break
+        if (path.lower().endswith('.csv')):
+            writer = csv.writer(exportFile)
+            writer.writerow(columns)
 
-    # Dropoff location checking
-    while True:
-        dropoff = input('Enter a dropoff location lcode (creating booking): ').lower().strip()
+            for row in rows:
+                writer.writerow(row)
+                exported += 1
 
-        if (dropoff == 'exit'):
-            return
+        else:
+            for row in rows:
+                exportFile.write(json.dumps(dict(zip(columns, row))) + '\n')
+                exported += 1
 
-        # We check if the lcode exists
-        c.execute('SELECT COUNT(lcode) FROM locations WHERE lower(lcode) = ?', (dropoff,))
+    return exported
 
-        # Output in form of (count, )
-        if (c.fetchone()[0] != 1):
-            print('The specified lcode does not exist. Please try again.\n')
-            continue
+# Prepares standard output for the interactive screens. On a terminal, we replace the line buffered sys.stdout with one that is only written out when it is flushed. input() flushes it before reading, so everything a screen prints, starting with the codes from clearScreen(), reaches the terminal in a single write right before the screen waits for the user. When the output is not a terminal (a pipe or a file), it is left as it is and clearScreen() prints nothing. Tab completion of locations is also set up here, see completeLocation().
+def startScreen():
+    global screenIsTTY, screenHasANSI
 
-        break
+    screenIsTTY = sys.stdout.isatty()
 
-    c.execute(qGetSeats, (rno,))
+    if (screenIsTTY):
+        screenHasANSI = enableANSI()
 
-    # Checking for an overbooking
-    if (c.fetchone()[0] - seats < 0):
+        sys.stdout.flush()
+        sys.stdout = io.TextIOWrapper(io.BufferedWriter(io.FileIO(sys.stdout.fileno(), 'w', closefd = False), 1 << 16), encoding = sys.stdout.encoding, errors = sys.stdout.errors)
 
-        # Prompt the user to accept an overbooking
-        while True:
-            print('The seats that you are trying to book exceeds the available seats, which will cause an overbooking.')
-            command = input('Would you like to proceed? (y/n) > ').lower().strip()
+    # Tab completes locations. Keywords are separated by spaces, commas and '>', so each one is completed on its own. macOS builds of Python use libedit, which binds keys differently.
+    if (readline != None):
+        readline.set_completer(completeLocation)
+        readline.set_completer_delims(' \t,>')
 
-            if (command == 'y'):
-                break
-            elif (command == 'n'):
-                return
-            else:
-                print('Unknown command. Please try again.\n')
-                continue
+        if ('libedit' in (readline.__doc__ or '')):
+            readline.parse_and_bind('bind ^I rl_complete')
+        else:
+            readline.parse_and_bind('tab: complete')
 
-    # Get the last bno value and increment it by 1. If rid values are NULL then bno value will be 1 for the new request
-    c.execute('SELECT IFNULL((MAX(bno) + 1), 1) FROM bookings ;')
-    bno = c.fetchone()[0]
+    return
 
-    # Insert the new values
-    c.execute('INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?)', (bno, email, rno, cost, seats, pickup, dropoff))
-    conn.commit()
+# Makes sure the terminal on standard output understands ANSI codes, and returns whether it does. Terminals elsewhere always do. The Windows console only does once virtual terminal processing is turned on for it, which versions before Windows 10 don't support.
+def enableANSI():
 
-    # Print success message
-    print('Member booked successfully.\n')
+    if (os.name != 'nt'):
+        return True
 
-    return
+    try:
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
 
-# This function allows a user to cancel a booking, provided that it is their own (they are the driver). Upon deletion, it sends a message to the user that was registered on the booking
-def cancelBooking(email):
+        if (not kernel32.GetConsoleMode(handle, ctypes.byref(mode))):
+            return False
 
-    while True:
+        # 0x0004 is ENABLE_VIRTUAL_TERMINAL_PROCESSING.
+        return kernel32.SetConsoleMode(handle, mode.value | 0x0004) != 0
 
-        bno = input('Type the bno of the request which you wish to delete... > ').lower().strip()
+    except (AttributeError, OSError):
+        return False
 
-        if (bno == 'exit'):
-            return
+# Clears the terminal before a screen is drawn. Instead of running the clear (or cls) program in a shell for every screen, we write the ANSI codes that move the cursor home and erase the screen and its scrollback. They are buffered along with the rest of the screen, see startScreen(). Windows consoles without ANSI support fall back to cls.
+def clearScreen():
 
-        # Checking if bno exists
-        c.execute('SELECT COUNT(bno) FROM bookings WHERE bno = ? ;', (bno,))
+    if (not screenIsTTY):
+        return
 
-        if (c.fetchone()[0] < 1):
-            print('Booking with bno \'{}\' does not exist. Please try again.\n'.format(bno))
-            continue
+    if (screenHasANSI):
+        sys.stdout.write('\033[H\033[2J\033[3J')
+    else:
+        sys.stdout.flush()
+        os.system('cls')
 
-        qVerify = '''
+    return
 
-            SELECT
-                COUNT(b.bno)
-            FROM
-                bookings AS b
-            INNER JOIN
-                rides AS r ON r.rno = b.rno
-            WHERE
-                b.bno = ?
-                AND lower(r.driver) = ? ;
+# Reads a password without echoing it. getpass() writes its prompt straight to the terminal, so we flush whatever the screen has buffered first to keep it above the prompt.
+def readPassword(prompt):
 
-        '''
+    sys.stdout.flush()
 
-        c.execute(qVerify, (bno, email))
+    return getpass(prompt)
 
-        if (c.fetchone()[0] < 1):
-            print('Ride with bno \'{}\' does not belong to you. Please try again.\n'.format(bno))
-            continue
+# Returns referenceCache, making sure it is up to date first. If changeToken() hasn't moved since the cache was refreshed, nothing has been committed and no SQL beyond the PRAGMA is run. Otherwise, if the table_versions counter of locations or cars moved, the keys changed since the cache was last refreshed are read from change_log, and only those rows are looked up again, by key. A table is read again in full when the cache is first filled, when it fell behind by more changes than change_log keeps, or when most of it changed. Everything is read from one snapshot, so the cache never misses a change committed while it is being refreshed.
+def referenceData():
 
-        # Since bno is unique we can only have one result. In form (email, rno)
-        c.execute('SELECT email, rno FROM bookings WHERE bno = ? ;', (bno,))
-        memberInfo = c.fetchone()
+    token = changeToken()
 
-        # Sends the appropriate message to the user that has the booking.
-        c.execute('INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, \'Your booking associated with rno {} has been deleted.\', ?, \'n\')'.format(memberInfo[1]), (memberInfo[0], email, memberInfo[1]))
+    if (referenceCache['token'] == token):
+        return referenceCache
 
-        # Finally deletes the booking
-        c.execute('DELETE FROM bookings WHERE bno = ? ;', (bno,))
+    with db.snapshot() as reader:
 
-        # Commits changes
-        conn.commit()
+        versions = dict(reader.execute('SELECT name, version FROM table_versions WHERE name IN (\'locations\', \'cars\');').fetchall())
 
-        print('Ride with rid \'{}\' was deleted.  A message was sent to the user. Returning to requests page...\n'.format(bno))
+        if (versions != referenceCache['versions']):
+            refreshReferenceData(reader)
 
-        return
+    referenceCache['token'] = token
+    referenceCache['versions'] = versions
 
-    return
+    return referenceCache
 
-##
-#### Functions for posting ride requests start here (Q4) ####
-##
+# Brings the locations and car owners of referenceCache up to date with the snapshot of reader, as described in referenceData().
+def refreshReferenceData(reader):
 
-# Gets date, pickup location, dropoff location, and amount from the user. Strips leading and trailing whitespace charcters while also making input lower case. Checks to make sure input is valid.
-def postRideRequest(email):
+    last, first = reader.execute('SELECT IFNULL(MAX(seq), 0), IFNULL(MIN(seq), 1) FROM change_log;').fetchall()[0]
 
-    # Clears console and prints an intro message.
-    os.system('clear||cls')
-    print('This is ride request posting page. Type \'exit\' at any point to exit the posting page.\n')
+    # The keys that changed in each table, or None for the tables read again in full.
+    changed = {table: set() for table in loggedTables}
 
-    while True:
+    if (referenceCache['seq'] == None or referenceCache['seq'] < first - 1):
+        changed = {table: None for table in loggedTables}
 
-        # Date checking
-        while True:
-            date = input('Enter a date (creating request)... > ').lower().strip()
+    else:
+        for name, key in reader.execute('SELECT name, key FROM change_log WHERE seq > ?;', (referenceCache['seq'],)).fetchall():
 
-            if (date == 'exit'):
-                return
+            if (key == None):
+                changed[name] = None
+            elif (changed[name] != None):
+                changed[name].add(key)
 
-            c.execute('SELECT DATE(?);', (date,))
+    for table, cached in (('locations', referenceCache['locations']), ('cars', referenceCache['owners'])):
 
-            # Since a format like the following in SQLite is valid (DATE(ddddd...) where d is an integer) we check the number of dashes is exactly equal to 2 so we can avoid this.
-            if (not c.fetchone()[0] or date.count('-') != 2):
-                print('The date is not valid. Please try again.\n')
-                continue
+        if (changed[table] != None and len(changed[table]) > max(len(cached) // 10, 100)):
+            changed[table] = None
 
-            break
+    if (changed['locations'] == None):
+        loadLocations(reader.execute('SELECT lower(lcode), city, prov, address FROM locations;').fetchall())
 
-        # Dropoff location checking
-        while True:
-            dropoff = input('Enter a dropoff location lcode (creating request): ').lower().strip()
+    elif (changed['locations']):
+        changes = dict.fromkeys((str(lcode).lower() for lcode in changed['locations']))
 
-            if (dropoff == 'exit'):
-                return
+        for lcode in changed['locations']:
+            for row in reader.execute('SELECT lower(lcode), city, prov, address FROM locations WHERE lcode = ?;', (lcode,)).fetchall():
+                changes[row[0]] = row[1:]
 
-            # We check if the lcode exists
-            c.execute('SELECT COUNT(lcode) FROM locations WHERE lower(lcode) = ?', (dropoff,))
+        updateLocations(changes)
 
-            # Output in form of (count, )
-            if (c.fetchone()[0] != 1):
-                print('The specified lcode does not exist. Please try again.\n')
-                continue
+    if (changed['cars'] == None):
+        referenceCache['owners'] = dict(reader.execute('SELECT cno, owner FROM cars;').fetchall())
 
-            break
+    else:
+        for cno in changed['cars']:
+            owner = reader.execute('SELECT owner FROM cars WHERE cno = ?;', (cno,)).fetchall()
 
-        # Pickup location checking
-        while True:
-            pickup = input('Enter a pickup location lcode (creating request): ').lower().strip()
+            if (owner):
+                referenceCache['owners'][cno] = owner[0][0]
+            else:
+                referenceCache['owners'].pop(cno, None)
 
-            if (pickup == 'exit'):
-                return
+    referenceCache['seq'] = last
 
-            # We check if the lcode exists
-            c.execute('SELECT COUNT(lcode) FROM locations WHERE lower(lcode) = ?', (pickup,))
+    return
 
-            if (c.fetchone()[0] != 1):
-                print('The specified lcode does not exist. Please try again.\n')
-                continue
+# Replaces the locations in referenceCache with rows, the (lowercase lcode, city, prov, address) of every location. The completions list and the trigram index are dropped, to be worked out again the next time they are needed.
+def loadLocations(rows):
 
-            break
+    referenceCache['locations'] = {row[0]: row[1:] for row in rows}
+    referenceCache['completions'] = None
+    referenceCache['trigrams'] = None
 
+    return
 
-        while True:
-            amount = input('Amount willing to pay per seat: ').strip()
+# Applies changes to the locations in referenceCache. changes holds the new (city, prov, address) of every location that changed, by lowercase lcode, or None for the ones that were removed. The words of the locations that were removed or changed are taken out of the completions list and the trigram index, and those of the locations that were added or changed are put in, if they have been worked out. The completions list is kept sorted as this is done.
+def updateLocations(changes):
 
-            if (amount=='exit'):
-                return
+    locations = referenceCache['locations']
+    completions = referenceCache['completions']
+    index = referenceCache['trigrams']
 
-            if (len(amount) < 1):
-                print('Amount cannot be empty. Please enter a valid amount.\n')
-                continue
+    for lcode, names in changes.items():
 
-            try:
-                amount = int(amount)
-            except ValueError:
-                print('Input is not an integer. Please try again.\n')
-                continue
+        old = locations.get(lcode)
 
-            break
+        if (old == names):
+            continue
 
-        # Get the last rid value and increment it by 1. If rid values are NULL then rid value will be 1 for the new request
-        c.execute('SELECT IFNULL((MAX(rid) + 1), 1) FROM requests ;')
+        if (index != None and old != None):
+            indexWords(index, locationWords(old), -1)
 
-        # Insert the new values
-        c.execute('INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?)', (c.fetchone()[0], email, date, pickup, dropoff, amount))
-        conn.commit()
+        if (index != None and names != None):
+            indexWords(index, locationWords(names), 1)
 
-        # Print success message
-        print('Request posted successfully.\n')
+        if (completions != None and old != None):
+            for pair in completionPairs(lcode, old):
+                del completions[bisect_left(completions, pair)]
+
+        if (completions != None and names != None):
+            for pair in completionPairs(lcode, names):
+                insort(completions, pair)
+
+        if (names == None):
+            del locations[lcode]
+        else:
+            locations[lcode] = names
 
     return
 
-##
-#### Functions for searching and deleting rides start here (Q5) ####
-##
+# Returns the completions list of referenceCache, working it out from the locations first if they changed in full since it was last needed.
+def completionList():
 
-# This function is the main control loop for ride requests. It allows the user to display, delete, orfind requests that mathc a location string.
-def requestsPage(email):
+    data = referenceData()
 
-    while True:
+    if (data['completions'] == None):
+        data['completions'] = sorted(pair for lcode, names in data['locations'].items() for pair in completionPairs(lcode, names))
 
-        os.system('clear||cls')
+    return data['completions']
 
-        print('You are now viewing your requests. Type \'display\' to display your requests, \'delete\' to delete a request, or \'location\' to view requests that depart from a specific location. Type \'exit\' at any time to return to the main menu.\n')
+# Returns the (word, lcode) pairs of the completions list for a location: one for its lcode, and one for each of its city and province (the first two of names) that isn't NULL.
+def completionPairs(lcode, names):
 
-        while True:
+    return {(word.lower(), lcode) for word in (lcode,) + names[:2] if word}
 
-            command = input('Enter a command... > ').lower().strip()
+# Returns the (lcode, city, prov) of up to limit locations whose lcode, city or province starts with prefix. They are found by bisecting the sorted completions list, so it costs no query however many locations there are.
+def locationCompletions(prefix, limit = 10):
 
-            if (command == 'exit'):
-                return
-            elif (command == 'display'):
-                displayRequests(email)
-                continue
-            elif (command == 'delete'):
-                deleteRequest(email)
-                continue
-            elif (command == 'location'):
-                requestsLocations(email)
-                break
-            else:
-                print('Unrecognized command. Valid commands are \'display\', \'delete\', \'location\', and \'exit\'.')
-                continue
+    completions = completionList()
+    lcodes = []
 
-    return
+    for word, lcode in completionsFrom(completions, prefix):
 
-# This function gets all requests from the user matching an lcode or city exactly. Calls resultsWizard().
-def requestsLocations(email):
+        if (lcode not in lcodes):
+            lcodes.append(lcode)
 
-    qSearchLocations = '''
+        if (len(lcodes) == limit):
+            break
 
-        SELECT
-            r.*
-        FROM
-            requests AS r
-        INNER JOIN
-            locations AS l ON l.lcode = r.pickup
-        WHERE
-            lower(l.lcode) = :keyword
-            OR lower(l.city) = :keyword ;
+    return [(lcode,) + referenceCache['locations'][lcode][:2] for lcode in lcodes]
 
-    '''
+# Yields the (word, lcode) pairs of completions whose word starts with prefix, in order.
+def completionsFrom(completions, prefix):
 
-    print()
+    i = bisect_left(completions, (prefix,))
 
-    while True:
+    while (i < len(completions) and completions[i][0].startswith(prefix)):
+        yield completions[i]
+        i += 1
 
-        locKeyword = input('Please specify a location code or a city name... > ').lower().strip()
+# Called by readline when Tab is pressed, with the word before the cursor. Returns the state-th lcode, city or province starting with that word, or None once there are no more.
+def completeLocation(text, state):
+    global completionWords
 
-        if (locKeyword == 'exit'):
-            return
+    if (state == 0):
+        completionWords = sorted({word for word, lcode in completionsFrom(completionList(), text.lower())})
 
-        # Finding locations (lcode, city) that match the keyword
-        c.execute(qSearchLocations, {'keyword':locKeyword})
-        results = c.fetchall()
+    if (state < len(completionWords)):
+        return completionWords[state]
 
-        # If there is nothing in the result set, complain.
-        if (not results):
-            print('No locations found for \'{}\'. Please try again.\n'.format(locKeyword))
+    return None
+
+# Prompts for a location and returns what was typed, in lowercase. Typing the start of an lcode, city or province followed by '?' (like 'edm?') lists the locations it could be and prompts again, so members can find an lcode without searching. On terminals with readline, Tab completes the word being typed as well.
+def readLocation(prompt):
+
+    while True:
+        location = input(prompt).lower().strip()
+
+        if (not location.endswith('?')):
+            return location
+
+        prefix = location[:-1].strip()
+        completions = locationCompletions(prefix)
+
+        if (not completions):
+            print('No location codes, cities or provinces start with \'{}\'.\n'.format(prefix))
             continue
 
-        # Otherwise, display results
-        print('\nDisplaying results. At any point, you can type \'message\' to message a member of a specific request.')
+        for completion in fixResults(completions):
+            print('    {:<6}  {}, {}'.format(*completion))
 
-        formatString = '    {:<13}  {:<15}  {:<11}  {:<10}  {:<10}  {:<10}'
-        print(formatString.format(*'Request ID, Email, Date, Pickup, Dropoff, Amount'.split(', ')))
+        print()
 
-        resultsWizard(email, results, formatString, requestsHelper)
+# Returns up to config['fuzzyMatches'] words from the city, province and address of locations that keyword may be a misspelling of, as (word, similarity) pairs, most similar first. The similarity of two words is the number of trigrams they share over the number of trigrams either has, as in PostgreSQL's pg_trgm. Only words sharing a trigram with keyword are looked at, through the postings of the trigram index, so the time taken depends on how many distinct words there are rather than on how many locations.
+def fuzzyLocations(keyword):
 
-    return
+    index = trigramIndex()
+    keywordTrigrams = trigrams(keyword)
 
-# helper function for above meant to be passed into resultsWizard().
-def requestsHelper(email, _):
+    # How many trigrams each word shares with keyword.
+    shared = Counter(word for trigram in keywordTrigrams for word in index['postings'].get(trigram, ()))
 
-    while True:
+    similarities = ((count / (len(keywordTrigrams) + index['sizes'][word] - count), word) for word, count in shared.items())
+    matches = nlargest(config['fuzzyMatches'], similarities)
 
-        command = input('Type \'more\' to see more results or type a command... > ').lower().strip()
+    return [(word, similarity) for similarity, word in matches if similarity >= config['fuzzySimilarity']]
 
-        if (command == 'message'):
-            requestsMessage(email)
-            continue
-        elif (command == 'more'):
-            return True
-        elif (command == 'exit'):
-            return
-        else:
-            print('Unrecognized command. Valid commands are \'more\', \'message\', and \'exit\'.')
+# Returns the trigram index of referenceCache, building it from the cached locations first if they were read again in full since it was last built. It holds every distinct word of the locations (see locationWords()) along with the number of locations it appears in, the number of trigrams of each word, and the postings: the words each trigram appears in. Locations that change one by one are taken out of and put back into the index by updateLocations(), so it only has to be built again when the locations are read in full.
+def trigramIndex():
 
-    return
+    data = referenceData()
 
-# Small function that displays the requests of the user.
-def displayRequests(email):
+    if (data['trigrams'] != None):
+        return data['trigrams']
 
-    # Get all of the member's requests
-    c.execute('SELECT * FROM requests WHERE lower(email) = ?;',(email,))
+    index = {'counts': Counter(), 'sizes': {}, 'postings': {}}
 
-    results = c.fetchall()
+    for names in data['locations'].values():
+        indexWords(index, locationWords(names), 1)
 
-    # Check if the user has requests
-    if (len(results) == 0):
-        print('You have no requests.\n')
-        return
+    data['trigrams'] = index
 
-    print('Requests for \'{}\':'.format(email))
+    return index
 
-    formatString = '    {:<9}  {:<15}  {:<13}  {:<9}  {:<9}  {:<7}'
+# Returns the words of a location, from its (city, prov, address): every word of 3 letters or more of each of them, along with its whole city and province, in lowercase.
+def locationWords(names):
 
-    # Print table headers
-    print(formatString.format(*'Ride ID, Email, Date, Pickup, Dropoff, Amount'.split(', ')))
+    words = set()
 
-    fixedResults = fixResults(results)
+    for name in filter(None, names):
+        words.update(findall(r'[^\W\d_]{3,}', name.lower()))
 
-    for r in fixedResults:
-        print(formatString.format(*r))
+    words.update(name.lower() for name in names[:2] if name)
 
-# Prompts the user to delete a request based on rid and their email. It won't let them delete a request that does not belong to them
-def deleteRequest(email):
+    return words
 
-    while True:
+# Adds the words of a location to the trigram index (with change 1), or takes them out of it (with change -1). A word is only added to the postings when the first location with it is added, and only taken out of them once the last location with it is taken out.
+def indexWords(index, words, change):
 
-        rid = input('Type the rid of the request which you want to delete... > ').lower().strip()
+    for word in words:
 
-        if (rid == 'exit'):
-            return
+        index['counts'][word] += change
 
-        c.execute('SELECT COUNT(rid) FROM requests WHERE rid = ? ;', (rid,))
+        if (change > 0 and index['counts'][word] == 1):
+            wordTrigrams = trigrams(word)
+            index['sizes'][word] = len(wordTrigrams)
 
-        if (c.fetchone()[0] < 1):
-            print('Ride with rid \'{}\' does not exist. Please try again.\n'.format(rid))
-            continue
+            for trigram in wordTrigrams:
+                index['postings'].setdefault(trigram, set()).add(word)
 
-        c.execute('SELECT COUNT(rid) FROM requests WHERE rid = ? AND email = ?;', (rid, email))
+        elif (change < 0 and index['counts'][word] == 0):
+            del index['counts'][word]
+            del index['sizes'][word]
 
-        if (c.fetchone()[0] < 1):
-            print('Ride with rid \'{}\' does not belong to you. Please try again.\n'.format(rid))
-            continue
+            for trigram in trigrams(word):
+                index['postings'][trigram].discard(word)
 
-        c.execute('DELETE FROM requests WHERE rid = ? AND lower(email) = ?;', (rid, email))
-        conn.commit()
+                if (not index['postings'][trigram]):
+                    del index['postings'][trigram]
 
-        print('Ride with rid \'{}\' was deleted. Returning to requests page...\n'.format(rid))
-        return
+    return
 
-# Small function for handling input for the search "engine" above. Returns True if the user requests more results, and None if the user wants to exit. For sending a message, we call sendMessageHelper()
-def requestsMessage(email):
+# Returns the set of trigrams of word. Like pg_trgm, the word is padded with two spaces in front and one behind, so that its start and end count as trigrams too ('abc' has '  a', ' ab', 'abc' and 'bc ').
+def trigrams(word):
 
-    print()
+    padded = '  {} '.format(word)
 
-    while True:
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
 
-        rid = input('Please type the ride number (rid) of the ride you want to send a message to or type \'exit\' to return to search... > ').lower().strip()
+# Prints the locations each keyword of a search that found nothing may be a misspelling of. Keywords that are lcodes, or words of some location themselves, are left out, since they are spelled right.
+def suggestLocations(keywordList):
 
-        if (rid == 'exit'):
-            return
+    if (config['fuzzyMatches'] <= 0):
+        return
 
-        if (len(rid) < 1):
-            print('Request ID cannot be empty. Please try again.\n')
-            continue
+    for keyword in keywordList:
 
-        try:
-            rid = int(rid)
-        except ValueError:
-            print('Input is not an integer. Please try again.\n')
+        if (isLocation(keyword)):
             continue
 
-        # Check existence of a request and print appropriate message if it does not.
-        c.execute('SELECT email FROM requests WHERE rid = ?', (rid,))
+        matches = fuzzyLocations(keyword)
 
-        # In form of ('requester',) or None
-        requester = c.fetchone()
+        if (matches and matches[0][0] != keyword):
+            print('Did you mean {} instead of \'{}\'?'.format(', '.join('\'{}\''.format(word) for word, similarity in matches), keyword))
 
-        # This checks if the rid of that ride exists and grabs the requester.
-        if (not requester):
-            print('The request id you specified does not exist. Please try again.\n')
-            continue
+    return
 
-        message = input('Type the message you want to send to \'{}\'... > '.format(requester[0]))
+# Checks that date is a valid date of format YYYY-MM-DD. This is done in Python, so it costs no query.
+def isValidDate(date):
 
-        if (message == 'exit'):
-            return
+    # fromisoformat() accepts other ISO 8601 forms too (like 2020-W01-1), so we check the exact format first.
+    if (not fullmatch('[0-9]{4}-[0-9]{2}-[0-9]{2}', date)):
+        return False
 
-        c.execute('INSERT INTO inbox VALUES (?, DATETIME(\'now\'), ?, ?, NULL, \'n\')', (requester[0], email, message))
-        conn.commit()
+    try:
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        return False
 
-        print('Message sent.\n')
+    return True
 
-        return
+# Checks that lcode is the code of a location.
+def isLocation(lcode):
 
-##
-#### Generic Functions start here ####
-##
+    return (lcode in referenceData()['locations'])
 
-# This is a highly specialized function whose main purpose is to display a X number of results 5 at a time. We need the email of the currently logged in user to pass to the helperfunction. We need a pointer to a function (helperFunction) which is the main controller for the 'more' commands, etc. We also need the list of results. Finally, we need a format string that matches the result set to print it nicely. It might be a bit of a weird way of doing things, but I found it to be helpful.
-def resultsWizard(email, results, formatString, helperFunction, hfParam = None):
-    exitCode = False
-    i = 0
+# Returns the email of the owner of car cno, or None if there is no such car.
+def carOwner(cno):
 
-    while (exitCode == False):
-        try:
-            # Makes it so it prints five results the first time.
-            if (i == 0):
-                showFiveResults(formatString, results)
-                continue
+    # Car numbers typed in are strings, while the cache is keyed by the integer cno.
+    try:
+        cno = int(cno)
+    except ValueError:
+        return None
 
-            # We call the command handler for its specified function.
-            helperReturn = helperFunction(email, hfParam)
+    return referenceData()['owners'].get(cno)
 
-            # If helperFunction returns True, this means that we must show five results.
-            if (helperReturn == True):
-                showFiveResults(formatString, results[i:])
+# This is a highly specialized function whose main purpose is to display a X number of results 5 at a time. We need the email of the currently logged in user to pass to the helperfunction. We need a pointer to a function (helperFunction) which is the main controller for the 'more' commands, etc. We also need the results, which can be any iterable of rows (usually the generator from db.query(), which holds no connection between its pages), and are consumed five at a time so that we never hold more than one page in memory. Finally, we need a format string that matches the result set to print it nicely. It might be a bit of a weird way of doing things, but I found it to be helpful.
+def resultsWizard(email, results, formatString, helperFunction, hfParam = None):
 
-            # Returning False indicates that it is a special case, namely we have to propogate that case up the chain.
-            elif (helperReturn == False):
-                return False
+    results = iter(results)
 
-            # If searchRideHelper() returns None, then we have been instructed to exit.
-            else:
-                exitCode = True
+    # Prints the first five results.
+    showFiveResults(formatString, results)
 
-        except IndexError:
-            print('No more results to show.')
+    while True:
 
-        finally:
-            i += 5
+        # We call the command handler for its specified function.
+        helperReturn = helperFunction(email, hfParam)
 
-    return
+        # If helperFunction returns True, this means that we must show five results.
+        if (helperReturn == True):
+            showFiveResults(formatString, results)
+
+        # Returning False indicates that it is a special case, namely we have to propogate that case up the chain.
+        elif (helperReturn == False):
+            return False
 
-# Attempts to print five results on the screen. We need a format string that matches the elements of result. We expect at some point for this function to run into an IndexError, which we catch in the caller.
+        # If searchRideHelper() returns None, then we have been instructed to exit.
+        else:
+            return
+
+# Prints the next five rows of results on the screen. We need a format string that matches the elements of result. Only these five rows are taken from the results and formatted.
 def showFiveResults(formatString, results):
 
-    fixedResults = fixResults(results)
+    fixedResults = fixResults(islice(results, 5))
 
     # Actually print the values. We use the star operator to unpack all the results so we can pass those as arguments in .format().
-    for i in range(0, 5):
-        print(formatString.format(*fixedResults[i]))
+    for result in fixedResults:
+        print(formatString.format(*result))
+
+    # Fewer than five rows means that we have run out of results.
+    if (len(fixedResults) < 5):
+        print('No more results to show.')
 
     return
 
+# Returns an iterator over rows (a cursor or the generator from db.query()), or None if there are no rows. Only the first row is fetched to find this out, the rest are fetched as the iterator is consumed.
+def lazyRows(rows):
+
+    rows = iter(rows)
+    first = next(rows, None)
+
+    if (first == None):
+        return None
+
+    return chain([first], rows)
+
 # The point of fixResults is to allow for the printing of NULL values. Since .format() doesn't like NULLs in the format string we must do element or 'NULL' so that if element is None (NULL in SQL) then it would replace the None with the literal string 'NULL'.
 def fixResults(results):
 
@@ -1477,5 +4100,6 @@ def fixResults(results):
 
     return fixedResults
 
-# Calling main with the system arguments. Gives all arguments after the first arguments specified by sys.argv, which is just the file path. To be clar, we don't need that
-main( len(sys.argv[1:]), sys.argv[1:] )
+# Calling main with the system arguments. Gives all arguments after the first arguments specified by sys.argv, which is just the file path. To be clar, we don't need that. We only do this when run as a script so that tools like bench.py can import the functions.
+if __name__ == '__main__':
+    sys.exit(main( len(sys.argv[1:]), sys.argv[1:] ))